@@ -1,28 +1,42 @@
-from flask import Flask, request, Response, stream_with_context, jsonify
+from flask import Flask, request, Response, stream_with_context, jsonify, send_from_directory
 from dotenv import load_dotenv
-from openai import OpenAI
-from database.connection import get_db_session
+from database.connection import get_db_session, maintain_partitions
 from database.models import User
-from sqlalchemy import text, inspect
+from sqlalchemy import text
 import uuid
 import os
-from google.oauth2 import id_token
-from google.auth.transport import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+import threading
+import json
+import base64
 from datetime import datetime, timezone
 from gpt_service import GPTService
 from response_handlers import ResponseHandlers
 from user_intent import IntentClassifier
 from rate_limit import DatabaseRateLimiter
 from memory_manager import MemoryManager
-from pdf_processor import PDFProcessor
+from session_snapshot import resolve_compression, MEDIA_TYPES, EXTENSIONS
+from pdf_processor import PDFProcessor, extract_text_from_bytes
+from job_queue import JobQueue
+from llm_admission import AdmissionController, AdmissionControlledClient, AdmissionRejected, llm_priority, BATCH
+from llm_resilience import ResilientClient
+from model_router import ModelRouter
+from prompt_cache import prompt_cache_stats
+from usage_tracker import usage_tracker, usage_session, usage_meter
+from utils import estimate_tokens
+from tracing import tracer
+from profiler import SamplingProfiler, profile_for, profile_path, PROFILE_DIR
+from metrics import metrics
+from ttl_cache import TTLCache
+from semantic_cache import SemanticCache
+from embeddings import get_embedder
+from document_store import DocumentStore, owner_id_for
 from flask_cors import CORS
 from functools import wraps
-from database import db_service
+from database import db_service, get_pool_stats, unit_of_work
 from fingerprint import get_fingerprint
-from flask import g
+from lazy import LazyObject, warm_up
+from flask import g, has_request_context
 
 # Load environment variables
 load_dotenv()
@@ -40,24 +54,122 @@ rate_limiter = DatabaseRateLimiter(
     reset_period_hours=3
 )
 
+def create_openai_client():
+    # The SDK is the slowest import at boot; it's loaded by warm_up() or the first LLM call
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, max_retries=0)
+
 # Initialize services
-client = OpenAI(api_key=api_key)
+# All chat completions go through the resilience layer (deadlines, retries, hedging) and then
+# the admission controller (concurrency cap, token budget, priorities). Retries are handled
+# by the resilience layer, so the SDK's own retries are disabled.
+llm_admission = AdmissionController()
+openai_client = LazyObject(create_openai_client)
+client = ResilientClient(AdmissionControlledClient(openai_client, llm_admission))
 response_handlers = ResponseHandlers()
-gpt_service = GPTService(client, response_handlers)
-intent_classifier = IntentClassifier(client)
+model_router = ModelRouter()
+
+# Semantic cache for anonymous career questions: paraphrases of a cached question reuse its answer
+answer_cache = None
+if os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true':
+    answer_cache = SemanticCache(
+        get_embedder(client),
+        threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.9')),
+        max_size=int(os.getenv('ANSWER_CACHE_SIZE', '1000')),
+        ttl_seconds=int(os.getenv('ANSWER_CACHE_TTL', '86400')),
+        use_faiss=os.getenv('ANSWER_CACHE_FAISS', 'false').lower() == 'true'
+    )
+
+# Uploaded resumes and job descriptions are chunked and indexed so later turns retrieve only relevant parts
+document_store = None
+if os.getenv('DOCUMENT_STORE_ENABLED', 'true').lower() == 'true':
+    document_store = DocumentStore(get_embedder(client))
+
+gpt_service = GPTService(client, response_handlers, router=model_router, answer_cache=answer_cache,
+                         document_store=document_store)
+intent_classifier = IntentClassifier(client, router=model_router)
 pdf_processor = PDFProcessor()
+job_queue = JobQueue()
+
+# Classify and answer chat messages in a single tool-calling LLM call
+SINGLE_PASS_INTENT = os.getenv('SINGLE_PASS_INTENT', 'false').lower() == 'true'
 
 # Dictionary to store memory managers for different sessions
 session_memories = {}
 
 
+@app.before_request
+def start_request_trace():
+    """Trace API requests for the Server-Timing header and the latency histograms."""
+    g.request_started = time.monotonic()
+    if request.path.startswith('/api/') and not request.path.startswith('/api/admin/'):
+        rule = request.url_rule.rule if request.url_rule else request.path
+        tracer.start_trace(f"{request.method} {rule}")
+    if request.headers.get('X-Profile') and request.headers.get('X-Admin-Key') == os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        # Per-request profile: sample only the thread serving this request (streams included)
+        g.profile_path = profile_path(f"{request.method}-{request.path}")
+        g.profiler = SamplingProfiler(thread_ids=[threading.get_ident()]).start()
+
+@app.after_request
+def add_server_timing(response):
+    """
+    Report the spans recorded so far. Streamed responses send headers before the answer is
+    generated, so theirs only cover rate limiting and session load; the full breakdown is in
+    the histograms at /api/admin/latency.
+    """
+    timing = tracer.server_timing()
+    if timing:
+        response.headers['Server-Timing'] = timing
+    g.response_status = response.status_code
+    if g.get('profile_path'):
+        response.headers['X-Profile-File'] = os.path.basename(g.profile_path)
+    return response
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    # With stream_with_context this runs once the stream has finished
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        print(f"🔬 Request profile saved to {profiler.stop().save(g.profile_path)}")
+    tracer.finish_trace()
+    reservation = g.pop('token_reservation', None)
+    if reservation is not None:
+        # Replace the pre-flight estimate with the tokens the request actually used
+        session_id, reserved = reservation
+        try:
+            rate_limiter.settle_tokens(session_id, reserved, g.usage_meter['tokens'])
+        except Exception as e:
+            print(f"⚠️  Failed to settle token usage for {session_id[:8]}: {e}")
+    started = g.get('request_started')
+    if started is not None:
+        # The URL rule, not the path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = g.get('response_status', 500 if error else 200)
+        metrics.inc('http_requests_total', method=request.method, route=route, status=status)
+        metrics.observe('http_request_duration_seconds', time.monotonic() - started, method=request.method, route=route)
+
+
+# Pre-flight token estimate for the token budget: system prompt, history and answer, plus the
+# message and any uploaded file. Settled with the actual usage when the request ends.
+TOKEN_ESTIMATE_BASE = int(os.getenv('TOKEN_ESTIMATE_BASE', '2000'))
+
+def estimate_request_tokens(data):
+    """Rough token cost of the current request before any LLM call is made."""
+    message = data.get('message') if isinstance(data, dict) else None
+    estimate = TOKEN_ESTIMATE_BASE + estimate_tokens(str(message or request.form.get('message', '')))
+    if request.files:
+        # Extracted PDF text is a small fraction of the file size
+        estimate += (request.content_length or 0) // 16
+    return estimate
+
 def rate_limit_check(f):
     """
-    Decorator to check rate limits before processing requests.
+    Decorator to check rate limits (messages and tokens) before processing requests.
     """
     @wraps(f)
     def wrapper(*args, **kwargs):
         session_id = None
+        data = {}
         
         # Try to get session_id from different sources without interfering with request parsing
         if request.content_type and 'application/json' in request.content_type:
@@ -80,9 +192,11 @@ def rate_limit_check(f):
         g.session_id = session_id
         
         # Check rate limit
-        limit_status = rate_limiter.check_limit(session_id)
+        with tracer.span('rate_limit'):
+            limit_status = rate_limiter.check_limit(session_id)
         
         if not limit_status['allowed']:
+            metrics.inc('rate_limit_rejections_total', route=request.url_rule.rule if request.url_rule else request.path)
             return jsonify({
                 'error': 'Message limit reached',
                 'limit': limit_status['limit'],
@@ -93,11 +207,34 @@ def rate_limit_check(f):
                           "or start a new session."
             }), 429  # 429 Too Many Requests
         
+        estimated_tokens = estimate_request_tokens(data)
+        if not rate_limiter.reserve_tokens(session_id, estimated_tokens):
+            metrics.inc('rate_limit_rejections_total', route=request.url_rule.rule if request.url_rule else request.path)
+            reset_time = limit_status['reset_time']
+            return jsonify({
+                'error': 'Token limit reached',
+                'token_limit': limit_status['token_limit'],
+                'tokens_used': limit_status['tokens_used'],
+                'reset_time': reset_time.isoformat() if reset_time else None,
+                'message': "You've used this session's token allowance. "
+                          + (f"Please wait until {reset_time.strftime('%Y-%m-%d %H:%M:%S')} " if reset_time else "Please wait ")
+                          + "or start a new session."
+            }), 429
+        g.token_reservation = (session_id, estimated_tokens)
+        g.usage_meter = {'tokens': 0}  # Filled by the usage tracker, read when the request ends
+        
+        g.rate_limit_status = limit_status
+        
+        # Handlers load the session and save the exchange in separate short transactions around the
+        # LLM call; save_exchange() counts the message in the same transaction as the saved messages.
+        g.count_pending = True
+        
         # Call the original function
         result = f(*args, **kwargs)
         
-        # Increment counter after successful processing
-        rate_limiter.increment_count(session_id)
+        # Increment counter after successful processing (streamed replies are saved after returning)
+        if g.pop('count_pending', False):
+            rate_limiter.increment_count(session_id)
         
         # Add rate limit headers to response
         if isinstance(result, Response):
@@ -106,12 +243,45 @@ def rate_limit_check(f):
             result.headers['X-RateLimit-Used'] = str(limit_status['current_count'] + 1)
             if limit_status['reset_time']:
                 result.headers['X-RateLimit-Reset'] = str(int(limit_status['reset_time'].timestamp()))
+            if limit_status['token_limit']:
+                # Reflects the reservation; the request's actual usage is settled when it finishes
+                tokens_used = limit_status['tokens_used'] + estimated_tokens
+                result.headers['X-RateLimit-Tokens-Limit'] = str(limit_status['token_limit'])
+                result.headers['X-RateLimit-Tokens-Used'] = str(tokens_used)
+                result.headers['X-RateLimit-Tokens-Remaining'] = str(max(0, limit_status['token_limit'] - tokens_used))
             result.headers['X-Session-ID'] = session_id
         
         return result
     
     return wrapper
 
+def admission_rejected_response(error):
+    """Build the 503 response returned when LLM capacity is exhausted."""
+    response = jsonify({
+        'error': 'Service busy',
+        'message': f"We're handling a lot of requests right now. Please try again in {error.retry_after} seconds.",
+        'retry_after': error.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def llm_admission_check(f):
+    """
+    Decorator that rejects requests up front when the LLM wait queue is too deep.
+    Runs before rate limiting so rejected requests don't count against the user.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if request.method != 'OPTIONS':
+            try:
+                llm_admission.check_capacity()
+            except AdmissionRejected as e:
+                return admission_rejected_response(e)
+        return f(*args, **kwargs)
+    
+    return wrapper
+
 def stream_response_with_delay(text, chunk_size=5):
     """
     Stream a response with artificial delay to simulate typing.
@@ -136,10 +306,26 @@ def get_memory_manager(session_id=None):
     if session_id in session_memories:
         return session_memories[session_id], session_id
     
-    memory_manager = MemoryManager(session_id=session_id, db_service=db_service)
+    # The session load commits on its own, before any LLM call
+    with tracer.span('memory_load'), unit_of_work():
+        memory_manager = MemoryManager(session_id=session_id, db_service=db_service)
     session_memories[session_id] = memory_manager
     return memory_manager, session_id
 
+def save_exchange(memory_manager, user_input, response):
+    """
+    Save both chat messages in one transaction after the LLM call has finished, counting the
+    message against the rate limit in the same transaction when the request hasn't been counted yet.
+    """
+    try:
+        with unit_of_work():
+            memory_manager.add_message(user_input, response)
+            if has_request_context() and g.pop('count_pending', False):
+                rate_limiter.increment_count(g.session_id)
+    except Exception as e:
+        # The reply was already generated; neither the messages nor the count were saved
+        print(f"⚠️  Failed to save exchange: {e}")
+
 def handle_intent(intent_info, memory_manager, original_input):
     """Handle the classified intent and return appropriate response."""
     intent = intent_info['intent']
@@ -161,35 +347,43 @@ def handle_intent(intent_info, memory_manager, original_input):
         return gpt_service.generate_resume_sections(
             args['url'], 
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
         
     elif intent == 'process_job_description':
         return gpt_service.process_job_description(
             args['job_description'], 
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
         
     elif intent == 'answer_career_question':
         return gpt_service.chat_about_resumes(
             args['question'],
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
     
     elif intent == 'answer_yes_no_question':
         return gpt_service.chat_about_resumes(
             f"{args['question']}\n\nPlease answer in one word: yes or no.",
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            intent=intent,
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
 
     elif intent == 'answer_with_user_instuctions':
         return gpt_service.chat_about_resumes(
             f"{args['question']}\n\nPlease answer using this style: {args['style']}.",
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            intent=intent,
+            style=args['style'],
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
         
     elif intent == 'rewrite_resume_section':
@@ -198,7 +392,9 @@ def handle_intent(intent_info, memory_manager, original_input):
         return gpt_service.chat_about_resumes(
             prompt,
             memory_manager.get_user_info(),
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            intent=intent,
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
         
     elif intent == 'store_personal_info':
@@ -227,30 +423,10 @@ def handle_intent(intent_info, memory_manager, original_input):
         return gpt_service.chat_about_resumes(
             original_input, 
             memory_manager.get_user_info(), 
-            memory_manager.get_chat_history()
+            memory_manager.get_chat_history(),
+            document_context=gpt_service.retrieve_document_context(memory_manager, original_input)
         )
     
-def init_database_for_google_auth():
-    """Initialize database with Google auth fields at startup."""
-    try:
-        with get_db_session() as session:
-            inspector = inspect(session.bind)
-            columns = [c['name'] for c in inspector.get_columns('users')]
-
-            if 'google_id' not in columns:
-                session.execute(text("ALTER TABLE users ADD COLUMN google_id VARCHAR(255)"))
-                print("✓ Added google_id column to users table")
-            
-            if 'profile_picture' not in columns:
-                session.execute(text("ALTER TABLE users ADD COLUMN profile_picture TEXT"))
-                print("✓ Added profile_picture column to users table")
-            
-            session.commit()
-            print("✓ Database initialized for Google OAuth")
-        
-    except Exception as e:
-        print(f"Database initialization info: {e}")
-
 @app.route('/')
 def home():
     return "Flask app is running"
@@ -376,6 +552,8 @@ def google_auth():
             return jsonify({'success': False, 'message': 'No credential provided'}), 400
         
         # Verify the Google token
+        from google.oauth2 import id_token
+        from google.auth.transport import requests
         try:
             idinfo = id_token.verify_oauth2_token(
                 credential, 
@@ -433,6 +611,9 @@ def google_auth():
             
             session.commit()
         
+        # The user row changed outside DatabaseService, so drop its cached lookups
+        db_service.invalidate_user(user_data['id'], session_id)
+        
         return jsonify({
             'success': True,
             'message': 'Google authentication successful',
@@ -499,6 +680,7 @@ def get_user(user_id):
         }), 500
 
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
+@llm_admission_check
 @rate_limit_check
 def chat():
     """API endpoint for non-streaming chat."""
@@ -519,11 +701,26 @@ def chat():
         memory_manager, session_id = get_memory_manager(session_id)
         
         # Process the message
-        intent_info = intent_classifier.classify_intent(user_input, memory_manager.get_user_info())
-        response = handle_intent(intent_info, memory_manager, user_input)
+        if SINGLE_PASS_INTENT and not wants_async(data):
+            # One LLM call classifies and answers; actions arrive as tool calls
+            response = ''.join(gpt_service.generate_single_pass_response(memory_manager, user_input))
+        else:
+            intent_info = intent_classifier.classify_intent(user_input, memory_manager.get_user_info())
+            
+            if wants_async(data) and intent_info['intent'] in ('process_job_url', 'process_job_description'):
+                # Long tailoring work runs in the job queue; the client polls the handle
+                job_id = job_queue.enqueue('chat_intent', {
+                    'session_id': session_id,
+                    'rate_limit_session_id': g.session_id,
+                    'message': user_input,
+                    'intent_info': intent_info
+                }, session_id=session_id)
+                return job_handle(job_id, session_id)
+            
+            response = handle_intent(intent_info, memory_manager, user_input)
         
         # Add to memory
-        memory_manager.add_message(user_input, response)
+        save_exchange(memory_manager, user_input, response)
         
         # Get rate limit status
         limit_status = rate_limiter.get_session_stats(session_id) if hasattr(rate_limiter, 'get_session_stats') else rate_limiter.check_limit(session_id)
@@ -537,11 +734,14 @@ def chat():
             }
         }), 200, {'X-Session-ID': session_id}
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         print(f"Chat error: {e}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @app.route('/api/chat-stream', methods=['POST'])
+@llm_admission_check
 @rate_limit_check
 def chat_stream():
     data = request.json
@@ -556,7 +756,8 @@ def chat_stream():
     @stream_with_context
     def generate():
         try:
-            limit_status = rate_limiter.get_session_stats(session_id)
+            # Reuse the status rate_limit_check already loaded for this request
+            limit_status = getattr(g, 'rate_limit_status', None) or rate_limiter.get_session_stats(session_id)
             if not limit_status['allowed']:
                 reset_time = limit_status['reset_time'].strftime('%Y-%m-%d %H:%M:%S')
                 response_text = f"You've reached the limit of {limit_status['limit']} messages. Please wait until {reset_time} for your limit to reset, or start a new session."
@@ -566,18 +767,30 @@ def chat_stream():
                     yield chunk
                 return
                 
-            intent_info = intent_classifier.classify_intent(user_input, memory_manager.get_user_info())
+            intent_info = None
             full_response = ""
 
             # Check if we have a streaming response from GPT service
             try:
+                if SINGLE_PASS_INTENT:
+                    # One LLM call classifies and answers; actions arrive as tool calls
+                    response_stream = gpt_service.generate_single_pass_response(memory_manager, user_input)
+                else:
+                    intent_info = intent_classifier.classify_intent(user_input, memory_manager.get_user_info())
+                    response_stream = gpt_service.generate_streaming_response(intent_info, memory_manager, user_input)
+                
                 # Try to get streaming response first
-                for chunk in gpt_service.generate_streaming_response(intent_info, memory_manager, user_input):
+                for chunk in response_stream:
                     full_response += chunk
                     yield chunk
+            except AdmissionRejected:
+                # No point retrying through the non-streaming path
+                raise
             except Exception as streaming_error:
                 print(f"Streaming failed, using fallback: {streaming_error}")
                 # Fallback to non-streaming with artificial delay
+                if intent_info is None:
+                    intent_info = intent_classifier.classify_intent(user_input, memory_manager.get_user_info())
                 response = handle_intent(intent_info, memory_manager, user_input)
                 full_response = response
                 
@@ -585,8 +798,13 @@ def chat_stream():
                 for chunk in stream_response_with_delay(response):
                     yield chunk
 
-            memory_manager.add_message(user_input, full_response)
+            # Both messages are written in one transaction
+            save_exchange(memory_manager, user_input, full_response)
 
+        except AdmissionRejected as e:
+            busy_message = f"I'm handling a lot of requests right now. Please try again in {e.retry_after} seconds."
+            for chunk in stream_response_with_delay(busy_message):
+                yield chunk
         except Exception as e:
             error_message = f"[Error: {str(e)}]"
             for chunk in stream_response_with_delay(error_message):
@@ -617,7 +835,10 @@ def rate_limit_status():
         'messages_limit': stats['limit'],
         'messages_remaining': stats['remaining'],
         'reset_time': stats['reset_time'].isoformat() if stats['reset_time'] else None,
-        'time_until_reset': stats['time_until_reset']
+        'time_until_reset': stats['time_until_reset'],
+        'tokens_used': stats['tokens_used'],
+        'tokens_limit': stats['token_limit'],
+        'tokens_remaining': stats['tokens_remaining']
     })
     response.headers['X-Session-ID'] = session_id
     return response
@@ -692,6 +913,8 @@ def manage_session():
     elif action == 'clear_user':
         # Clear user info
         memory_manager.clear_user_info_only()
+        if document_store is not None:
+            document_store.delete_owner(owner_id_for(memory_manager))
         return jsonify({'message': 'User information cleared', 'session_id': session_id})
     
     elif action == 'clear_history':
@@ -713,7 +936,135 @@ def manage_session():
         return jsonify({'error': 'Invalid action'}), 400
 
 
+def wants_async(data=None):
+    """Check whether the client asked for a background job instead of an inline response."""
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    value = (data or {}).get('async', request.form.get('async', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def job_handle(job_id, session_id):
+    """Build the 202 payload returned when work is queued."""
+    # The status URLs carry the session, which must match the job's to read its result
+    query = f"?session_id={session_id}"
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'session_id': session_id,
+        'status_url': f"/api/jobs/{job_id}{query}",
+        'stream_url': f"/api/jobs/{job_id}/stream{query}"
+    }), 202, {'X-Session-ID': session_id, 'Location': f"/api/jobs/{job_id}{query}"}
+
+def get_owned_job(job_id):
+    """
+    Return the job if the caller may read it: jobs of the caller's session (?session_id=,
+    X-Session-ID or the fingerprint), or any job with the admin key. None otherwise.
+    """
+    job = job_queue.get_job(job_id)
+    if not job:
+        return None
+    if request.headers.get('X-Admin-Key') == os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return job
+    caller = request.args.get('session_id') or request.headers.get('X-Session-ID') or get_fingerprint(request)
+    return job if job['session_id'] and job['session_id'] == caller else None
+
+def analyze_document(memory_manager, extracted_text, filename, user_message=''):
+    """Run the LLM analysis for an uploaded document and record it in memory."""
+    # Detect document type
+    doc_type = pdf_processor.detect_document_type(extracted_text)
+    
+    # Index the full document for retrieval in later turns; fall back to a preview in user info
+    indexed = False
+    if document_store is not None:
+        try:
+            indexed = document_store.add_document(owner_id_for(memory_manager), extracted_text, doc_type, filename) is not None
+        except Exception as e:
+            print(f"⚠️  Failed to index {filename}: {e}")
+    if indexed:
+        memory_manager.store_user_info(f"uploaded_{doc_type}", f"{filename} (relevant excerpts are provided when needed)")
+    else:
+        memory_manager.store_user_info(f"uploaded_{doc_type}_text", extracted_text[:500] + "...")
+    
+    # FIXED: Use the user's actual message instead of generic prompt
+    if user_message:
+        # User provided specific instructions
+        full_prompt = f"{user_message}\n\nHere's the {doc_type} content:\n\n{extracted_text}"
+    else:
+        # Fallback to generic analysis if no message provided
+        if doc_type == 'resume':
+            full_prompt = f"I've uploaded my resume. Can you analyze it and give me feedback? Here's the content:\n\n{extracted_text}"
+        else:
+            full_prompt = f"I've uploaded a job description. Here's the content:\n\n{extracted_text}"
+    
+    # Process based on document type but use the user's actual request
+    if doc_type == 'resume':
+        response = gpt_service.chat_about_resumes(
+            full_prompt,
+            memory_manager.get_user_info(),
+            memory_manager.get_chat_history()
+        )
+    else:
+        response = gpt_service.process_job_description(
+            extracted_text,
+            memory_manager.get_user_info(),
+            memory_manager.get_chat_history()
+        )
+    
+    # Add to memory with the user's actual message
+    save_exchange(
+        memory_manager,
+        f"{user_message} [Uploaded {doc_type} PDF: {filename}]" if user_message else f"[Uploaded {doc_type} PDF: {filename}]", 
+        response
+    )
+    return response, doc_type
+
+@job_queue.register('analyze_pdf')
+def analyze_pdf_job(payload):
+    """Background job: parse an uploaded PDF in a worker process, then analyze it."""
+    pdf_bytes = base64.b64decode(payload['file_data'])
+    metrics.inc('pdf_documents_processed_total')
+    metrics.inc('pdf_bytes_processed_total', len(pdf_bytes))
+    with tracer.span('pdf_extract'):
+        extracted_text = job_queue.run_cpu(extract_text_from_bytes, pdf_bytes)
+    memory_manager, session_id = get_memory_manager(payload['session_id'])
+    with llm_priority(BATCH), usage_session(session_id), usage_meter() as meter:
+        response, doc_type = analyze_document(memory_manager, extracted_text, payload['filename'], payload.get('message', ''))
+    # The enqueuing request released its reservation; charge the job's tokens now
+    rate_limiter.settle_tokens(payload.get('rate_limit_session_id') or session_id, 0, meter['tokens'])
+    return {
+        'response': response,
+        'session_id': session_id,
+        'filename': payload['filename'],
+        'document_type': doc_type,
+        'extracted_text_preview': extracted_text[:200] + "..." if len(extracted_text) > 200 else extracted_text
+    }
+
+@job_queue.register('chat_intent')
+def chat_intent_job(payload):
+    """Background job: answer an already-classified chat message (e.g. job URL tailoring)."""
+    memory_manager, session_id = get_memory_manager(payload['session_id'])
+    with llm_priority(BATCH), usage_session(session_id), usage_meter() as meter:
+        response = handle_intent(payload['intent_info'], memory_manager, payload['message'])
+    rate_limiter.settle_tokens(payload.get('rate_limit_session_id') or session_id, 0, meter['tokens'])
+    save_exchange(memory_manager, payload['message'], response)
+    return {'response': response, 'session_id': session_id}
+
+@job_queue.register('archive_sessions')
+def archive_sessions_job(payload):
+    """Background job: move inactive sessions to cold storage."""
+    days = int(payload.get('days') or os.getenv('SESSION_ARCHIVE_AFTER_DAYS', '90'))
+    return {'archived': db_service.archive_inactive_sessions(days), 'days': days}
+
+@job_queue.register('maintain_partitions')
+def maintain_partitions_job(payload):
+    """Background job: create upcoming monthly partitions (PostgreSQL) before rows outrun them."""
+    return {'partitions': maintain_partitions()}
+
+# Startup only creates CHAT_PARTITION_MONTHS_AHEAD months; long-running deployments keep extending them
+job_queue.schedule('maintain_partitions', int(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '86400')))
+
 @app.route('/api/upload/pdf', methods=['POST'])
+@llm_admission_check
 @rate_limit_check
 def upload_pdf():
     """API endpoint specifically for PDF uploads."""
@@ -734,46 +1085,27 @@ def upload_pdf():
     # Get memory manager for this session
     memory_manager, session_id = get_memory_manager(session_id)
     
+    if wants_async():
+        # Hand the whole extraction + analysis to the job queue and return immediately
+        job_id = job_queue.enqueue('analyze_pdf', {
+            'session_id': session_id,
+            'rate_limit_session_id': g.session_id,
+            'filename': file.filename,
+            'message': user_message,
+            'file_data': base64.b64encode(file.read()).decode('ascii')
+        }, session_id=session_id)
+        return job_handle(job_id, session_id)
+    
     try:
         # Extract text from PDF
-        extracted_text = pdf_processor.extract_text_from_pdf(file)
+        file.seek(0, os.SEEK_END)
+        metrics.inc('pdf_documents_processed_total')
+        metrics.inc('pdf_bytes_processed_total', file.tell())
+        file.seek(0)
+        with tracer.span('pdf_extract'):
+            extracted_text = pdf_processor.extract_text_from_pdf(file)
         
-        # Detect document type
-        doc_type = pdf_processor.detect_document_type(extracted_text)
-        
-        # Store the extracted text in memory for future reference
-        memory_manager.store_user_info(f"uploaded_{doc_type}_text", extracted_text[:500] + "...")
-        
-        # FIXED: Use the user's actual message instead of generic prompt
-        if user_message:
-            # User provided specific instructions
-            full_prompt = f"{user_message}\n\nHere's the {doc_type} content:\n\n{extracted_text}"
-        else:
-            # Fallback to generic analysis if no message provided
-            if doc_type == 'resume':
-                full_prompt = f"I've uploaded my resume. Can you analyze it and give me feedback? Here's the content:\n\n{extracted_text}"
-            else:
-                full_prompt = f"I've uploaded a job description. Here's the content:\n\n{extracted_text}"
-        
-        # Process based on document type but use the user's actual request
-        if doc_type == 'resume':
-            response = gpt_service.chat_about_resumes(
-                full_prompt,
-                memory_manager.get_user_info(),
-                memory_manager.get_chat_history()
-            )
-        else:
-            response = gpt_service.process_job_description(
-                extracted_text,
-                memory_manager.get_user_info(),
-                memory_manager.get_chat_history()
-            )
-        
-        # Add to memory with the user's actual message
-        memory_manager.add_message(
-            f"{user_message} [Uploaded {doc_type} PDF: {file.filename}]" if user_message else f"[Uploaded {doc_type} PDF: {file.filename}]", 
-            response
-        )
+        response, doc_type = analyze_document(memory_manager, extracted_text, file.filename, user_message)
         
         # Get rate limit status
         limit_status = rate_limiter.get_session_stats(session_id)
@@ -790,22 +1122,120 @@ def upload_pdf():
             }
         })
     
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Poll the status (and result, once finished) of a background job."""
+    job = get_owned_job(job_id)
+    if not job:
+        # Jobs of other sessions look missing, so their IDs can't be probed
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job_status(job_id):
+    """Stream job status changes as newline-delimited JSON until the job finishes."""
+    if not get_owned_job(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        import time
+        last_status = None
+        while True:
+            job = job_queue.get_job(job_id)
+            if job is None:
+                # Deleted while the stream was open
+                yield json.dumps({'job_id': job_id, 'status': 'failed', 'error': 'Job not found'}) + "\n"
+                return
+            if job['status'] != last_status or job['status'] in ('succeeded', 'failed'):
+                last_status = job['status']
+                yield json.dumps(job) + "\n"
+            if job['status'] in ('succeeded', 'failed'):
+                return
+            time.sleep(job_queue.poll_interval)
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Liveness check: the process is up. See /api/ready for dependency checks."""
     return jsonify({
         'status': 'ok',
         'api_key_configured': bool(api_key),
-        'rate_limiter': 'in-memory',
+        'rate_limiter': type(rate_limiter).__name__,
         'rate_limit_config': {
-            'message_limit': 50,
-            'reset_period_hours': 3
+            'message_limit': rate_limiter.message_limit,
+            'reset_period_hours': rate_limiter.reset_period.total_seconds() / 3600
         }
     })
 
+def check_database():
+    with get_db_session() as session:
+        session.execute(text('SELECT 1'))
+
+def check_upstream():
+    # Listing models is the cheapest authenticated call; it bypasses admission control
+    client.with_options(timeout=float(os.getenv('READINESS_TIMEOUT', '3')), max_retries=0).models.list()
+
+READINESS_CHECKS = {'database': check_database, 'upstream': check_upstream}
+
+# Results are cached so frequent probes don't hammer the database or the OpenAI API
+readiness_cache = TTLCache(max_size=len(READINESS_CHECKS), ttl_seconds=int(os.getenv('READINESS_CACHE_SECONDS', '10')))
+last_readiness = {}  # {check: latest result}, for /metrics
+
+def run_readiness_checks():
+    """Run (or reuse cached results of) each readiness check."""
+    results = {}
+    for name, check in READINESS_CHECKS.items():
+        result = readiness_cache.get(name)
+        if result is None:
+            started = time.monotonic()
+            try:
+                check()
+                result = {'ok': True}
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)[:200]}
+            result['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+            result['checked_at'] = datetime.now(timezone.utc).isoformat()
+            readiness_cache.set(name, result)
+            last_readiness[name] = result
+        results[name] = result
+    return results
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: the database and the OpenAI API are reachable (results cached briefly)."""
+    checks = run_readiness_checks()
+    ready = all(result['ok'] for result in checks.values())
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
+
+@metrics.register_collector
+def collect_runtime_metrics():
+    """Gauges read at scrape time."""
+    pool = get_pool_stats()
+    gauges = [
+        ('session_memories', 'gauge', 'Memory managers cached in this process.', [({}, len(session_memories))]),
+        ('db_pool_checked_out', 'gauge', 'Connections currently checked out.', [({}, pool.get('checked_out'))]),
+        ('db_pool_capacity', 'gauge', 'Pool size plus max overflow.', [({}, pool.get('capacity'))]),
+        ('db_pool_peak_checked_out', 'gauge', 'Most connections checked out at once.', [({}, pool.get('peak_checked_out'))]),
+    ]
+    for key in ('connects', 'checkouts', 'commits', 'statements', 'exhausted_checkouts', 'timeouts', 'pings', 'ping_failures'):
+        gauges.append((f"db_pool_{key}_total", 'counter', f"Database {key.replace('_', ' ')}.", [({}, pool.get(key))]))
+    gauges.append(('readiness_check_up', 'gauge', 'Latest readiness result per check (1 = ok).',
+                   [({'check': name}, 1 if result['ok'] else 0) for name, result in last_readiness.items()]))
+    return gauges
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Runtime metrics in the Prometheus text exposition format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/admin/sessions', methods=['GET'])
 def admin_get_sessions():
     """Get all active sessions (admin endpoint)."""
@@ -822,6 +1252,197 @@ def admin_get_sessions():
         'total_sessions': len(sessions)
     })
 
+@app.route('/api/admin/token-usage', methods=['GET'])
+def admin_token_usage():
+    """Get token usage and cost: top users and sessions, and totals per intent and model (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    days = request.args.get('days', 7, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    # Report what has been recorded so far, not just what the last batch wrote
+    usage_tracker.flush()
+    report = db_service.get_usage_report(days=max(1, days), limit=max(1, min(limit, 100)))
+    report['tracker'] = usage_tracker.get_stats()
+    return jsonify(report)
+
+@app.route('/api/admin/llm-admission', methods=['GET'])
+def admin_llm_admission():
+    """Get LLM admission queue depth, wait times and retry/hedge counters (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    stats = llm_admission.get_stats()
+    stats['resilience'] = client.get_stats()
+    return jsonify(stats)
+
+@app.route('/api/admin/model-routes', methods=['GET'])
+def admin_model_routes():
+    """Get the model routing table and per-route latency/token metrics (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'routes': model_router.routes,
+        'metrics': model_router.get_metrics()
+    })
+
+@app.route('/api/admin/prompt-cache', methods=['GET'])
+def admin_prompt_cache():
+    """Get provider prompt-cache hit rates per endpoint (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(prompt_cache_stats.get_stats())
+
+@app.route('/api/admin/db-pool', methods=['GET'])
+def admin_db_pool():
+    """Get database connection pool metrics (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(get_pool_stats())
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+def admin_cache_stats():
+    """Get hit rates for the in-process caches (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'intent_cache': intent_classifier.get_cache_stats(),
+        'answer_cache': answer_cache.get_stats() if answer_cache else {'enabled': False},
+        'db_cache': db_service.get_cache_stats()
+    })
+
+@app.route('/api/admin/latency', methods=['GET'])
+def admin_latency():
+    """Get latency histograms per traced span and per endpoint (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(tracer.get_stats())
+
+@app.route('/api/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    POST: sample all threads of this worker for ?seconds=N and return the collapsed stacks
+    (?format=json returns a summary instead). GET: list saved profiles (admin endpoint).
+    """
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if request.method == 'GET':
+        names = sorted(os.listdir(PROFILE_DIR), reverse=True) if os.path.isdir(PROFILE_DIR) else []
+        return jsonify({'directory': PROFILE_DIR, 'profiles': [n for n in names if n.endswith('.collapsed')]})
+    
+    seconds = min(request.args.get('seconds', 10, type=float), float(os.getenv('PROFILE_MAX_SECONDS', '60')))
+    interval_ms = request.args.get('interval_ms', type=float)
+    profiler = profile_for(max(seconds, 0.1), interval_ms / 1000 if interval_ms else None)
+    if profiler is None:
+        return jsonify({'error': 'A profile is already being captured'}), 409
+    path = profiler.save(profile_path(f"worker-{os.getpid()}"))
+    if request.args.get('format') == 'json':
+        return jsonify({'file': os.path.basename(path), **profiler.summary()})
+    return Response(profiler.collapsed(), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename="{os.path.basename(path)}"'
+    })
+
+@app.route('/api/admin/profile/<path:filename>', methods=['GET'])
+def admin_profile_file(filename):
+    """Download a saved profile (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return send_from_directory(os.path.abspath(PROFILE_DIR), filename, mimetype='text/plain', as_attachment=True)
+
+@app.route('/api/admin/session-archive', methods=['GET', 'POST'])
+def admin_session_archive():
+    """Get session archive statistics, or POST to archive inactive sessions in the background (admin endpoint)."""
+    admin_key = request.headers.get('X-Admin-Key')
+    
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if request.method == 'POST':
+        days = (request.get_json(silent=True) or {}).get('days')
+        job_id = job_queue.enqueue('archive_sessions', {'days': days})
+        return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f"/api/jobs/{job_id}"}), 202
+    
+    return jsonify(db_service.archive.get_stats())
+
+@app.route('/api/admin/sessions/<session_id>/snapshot', methods=['GET'])
+def admin_export_session(session_id):
+    """
+    Stream a session snapshot: every stored exchange plus user info (admin endpoint).
+    ?compression=gzip (default), zstd or none.
+    """
+    admin_key = request.headers.get('X-Admin-Key')
+
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        compression = resolve_compression(request.args.get('compression', 'gzip'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    known = session_id in session_memories or db_service.get_chat_session(session_id) or session_id in db_service.archive
+    if not known:
+        return jsonify({'error': 'Session not found'}), 404
+
+    memory_manager, _ = get_memory_manager(session_id)
+    # A failure mid-stream leaves the snapshot without its trailer, so imports reject it
+    return Response(memory_manager.export_snapshot(compression), mimetype=MEDIA_TYPES[compression], headers={
+        'Content-Disposition': f'attachment; filename="session-{session_id}{EXTENSIONS[compression]}"'
+    })
+
+@app.route('/api/admin/sessions/snapshot', methods=['POST'])
+def admin_import_session():
+    """
+    Import a session snapshot sent as the request body or a 'snapshot' file upload (admin endpoint).
+    The session keeps its ID unless ?session_id= is given; its stored messages are replaced.
+    """
+    admin_key = request.headers.get('X-Admin-Key')
+
+    if admin_key != os.getenv('ADMIN_KEY', 'your-secret-admin-key'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    upload = request.files.get('snapshot') if request.mimetype == 'multipart/form-data' else None
+    stream = upload.stream if upload else request.stream
+    try:
+        memory_manager = MemoryManager.from_snapshot(stream, db_service=db_service,
+                                                     session_id=request.args.get('session_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    session_memories[memory_manager.session_id] = memory_manager
+    info = memory_manager.get_session_info()
+    return jsonify({
+        'session_id': memory_manager.session_id,
+        'turns_in_memory': len(memory_manager.memory),
+        'chat_history_tokens': info['chat_history_tokens'],
+        'user_info_count': info['user_info_count']
+    }), 201
+
 @app.route('/api/feedback', methods=['POST'])
 def submit_feedback():
     """API endpoint for submitting anonymous feedback."""
@@ -845,6 +1466,10 @@ def submit_feedback():
     if not all([smtp_server, smtp_port, smtp_username, smtp_password, recipient_email]):
         return jsonify({'error': 'Email configuration incomplete'}), 500
     
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
     try:
         # Create message
         msg = MIMEMultipart()
@@ -881,7 +1506,12 @@ def submit_feedback():
     except Exception as e:
         return jsonify({'error': f'Failed to send feedback: {str(e)}'}), 500
 
-init_database_for_google_auth()
+# Resume jobs persisted by a previous process
+job_queue.start()
+
+# Load what was deferred at import in the background, so the worker serves requests sooner
+warm_up(openai_client._resolve, 'bs4', 'PyPDF2',
+        'google.oauth2.id_token', 'google.auth.transport.requests')
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
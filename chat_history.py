@@ -0,0 +1,76 @@
+from utils import estimate_tokens
+
+
+class Turn:
+    """One human/AI exchange, with its rendered text and token estimate."""
+
+    __slots__ = ('human', 'ai', 'text', 'tokens')
+
+    def __init__(self, human, ai, human_prefix='Human', ai_prefix='AI'):
+        self.human = human
+        self.ai = ai
+        self.text = f"{human_prefix}: {human}\n{ai_prefix}: {ai}"
+        self.tokens = estimate_tokens(human) + estimate_tokens(ai)
+
+
+class ChatHistory:
+    """
+    The last k turns of a conversation in a fixed-capacity ring.
+
+    Renders like LangChain's ConversationBufferWindowMemory(k).buffer ("Human: ...\\nAI: ..."
+    lines), but the buffer and token total are updated as turns are added and evicted instead
+    of being re-rendered on every read, and evicted turns are not kept.
+    """
+
+    __slots__ = ('k', 'human_prefix', 'ai_prefix', 'turns', 'start', 'size',
+                 'buffer', 'tokens', 'total_messages')
+
+    def __init__(self, k=30, human_prefix='Human', ai_prefix='AI'):
+        self.k = max(0, k)
+        self.human_prefix = human_prefix
+        self.ai_prefix = ai_prefix
+        self.clear()
+
+    def clear(self):
+        self.turns = [None] * self.k
+        self.start = 0  # Index of the oldest turn
+        self.size = 0
+        self.buffer = ''
+        self.tokens = 0  # Estimated tokens of the turns in the window
+        self.total_messages = 0  # Messages ever added, including evicted ones
+
+    def add(self, human, ai):
+        """Append a turn, evicting the oldest one when the ring is full."""
+        self.total_messages += 2
+        if not self.k:
+            return
+        turn = Turn(human, ai, self.human_prefix, self.ai_prefix)
+        if self.size < self.k:
+            self.turns[(self.start + self.size) % self.k] = turn
+            self.size += 1
+            self.buffer = f"{self.buffer}\n{turn.text}" if self.buffer else turn.text
+        else:
+            oldest = self.turns[self.start]
+            self.turns[self.start] = turn
+            self.start = (self.start + 1) % self.k
+            # Drop the oldest turn's text and the newline after it
+            kept = self.buffer[len(oldest.text) + 1:]
+            self.buffer = f"{kept}\n{turn.text}" if kept else turn.text
+            self.tokens -= oldest.tokens
+        self.tokens += turn.tokens
+
+    def __iter__(self):
+        """Turns from oldest to newest."""
+        for i in range(self.size):
+            yield self.turns[(self.start + i) % self.k]
+
+    def __len__(self):
+        return self.size
+
+    def pairs(self):
+        """[[human, ai], ...] from oldest to newest."""
+        return [[turn.human, turn.ai] for turn in self]
+
+    def turn_tokens(self):
+        """Estimated tokens per turn, oldest first."""
+        return [turn.tokens for turn in self]
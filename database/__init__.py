@@ -5,9 +5,11 @@ Provides PostgreSQL integration with SQLAlchemy
 Simplified structure for basic user management
 """
 
-from .connection import get_db_session, init_database, engine, Base
-from .models import User, UserProfile, ChatSession, ChatMessage, JobApplication
+from .connection import get_db_session, unit_of_work, after_commit, init_database, engine, Base, get_pool_stats
+from .models import User, UserProfile, ChatSession, ChatMessage, CompactChatMessage, JobApplication, BackgroundJob, TokenUsage
 from .service import DatabaseService
+from .async_connection import get_async_db_session, init_async_database, dispose_async_engine
+from .async_service import AsyncDatabaseService
 
 # Initialize the database service
 db_service = DatabaseService()
@@ -28,21 +30,33 @@ def check_email_exists(email: str):
 __all__ = [
     # Core database components
     'get_db_session',
+    'unit_of_work',
+    'after_commit',
     'init_database', 
     'engine',
     'Base',
+    'get_pool_stats',
     
     # Models
     'User',
     'UserProfile', 
     'ChatSession',
     'ChatMessage',
+    'CompactChatMessage',
     'JobApplication',
+    'BackgroundJob',
+    'TokenUsage',
     
     # Service
     'DatabaseService',
     'db_service',
     
+    # Async
+    'get_async_db_session',
+    'init_async_database',
+    'dispose_async_engine',
+    'AsyncDatabaseService',
+    
     # Helper functions for the UI
     'create_account',
     'login',
@@ -0,0 +1,197 @@
+# database/archive.py - Cold storage for inactive chat sessions
+"""
+Inactive sessions are moved out of chat_sessions/chat_messages into compressed JSONL
+segment files. Each session is one JSON line compressed as its own zstd frame (gzip
+member when zstandard isn't installed), so a segment is still a valid .jsonl.zst/.jsonl.gz
+file and a single session can be read back by seeking to its offset.
+
+index.jsonl maps session_id -> (segment, offset, length). It is append-only: later lines
+win, and {"session_id": ..., "restored": true} drops an entry once the session is back in
+the database.
+
+Usage:
+    python -m database.archive [--days 90] [--batch-size 500]
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class SessionArchive:
+    """Compressed, append-only session archive on local disk with an O(1) session_id index."""
+
+    INDEX_FILE = 'index.jsonl'
+
+    def __init__(self, root_dir=None, codec=None):
+        """
+        Initialize the archive.
+
+        Args:
+            root_dir: Directory for segments and the index (default SESSION_ARCHIVE_DIR)
+            codec: 'zstd' or 'gzip' (default SESSION_ARCHIVE_CODEC, zstd when installed)
+        """
+        self.root_dir = root_dir or os.getenv('SESSION_ARCHIVE_DIR', 'session_archive')
+        codec = codec or os.getenv('SESSION_ARCHIVE_CODEC', 'zstd' if zstandard else 'gzip')
+        if codec == 'zstd' and zstandard is None:
+            print("⚠️  zstandard not installed, archiving with gzip")
+            codec = 'gzip'
+        self.codec = codec
+        self.lock = threading.Lock()
+        self._entries = {}  # {session_id: index entry}
+        self._index_offset = 0  # Bytes of index.jsonl already loaded
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root_dir, self.INDEX_FILE)
+
+    # Compression
+    def _compress(self, data):
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(segment, data):
+        if segment.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {segment}")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    # Index
+    def _refresh_index(self):
+        """Load index lines appended since the last call (by this or another process)."""
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            return
+        if size <= self._index_offset:
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_offset)
+            data = f.read(size - self._index_offset)
+        # Only consume complete lines; a concurrent writer may be mid-line
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            if entry.get('restored'):
+                self._entries.pop(entry['session_id'], None)
+            else:
+                self._entries[entry['session_id']] = entry
+        self._index_offset += len(complete)
+
+    def _append_index(self, entries):
+        os.makedirs(self.root_dir, exist_ok=True)
+        data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+        with open(self.index_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def lookup(self, session_id):
+        """Return the index entry for an archived session, or None."""
+        with self.lock:
+            self._refresh_index()
+            return self._entries.get(session_id)
+
+    def __contains__(self, session_id):
+        return self.lookup(session_id) is not None
+
+    # Read / write
+    def write(self, records):
+        """
+        Append sessions to a new segment file and index them.
+
+        Args:
+            records: Dicts with 'session' (ChatSession.to_dict()) and 'messages' (list of message dicts)
+
+        Returns:
+            Number of sessions archived
+        """
+        if not records:
+            return 0
+        os.makedirs(self.root_dir, exist_ok=True)
+        extension = 'zst' if self.codec == 'zstd' else 'gz'
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+        segment = f"sessions-{stamp}-{uuid.uuid4().hex[:8]}.jsonl.{extension}"
+        archived_at = datetime.now(timezone.utc).isoformat()
+
+        entries = []
+        offset = 0
+        with open(os.path.join(self.root_dir, segment), 'wb') as f:
+            for record in records:
+                frame = self._compress(json.dumps(dict(record, archived_at=archived_at)).encode('utf-8') + b'\n')
+                f.write(frame)
+                entries.append({
+                    'session_id': record['session']['session_id'],
+                    'user_id': record['session'].get('user_id'),
+                    'segment': segment,
+                    'offset': offset,
+                    'length': len(frame),
+                    'messages': len(record['messages']),
+                    'archived_at': archived_at
+                })
+                offset += len(frame)
+            f.flush()
+            os.fsync(f.fileno())
+        # Index only after the segment is durable, so every index entry is readable
+        with self.lock:
+            self._append_index(entries)
+        return len(entries)
+
+    def read(self, session_id):
+        """Return the archived record for a session, or None."""
+        entry = self.lookup(session_id)
+        if entry is None:
+            return None
+        with open(os.path.join(self.root_dir, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            data = f.read(entry['length'])
+        return json.loads(self._decompress(entry['segment'], data))
+
+    def forget(self, *session_ids):
+        """Drop sessions from the index (they are back in, or never left, the database)."""
+        if session_ids:
+            with self.lock:
+                self._append_index([{'session_id': session_id, 'restored': True} for session_id in session_ids])
+
+    def get_stats(self):
+        """Return archive size and index statistics."""
+        with self.lock:
+            self._refresh_index()
+            segments = [name for name in os.listdir(self.root_dir) if name.startswith('sessions-')] \
+                if os.path.isdir(self.root_dir) else []
+            return {
+                'sessions': len(self._entries),
+                'segments': len(segments),
+                'bytes': sum(os.path.getsize(os.path.join(self.root_dir, name)) for name in segments),
+                'codec': self.codec,
+                'root_dir': self.root_dir
+            }
+
+
+def main():
+    import argparse
+    from .service import DatabaseService
+
+    parser = argparse.ArgumentParser(description="Move inactive chat sessions to cold storage")
+    parser.add_argument('--days', type=int, default=int(os.getenv('SESSION_ARCHIVE_AFTER_DAYS', '90')))
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    archived = DatabaseService().archive_inactive_sessions(args.days, args.batch_size)
+    print(f"✅ Archived {archived} sessions inactive for {args.days}+ days in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
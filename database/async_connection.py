@@ -0,0 +1,59 @@
+# database/async_connection.py - Async engine and sessions (asyncpg / aiosqlite)
+import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from .connection import DATABASE_URL, ENGINE_PROFILE, _engine_options, create_tables
+
+# Created on first use so importing the package doesn't require the async drivers
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_database_url(profile=ENGINE_PROFILE):
+    """Return the async driver URL for the profile."""
+    if profile == 'test':
+        url = os.getenv('TEST_ASYNC_DATABASE_URL') or os.getenv('TEST_DATABASE_URL', 'sqlite://')
+        return url.replace('sqlite://', 'sqlite+aiosqlite://', 1) if url.startswith('sqlite://') else url
+    return DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://', 1)
+
+def get_async_engine():
+    """Return the shared async engine, creating it with the same profile as the sync engine."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        echo = os.getenv('SQL_ECHO', 'False').lower() == 'true'
+        url = get_async_database_url()
+        if ENGINE_PROFILE == 'test':
+            _async_engine = create_async_engine(url, echo=echo)
+        else:
+            _async_engine = create_async_engine(url, echo=echo, **_engine_options(ENGINE_PROFILE))
+        # Objects stay readable after commit without another (async) round-trip
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+@asynccontextmanager
+async def get_async_db_session():
+    """Async context manager for database sessions"""
+    get_async_engine()
+    session = _AsyncSessionLocal()
+    try:
+        yield session
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise e
+    finally:
+        await session.close()
+
+async def init_async_database():
+    """Initialize database tables through the async engine"""
+    async with get_async_engine().begin() as connection:
+        await connection.run_sync(create_tables)
+
+async def dispose_async_engine():
+    """Close all pooled async connections (call before the event loop shuts down)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
@@ -0,0 +1,114 @@
+# database/async_service.py - Async counterpart of DatabaseService
+import heapq
+from typing import Optional, List, Dict, Any
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .async_connection import get_async_db_session, init_async_database
+from .models import UserProfile, ChatSession, ChatMessage, get_message_model
+from .service import message_order
+from datetime import datetime, timezone
+
+class AsyncDatabaseService:
+    """
+    Async service layer for the chat hot path (messages, profiles, sessions).
+    Methods mirror DatabaseService and use the same models.
+    """
+
+    def __init__(self):
+        # ChatMessage, or CompactChatMessage when CHAT_STORAGE_MODE=compact
+        self.message_model = get_message_model()
+
+    def _message_models(self):
+        """Models that may hold a session's messages (legacy rows stay in chat_messages until migrated)"""
+        return [ChatMessage] if self.message_model is ChatMessage else [ChatMessage, self.message_model]
+
+    async def init(self):
+        """Create tables if needed (the sync service does this in __init__)"""
+        await init_async_database()
+
+    # Profile Management
+    async def get_user_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get user profile"""
+        async with get_async_db_session() as session:
+            profile = await session.scalar(select(UserProfile).where(UserProfile.user_id == user_id))
+            return profile.to_dict() if profile else None
+
+    async def update_user_profile(self, user_id: int, info_type: str, info_value: str) -> Dict[str, Any]:
+        """Update user profile based on intent classification"""
+        async with get_async_db_session() as session:
+            profile = await session.scalar(select(UserProfile).where(UserProfile.user_id == user_id))
+
+            if not profile:
+                profile = UserProfile(user_id=user_id)
+                session.add(profile)
+
+            profile.update_profile_data(info_type, info_value)
+            await session.flush()
+            await session.refresh(profile)  # Load server defaults without lazy IO
+            return profile.to_dict()
+
+    # Session Management
+    async def create_chat_session(self, user_id: Optional[int] = None, session_id: Optional[str] = None) -> str:
+        """Create a new chat session and return session_id"""
+        async with get_async_db_session() as session:
+            chat_session = ChatSession.create_session(user_id=user_id, session_id=session_id)
+            session.add(chat_session)
+            await session.flush()
+            return chat_session.session_id
+
+    async def get_chat_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get chat session by ID"""
+        async with get_async_db_session() as session:
+            chat_session = await session.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
+            return chat_session.to_dict() if chat_session else None
+
+    async def update_session_activity(self, session_id: str, session: Optional[AsyncSession] = None):
+        """Update last activity timestamp for a session."""
+        if session is None:
+            async with get_async_db_session() as new_session:
+                await self.update_session_activity(session_id, session=new_session)
+                return
+
+        chat_session = await session.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
+        if chat_session:
+            chat_session.last_activity = datetime.now(timezone.utc)
+
+    # Message Management
+    async def save_message(self, session_id: str, message_type: str, content: str,
+                           intent: Optional[str] = None, extra_data: Optional[Dict] = None) -> Dict[str, Any]:
+        """Save a chat message"""
+        async with get_async_db_session() as session:
+            # Update session activity using the same DB session
+            await self.update_session_activity(session_id, session=session)
+
+            message = self.message_model.create(session_id, message_type, content, intent, extra_data)
+            session.add(message)
+            await session.flush()
+            await session.refresh(message)  # Load created_at without lazy IO
+            return message.to_dict()
+
+    async def get_session_messages(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get messages for a session (in compact mode, merged with its legacy chat_messages rows)"""
+        per_model = []
+        async with get_async_db_session() as session:
+            for Message in self._message_models():
+                messages = await session.scalars(
+                    select(Message)
+                    .where(Message.session_id == session_id)
+                    .order_by(Message.created_at, Message.id)
+                    .limit(limit)
+                )
+                per_model.append([m.to_dict() for m in messages])
+        return list(heapq.merge(*per_model, key=message_order))[:limit]
+
+    async def clear_session_messages(self, session_id: str) -> bool:
+        """Clear all messages for a session"""
+        async with get_async_db_session() as session:
+            messages = []
+            for Message in self._message_models():
+                messages += (await session.scalars(
+                    select(Message).where(Message.session_id == session_id)
+                )).all()
+            for message in messages:
+                await session.delete(message)
+            return len(messages) > 0
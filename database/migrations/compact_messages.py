@@ -0,0 +1,85 @@
+# database/migrations/compact_messages.py - Copy chat_messages into compact, partitioned storage
+"""
+Usage:
+    python -m database.migrations.compact_messages [--batch-size 1000] [--start-after-id 0] [--delete-source]
+
+Copies rows from chat_messages into chat_messages_compact in id order, one transaction
+per batch. With --delete-source the copied rows are removed in the same transaction, so an
+interrupted run can simply be restarted. Without it, restart with --start-after-id set to
+the last id printed. Set CHAT_STORAGE_MODE=compact once the copy is complete.
+
+Compact mode still reads rows left in chat_messages, so copied rows must be deleted (here
+with --delete-source, or afterwards) or they are returned twice.
+"""
+import argparse
+import time
+
+from sqlalchemy import func
+
+from database.connection import SessionLocal, engine, create_tables
+from database.models import ChatMessage, CompactChatMessage
+
+
+def ensure_partitions_for_existing_rows():
+    """Create tables, and on PostgreSQL monthly partitions back to the oldest message."""
+    with engine.begin() as connection:
+        create_tables(connection)
+        if connection.dialect.name == 'postgresql':
+            from database.partitions import ensure_monthly_partitions
+            oldest = connection.execute(func.min(ChatMessage.created_at).select()).scalar()
+            if oldest:
+                names = ensure_monthly_partitions(connection, CompactChatMessage.__table__, start=oldest.date())
+                print(f"📅 Partitions ready: {names[0]} .. {names[-1]}")
+
+
+def migrate(batch_size=1000, start_after_id=0, delete_source=False):
+    """
+    Copy legacy messages into compact storage.
+
+    Returns:
+        Number of messages copied
+    """
+    ensure_partitions_for_existing_rows()
+    last_id = start_after_id
+    copied = 0
+    started = time.monotonic()
+    while True:
+        session = SessionLocal()
+        try:
+            rows = session.query(ChatMessage).filter(ChatMessage.id > last_id).order_by(ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                message = CompactChatMessage.create(row.session_id, row.message_type, row.content, row.intent, row.extra_data)
+                message.created_at = row.created_at or message.created_at
+                session.add(message)
+            if delete_source:
+                session.query(ChatMessage).filter(
+                    ChatMessage.id.in_([row.id for row in rows])
+                ).delete(synchronize_session=False)
+            session.commit()
+            last_id = rows[-1].id
+            copied += len(rows)
+            print(f"📦 Copied {copied} messages (last id {last_id}, {copied / (time.monotonic() - started):.0f} rows/s)")
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    print(f"✅ Migration complete: {copied} messages copied")
+    if copied and not delete_source:
+        print("⚠️  Copied rows are still in chat_messages; delete them before using compact mode")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy chat_messages into compact partitioned storage")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--start-after-id', type=int, default=0)
+    parser.add_argument('--delete-source', action='store_true', help="Delete copied rows from chat_messages")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.start_after_id, args.delete_source)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 # database/models.py - Simplified User model for basic authentication
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Text, Date, DateTime, Float, Boolean, ForeignKey, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .connection import Base
 import uuid
+import os
+import zlib
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -118,6 +120,7 @@ class ChatSession(Base):
     last_activity = Column(DateTime(timezone=True), server_default=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     message_count = Column(Integer, default=0)
+    token_count = Column(Integer, default=0)  # Prompt + completion tokens in the rate-limit window
     first_message_time = Column(DateTime(timezone=True))
     
     # Relationships
@@ -133,6 +136,7 @@ class ChatSession(Base):
             title=title,
             last_activity=datetime.now(timezone.utc),
             message_count=0,
+            token_count=0,
             first_message_time=None
         )
     
@@ -146,6 +150,7 @@ class ChatSession(Base):
             'last_activity': self.last_activity.isoformat() if self.last_activity else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'message_count': self.message_count,
+            'token_count': self.token_count or 0,
             'first_message_time': self.first_message_time.isoformat() if self.first_message_time else None
         }
 
@@ -163,6 +168,17 @@ class ChatMessage(Base):
     # Relationship
     session = relationship("ChatSession", back_populates="messages")
     
+    @classmethod
+    def create(cls, session_id, message_type, content, intent=None, extra_data=None):
+        """Create a message row"""
+        return cls(
+            session_id=session_id,
+            message_type=message_type,
+            content=content,
+            intent=intent,
+            extra_data=extra_data or {}
+        )
+    
     def to_dict(self):
         """Convert message to dictionary"""
         return {
@@ -207,4 +223,149 @@ class JobApplication(Base):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class BackgroundJob(Base):
+    __tablename__ = 'background_jobs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), unique=True, nullable=False, index=True)
+    job_type = Column(String(100), nullable=False)
+    session_id = Column(String(64), nullable=True, index=True)  # Session that requested the job
+    status = Column(String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    priority = Column(Integer, default=0)  # Higher runs first
+    payload = Column(JSON)  # Handler input
+    result = Column(JSON)  # Handler output
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime(timezone=True), server_default=func.now())  # Delays retries
+    locked_by = Column(String(255))  # Worker that claimed the job
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # Refreshed by the worker while the job runs
+    finished_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def to_dict(self):
+        """Convert job to dictionary (payload is omitted, it may hold file data)"""
+        return {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'session_id': self.session_id,
+            'status': self.status,
+            'priority': self.priority,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class TokenUsage(Base):
+    """Daily LLM token and cost totals per session, intent and model (written in batches by usage_tracker)"""
+    __tablename__ = 'token_usage'
+    __table_args__ = (
+        Index('ux_token_usage_key', 'day', 'session_id', 'intent', 'model', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False, index=True)
+    session_id = Column(String(64), nullable=False, index=True)  # 'background' for calls outside a session
+    user_id = Column(Integer, nullable=True, index=True)  # No FK: usage outlives deleted accounts and archived sessions
+    intent = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False)
+    calls = Column(Integer, default=0)
+    prompt_tokens = Column(BigInteger, default=0)
+    cached_tokens = Column(BigInteger, default=0)
+    completion_tokens = Column(BigInteger, default=0)
+    cost_usd = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        """Convert usage row to dictionary"""
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'session_id': self.session_id,
+            'user_id': self.user_id,
+            'intent': self.intent,
+            'model': self.model,
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cost_usd': round(self.cost_usd or 0.0, 6)
+        }
+
+# Compact message storage: message types stored as small integers
+MESSAGE_TYPES = {'user': 1, 'assistant': 2, 'system': 3}
+MESSAGE_TYPE_NAMES = {code: name for name, code in MESSAGE_TYPES.items()}
+# Contents at least this long (in bytes) are stored zlib-compressed
+COMPRESS_MIN_BYTES = int(os.getenv('CHAT_COMPRESS_MIN_BYTES', '1024'))
+
+class CompactChatMessage(Base):
+    """
+    Compact chat message storage (CHAT_STORAGE_MODE=compact).
+    
+    On PostgreSQL the table is range-partitioned by month on created_at (see
+    database.partitions); elsewhere it is a plain table with the same columns.
+    """
+    __tablename__ = 'chat_messages_compact'
+    __table_args__ = (
+        Index('ix_chat_messages_compact_session', 'session_id', 'created_at'),
+        {'info': {'partitioned_by': 'created_at'}}
+    )
+    
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    session_id = Column(String(36), nullable=False)  # No FK: partitions are dropped independently
+    message_type = Column(SmallInteger, nullable=False)  # See MESSAGE_TYPES
+    content = Column(Text)  # Short contents
+    content_compressed = Column(LargeBinary)  # zlib-compressed long contents
+    intent = Column(String(100))
+    extra_data = Column(JSON)  # NULL instead of {}
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    
+    @classmethod
+    def create(cls, session_id, message_type, content, intent=None, extra_data=None):
+        """Create a message row, compressing long contents"""
+        message = cls(
+            session_id=session_id,
+            message_type=MESSAGE_TYPES.get(message_type, MESSAGE_TYPES['system']),
+            intent=intent,
+            extra_data=extra_data or None,
+            # Set here rather than by the server so messages written in one transaction keep their order
+            created_at=datetime.now(timezone.utc)
+        )
+        encoded = (content or '').encode('utf-8')
+        if len(encoded) >= COMPRESS_MIN_BYTES:
+            message.content_compressed = zlib.compress(encoded, 6)
+        else:
+            message.content = content
+        return message
+    
+    @property
+    def text(self):
+        """Message content, decompressed if needed"""
+        if self.content_compressed is not None:
+            return zlib.decompress(self.content_compressed).decode('utf-8')
+        return self.content
+    
+    def to_dict(self):
+        """Convert message to dictionary (same shape as ChatMessage.to_dict)"""
+        return {
+            'id': self.id,
+            'session_id': self.session_id,
+            'message_type': MESSAGE_TYPE_NAMES.get(self.message_type, 'system'),
+            'content': self.text,
+            'intent': self.intent,
+            'extra_data': self.extra_data or {},
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+def get_message_model():
+    """Message model for the configured CHAT_STORAGE_MODE ('standard' or 'compact')"""
+    if os.getenv('CHAT_STORAGE_MODE', 'standard').lower() == 'compact':
+        return CompactChatMessage
+    return ChatMessage
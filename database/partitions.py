@@ -0,0 +1,72 @@
+# database/partitions.py - Monthly range partitions for PostgreSQL
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+def is_partitioned(table):
+    """Tables opt in with info={'partitioned_by': '<column>'}"""
+    return 'partitioned_by' in table.info
+
+def _month_start(day, offset=0):
+    month_index = day.year * 12 + day.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def partition_name(table, month):
+    return f"{table.name}_y{month.year}m{month.month:02d}"
+
+def create_partitioned_table(connection, table):
+    """Create a RANGE-partitioned parent table (plus a default partition) if it doesn't exist."""
+    key = table.info['partitioned_by']
+    columns = ",\n    ".join(str(CreateColumn(column).compile(dialect=connection.dialect)) for column in table.columns)
+    # PostgreSQL requires the partition key in the primary key
+    primary_key = [column.name for column in table.primary_key.columns] + [key]
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table.name} (\n    {columns},\n"
+        f"    PRIMARY KEY ({', '.join(primary_key)})\n) PARTITION BY RANGE ({key})"
+    ))
+    for index in table.indexes:
+        connection.execute(CreateIndex(index, if_not_exists=True))
+    # Rows outside the created months land here instead of failing the insert; ensure_monthly_partitions
+    # moves them into their month's partition when it is created
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table.name}_default PARTITION OF {table.name} DEFAULT"))
+
+def ensure_monthly_partitions(connection, table, months_ahead=3, start=None):
+    """
+    Create monthly partitions from the start month (default: this month) through months_ahead.
+
+    A missing month may already have rows in the default partition (written after the last
+    run's range ended), and PostgreSQL refuses to create a partition whose range overlaps rows
+    in DEFAULT. So the month is built as a plain table, its rows are moved out of the default
+    partition, and then it is attached, all in the caller's transaction.
+
+    Returns:
+        Names of the partitions that cover the range
+    """
+    first = _month_start(start or datetime.now(timezone.utc).date())
+    last = _month_start(datetime.now(timezone.utc).date(), months_ahead)
+    key = table.info['partitioned_by']
+    # Serializes concurrent runs (several workers starting, or the scheduled job) per table
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {'name': table.name})
+    names = []
+    month = first
+    while month <= last:
+        name = partition_name(table, month)
+        if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+            lower, upper = month.isoformat(), _month_start(month, 1).isoformat()
+            connection.execute(text(f"CREATE TABLE {name} (LIKE {table.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            connection.execute(text(
+                f"WITH moved AS (DELETE FROM {table.name}_default WHERE {key} >= '{lower}' AND {key} < '{upper}' "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ))
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+        names.append(name)
+        month = _month_start(month, 1)
+    return names
+
+def init_partitioned_tables(connection, tables, months_ahead=3):
+    """Create partitioned tables and their upcoming monthly partitions (PostgreSQL only)."""
+    for table in tables:
+        create_partitioned_table(connection, table)
+        ensure_monthly_partitions(connection, table, months_ahead)
@@ -0,0 +1,145 @@
+# database/pool_metrics.py - Connection pool instrumentation
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Collect checkout wait, saturation and pre-ping statistics for an engine's pool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.capacity = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.sessions_opened = 0
+            self.connects = 0
+            self.checkouts = 0
+            self.commits = 0
+            self.statements = 0
+            self.checked_out = 0
+            self.peak_checked_out = 0
+            self.exhausted_checkouts = 0  # Checkouts that found every connection in use
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.waits = deque(maxlen=1000)
+            self.pings = 0
+            self.ping_failures = 0
+            self.ping_total = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.waits.append(seconds)
+            self.timeouts += 1 if timed_out else 0
+
+    def record_session(self):
+        with self.lock:
+            self.sessions_opened += 1
+
+    def attach(self, engine, capacity=None):
+        """Register pool event listeners on the engine and time its pre-ping."""
+        self.capacity = capacity
+
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with self.lock:
+                self.connects += 1
+
+        @event.listens_for(engine, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self.lock:
+                self.checkouts += 1
+                self.checked_out += 1
+                self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+                if self.capacity and self.checked_out >= self.capacity:
+                    self.exhausted_checkouts += 1
+
+        @event.listens_for(engine, 'commit')
+        def on_commit(connection):
+            with self.lock:
+                self.commits += 1
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def on_execute(connection, cursor, statement, parameters, context, executemany):
+            with self.lock:
+                self.statements += 1
+
+        @event.listens_for(engine, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            with self.lock:
+                self.checked_out = max(0, self.checked_out - 1)
+
+        dialect = engine.dialect
+        do_ping = dialect.do_ping
+
+        def timed_ping(dbapi_connection):
+            started = time.perf_counter()
+            ok = False
+            try:
+                ok = do_ping(dbapi_connection)
+                return ok
+            finally:
+                with self.lock:
+                    self.pings += 1
+                    self.ping_total += time.perf_counter() - started
+                    self.ping_failures += 0 if ok else 1
+
+        # The pool calls dialect.do_ping for pre-ping; an instance attribute shadows the method
+        dialect.do_ping = timed_ping
+
+    def get_stats(self):
+        """Return pool statistics (times in milliseconds)."""
+        def percentile(samples, fraction):
+            samples = sorted(samples)
+            return round(samples[max(0, int(len(samples) * fraction) - 1)] * 1000, 3) if samples else None
+
+        with self.lock:
+            waits = len(self.waits)
+            return {
+                'capacity': self.capacity,
+                'sessions_opened': self.sessions_opened,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'commits': self.commits,
+                'statements': self.statements,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'saturation': round(self.checked_out / self.capacity, 4) if self.capacity else None,
+                'peak_saturation': round(self.peak_checked_out / self.capacity, 4) if self.capacity else None,
+                'exhausted_checkouts': self.exhausted_checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(sum(self.waits) / waits * 1000, 3) if waits else None,
+                'p95_wait_ms': percentile(self.waits, 0.95),
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'pings': self.pings,
+                'ping_failures': self.ping_failures,
+                'avg_ping_ms': round(self.ping_total / self.pings * 1000, 3) if self.pings else None,
+                'total_ping_ms': round(self.ping_total * 1000, 3)
+            }
+
+
+# Shared by the engine in database.connection
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
@@ -1,18 +1,100 @@
 # database/service.py - Simplified database service layer
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from .connection import get_db_session, init_database
-from .models import User, UserProfile, ChatSession, ChatMessage, JobApplication
+from sqlalchemy import desc, and_, func
+from sqlalchemy.exc import IntegrityError
+from .connection import get_db_session, init_database, after_commit, current_unit_of_work
+from .models import User, UserProfile, ChatSession, ChatMessage, JobApplication, get_message_model, TokenUsage
+from .archive import SessionArchive
+from ttl_cache import TTLCache
+import copy
+import heapq
+import os
+import threading
 import uuid
 from datetime import datetime, timedelta, timezone
 
+# Marks a cache miss (None is a valid cached value for missing sessions)
+_MISSING = object()
+
+def message_order(message: Dict[str, Any]):
+    """Sort key for message dicts from several tables: created_at, then id."""
+    return (message['created_at'] or '', message['id'])
+
 class DatabaseService:
     """Service layer for database operations"""
     
     def __init__(self):
         # Initialize database on first use
         init_database()
+        
+        # Read-through caches for hot lookups, one TTL per entity. Values are the to_dict() results.
+        self.caches = {}
+        if os.getenv('DB_CACHE_ENABLED', 'true').lower() == 'true':
+            size = int(os.getenv('DB_CACHE_SIZE', '4096'))
+            user_ttl = int(os.getenv('DB_CACHE_USER_TTL', '300'))
+            self.caches = {
+                'user': TTLCache(size, user_ttl),
+                'user_by_session': TTLCache(size, user_ttl),
+                'profile': TTLCache(size, int(os.getenv('DB_CACHE_PROFILE_TTL', '300'))),
+                'chat_session': TTLCache(size, int(os.getenv('DB_CACHE_SESSION_TTL', '60')))
+            }
+        # Missing sessions are cached briefly so repeated existence checks don't hit the database
+        self.negative_ttl = int(os.getenv('DB_CACHE_NEGATIVE_TTL', '10'))
+        
+        # ChatMessage, or CompactChatMessage when CHAT_STORAGE_MODE=compact
+        self.message_model = get_message_model()
+        
+        # Cold storage for inactive sessions (see archive_inactive_sessions)
+        self.archive = SessionArchive()
+        self._restore_lock = threading.Lock()
+    
+    # Caching helpers
+    def _cached(self, entity: str, key, load, negative: bool = False):
+        """Return the cached value for key, loading (and caching) it on a miss."""
+        cache = self.caches.get(entity)
+        if cache is None:
+            return load()
+        unit = current_unit_of_work()
+        if unit is not None and (entity, key) in unit.info.get('invalidated', ()):
+            # Changed by this unit and not committed yet: read the row, but don't share it
+            return load()
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            if value is not None:
+                cache.set(key, value)
+            elif negative:
+                cache.set(key, None, ttl=self.negative_ttl)
+        # Callers get their own copy so they can't modify the cached dict
+        return copy.deepcopy(value)
+    
+    def invalidate(self, entity: str, key):
+        """
+        Drop one cached entry. Inside a unit of work it is dropped again once the unit commits,
+        since other requests can cache the old row until then.
+        """
+        if entity in self.caches and key is not None:
+            self.caches[entity].delete(key)
+            unit = current_unit_of_work()
+            if unit is not None:
+                unit.info.setdefault('invalidated', set()).add((entity, key))
+                after_commit(lambda: self.caches[entity].delete(key))
+    
+    def invalidate_user(self, user_id: int, *session_ids: str):
+        """Drop cached user lookups after the user row changes."""
+        self.invalidate('user', user_id)
+        for session_id in session_ids:
+            self.invalidate('user_by_session', session_id)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return hit-rate statistics per cached entity."""
+        if not self.caches:
+            return {'enabled': False}
+        stats = {entity: cache.get_stats() for entity, cache in self.caches.items()}
+        stats['enabled'] = True
+        stats['negative_ttl_seconds'] = self.negative_ttl
+        return stats
     
     # User Management - Simplified for the UI
     def create_user(self, name: str, email: str, password: str, confirm_password: str = None) -> Dict[str, Any]:
@@ -62,20 +144,23 @@ class DatabaseService:
             }
     def assign_session_to_user(self, user_id: int, session_id: str) -> bool:
         """Assign session_id to user"""
+        previous_session_id = None
         with get_db_session() as session:
             user = session.query(User).filter(User.id == user_id).first()
             if user:
+                previous_session_id = user.session_id
                 user.session_id = session_id
                 user.updated_at = datetime.now(timezone.utc)
-            session.commit()  
-            return True
-        return False
+        self.invalidate_user(user_id, session_id, previous_session_id)
+        return True
 
     def get_user_by_session_id(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get user by session_id"""
-        with get_db_session() as session:
-            user = session.query(User).filter(User.session_id == session_id).first()
-        return user.to_dict() if user else None
+        def load():
+            with get_db_session() as session:
+                user = session.query(User).filter(User.session_id == session_id).first()
+                return user.to_dict() if user else None
+        return self._cached('user_by_session', session_id, load)
     
     def login_user(self, email: str, password: str) -> Dict[str, Any]:
         """Authenticate user login - for future login functionality"""
@@ -107,9 +192,11 @@ class DatabaseService:
     
     def get_user_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
-        with get_db_session() as session:
-            user = session.query(User).filter(User.id == user_id).first()
-            return user.to_dict() if user else None
+        def load():
+            with get_db_session() as session:
+                user = session.query(User).filter(User.id == user_id).first()
+                return user.to_dict() if user else None
+        return self._cached('user', user_id, load)
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email"""
@@ -126,9 +213,11 @@ class DatabaseService:
     # Profile Management - Keep for future functionality
     def get_user_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user profile"""
-        with get_db_session() as session:
-            profile = session.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-            return profile.to_dict() if profile else None
+        def load():
+            with get_db_session() as session:
+                profile = session.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+                return profile.to_dict() if profile else None
+        return self._cached('profile', user_id, load)
     
     def update_user_profile(self, user_id: int, info_type: str, info_value: str) -> Dict[str, Any]:
         """Update user profile based on intent classification"""
@@ -140,24 +229,39 @@ class DatabaseService:
                 session.add(profile)
             
             profile.update_profile_data(info_type, info_value)
-            return profile.to_dict()
+            result = profile.to_dict()
+        self.invalidate('profile', user_id)
+        return result
     
     # Session Management - Keep for chat functionality
     def create_chat_session(self, user_id: Optional[int] = None, session_id: Optional[str] = None) -> str:
         """Create a new chat session and return session_id"""
-        with get_db_session() as session:
-            chat_session = ChatSession.create_session(user_id=user_id, session_id=session_id)
-            session.add(chat_session)
-            session.flush()  # Ensure we get the session_id
-            return chat_session.session_id
+        try:
+            with get_db_session() as session:
+                chat_session = ChatSession.create_session(user_id=user_id, session_id=session_id)
+                session.add(chat_session)
+                session.flush()  # Ensure we get the session_id
+                created_id = chat_session.session_id
+        except IntegrityError:
+            if not session_id:
+                raise
+            # Created meanwhile (e.g. by another worker while this one cached it as missing)
+            created_id = session_id
+        self.invalidate('chat_session', created_id)
+        return created_id
     
     def get_chat_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get chat session by ID"""
-        with get_db_session() as session:
-            chat_session = session.query(ChatSession).filter(
-                ChatSession.session_id == session_id
-            ).first()
-            return chat_session.to_dict() if chat_session else None
+        """
+        Get chat session by ID.
+        Cached, so message_count and last_activity may lag by up to DB_CACHE_SESSION_TTL seconds.
+        """
+        def load():
+            with get_db_session() as session:
+                chat_session = session.query(ChatSession).filter(
+                    ChatSession.session_id == session_id
+                ).first()
+                return chat_session.to_dict() if chat_session else None
+        return self._cached('chat_session', session_id, load, negative=True)
     
     def get_user_sessions(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent chat sessions for a user"""
@@ -189,34 +293,102 @@ class DatabaseService:
             # Update session activity using the same DB session
             self.update_session_activity(session_id, session=session)
             
-            message = ChatMessage(
-                session_id=session_id,
-                message_type=message_type,
-                content=content,
-                intent=intent,
-                extra_data=extra_data or {}
-            )
+            message = self.message_model.create(session_id, message_type, content, intent, extra_data)
             session.add(message)
             session.flush()
             return message.to_dict()
     
     def get_session_messages(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get messages for a session"""
+        """Get messages for a session (in compact mode, merged with its legacy chat_messages rows)"""
         with get_db_session() as session:
-            messages = session.query(ChatMessage).filter(
-                ChatMessage.session_id == session_id
-            ).order_by(ChatMessage.created_at).limit(limit).all()
-            
-            return [m.to_dict() for m in messages]
+            # Messages saved in one transaction share created_at on Postgres; id keeps their order
+            per_model = [[m.to_dict() for m in session.query(Message).filter(
+                Message.session_id == session_id
+            ).order_by(Message.created_at, Message.id).limit(limit)] for Message in self._message_models()]
+        return list(heapq.merge(*per_model, key=message_order))[:limit]
     
     def clear_session_messages(self, session_id: str) -> bool:
         """Clear all messages for a session"""
         with get_db_session() as session:
-            deleted_count = session.query(ChatMessage).filter(
-                ChatMessage.session_id == session_id
-            ).delete()
+            deleted_count = sum(session.query(Message).filter(
+                Message.session_id == session_id
+            ).delete() for Message in self._message_models())
             return deleted_count > 0
-    
+
+    def iter_session_messages(self, session_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Yield all messages of a session, oldest first, reading batch_size rows per query.
+        In compact mode legacy chat_messages rows are merged in by created_at.
+        """
+        def batches(Message):
+            last_id = 0
+            while True:
+                with get_db_session() as session:
+                    batch = [m.to_dict() for m in session.query(Message).filter(
+                        Message.session_id == session_id,
+                        Message.id > last_id
+                    ).order_by(Message.id).limit(batch_size)]
+                yield from batch
+                if len(batch) < batch_size:
+                    return
+                last_id = batch[-1]['id']
+        
+        yield from heapq.merge(*(batches(Message) for Message in self._message_models()),
+                               key=message_order)
+
+    def bulk_save_messages(self, session_id: str, messages: Iterable[Dict[str, Any]],
+                           replace: bool = False, batch_size: int = 1000, user_id: Optional[int] = None) -> int:
+        """
+        Insert many messages in one transaction, batch_size rows per statement.
+
+        Args:
+            session_id: Session the messages belong to; created in the same transaction if missing
+            messages: Dicts with message_type, content and optionally intent, extra_data, created_at;
+                may be a generator, which is consumed as the rows are written. If it raises,
+                nothing is saved (not even a newly created session).
+            replace: Delete the session's existing messages (and any archived copy) first
+            user_id: Owner of the session if it has to be created
+
+        Returns:
+            Number of messages saved
+        """
+        parse = lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+        saved = 0
+        with get_db_session() as session:
+            chat_session = session.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+            if not chat_session:
+                chat_session = ChatSession.create_session(user_id=user_id, session_id=session_id)
+                session.add(chat_session)
+                session.flush()
+            if replace:
+                for Message in self._message_models():
+                    session.query(Message).filter(
+                        Message.session_id == session_id
+                    ).delete(synchronize_session=False)
+            batch = []
+            for m in messages:
+                message = self.message_model.create(
+                    session_id, m['message_type'], m['content'], m.get('intent'), m.get('extra_data')
+                )
+                if m.get('created_at'):
+                    message.created_at = parse(m['created_at'])
+                batch.append(message)
+                if len(batch) >= batch_size:
+                    session.bulk_save_objects(batch)
+                    saved += len(batch)
+                    batch = []
+            if batch:
+                session.bulk_save_objects(batch)
+                saved += len(batch)
+
+            chat_session.message_count = saved if replace else (chat_session.message_count or 0) + saved
+            chat_session.last_activity = datetime.now(timezone.utc)
+        if replace and session_id in self.archive:
+            # The archived messages are superseded; restoring them later would undo the replace
+            after_commit(lambda: self.archive.forget(session_id))
+        self.invalidate('chat_session', session_id)
+        return saved
+
     # Job Application Management - Keep for future functionality
     def save_job_application(self, user_id: int, job_url: Optional[str] = None,
                            job_description: Optional[str] = None, company_name: Optional[str] = None,
@@ -276,8 +448,226 @@ class DatabaseService:
             for old_session in old_sessions:
                 session.delete(old_session)
             
+            if self.message_model is not ChatMessage and old_sessions:
+                # Compact messages have no FK cascade
+                session.query(self.message_model).filter(
+                    self.message_model.session_id.in_([s.session_id for s in old_sessions])
+                ).delete(synchronize_session=False)
+            
             return len(old_sessions)
     
+    # Cold storage
+    def _message_models(self):
+        """Models that may hold a session's messages (legacy rows stay in chat_messages until migrated)"""
+        return [ChatMessage] if self.message_model is ChatMessage else [ChatMessage, self.message_model]
+    
+    def archive_inactive_sessions(self, days_old: int = 90, batch_size: int = 500) -> int:
+        """
+        Move sessions inactive for days_old days, with their messages, to the session archive.
+        
+        Returns:
+            Number of sessions archived
+        """
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_old)
+        archived = 0
+        last_id = 0
+        while True:
+            with get_db_session() as session:
+                old_sessions = session.query(ChatSession).filter(
+                    ChatSession.last_activity < cutoff_date,
+                    ChatSession.id > last_id
+                ).order_by(ChatSession.id).limit(batch_size).all()
+                if not old_sessions:
+                    return archived
+                last_id = old_sessions[-1].id
+                session_ids = [s.session_id for s in old_sessions]
+                
+                messages = {session_id: [] for session_id in session_ids}
+                for Message in self._message_models():
+                    for message in session.query(Message).filter(
+                        Message.session_id.in_(session_ids)
+                    ).order_by(Message.created_at, Message.id):
+                        messages[message.session_id].append(message.to_dict())
+                records = [{
+                    'session': s.to_dict(),
+                    'messages': sorted(messages[s.session_id], key=lambda m: m['created_at'] or '')
+                } for s in old_sessions]
+            
+            # Files are durable before any row is deleted
+            self.archive.write(records)
+            
+            with get_db_session() as session:
+                # Sessions that became active while their files were written stay in the database
+                still_inactive = [row.session_id for row in session.query(ChatSession.session_id).filter(
+                    ChatSession.session_id.in_(session_ids),
+                    ChatSession.last_activity < cutoff_date
+                )]
+                for Message in self._message_models():
+                    session.query(Message).filter(
+                        Message.session_id.in_(still_inactive)
+                    ).delete(synchronize_session=False)
+                session.query(ChatSession).filter(
+                    ChatSession.session_id.in_(still_inactive)
+                ).delete(synchronize_session=False)
+            
+            self.archive.forget(*set(session_ids) - set(still_inactive))
+            for session_id in still_inactive:
+                self.invalidate('chat_session', session_id)
+            archived += len(still_inactive)
+            print(f"🧊 Archived {archived} sessions")
+    
+    def restore_archived_session(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Move an archived session and its messages back into the database.
+        
+        Returns:
+            The restored messages (empty if the session isn't archived)
+        """
+        if session_id not in self.archive:
+            return []
+        
+        with self._restore_lock:
+            record = self.archive.read(session_id)
+            if record is None:  # Restored by another thread meanwhile
+                return []
+            data = record['session']
+            parse = lambda value: datetime.fromisoformat(value) if value else None
+            
+            with get_db_session() as session:
+                chat_session = session.query(ChatSession).filter(
+                    ChatSession.session_id == session_id
+                ).first()
+                if not chat_session:
+                    chat_session = ChatSession.create_session(session_id=session_id)
+                    session.add(chat_session)
+                if not chat_session.user_id and data.get('user_id') and session.get(User, data['user_id']):
+                    chat_session.user_id = data['user_id']
+                chat_session.title = chat_session.title or data.get('title')
+                chat_session.created_at = parse(data.get('created_at')) or chat_session.created_at
+                chat_session.message_count = data.get('message_count') or 0
+                chat_session.first_message_time = parse(data.get('first_message_time'))
+                chat_session.last_activity = datetime.now(timezone.utc)
+                
+                # Another worker may have restored it first
+                already_restored = session.query(self.message_model.id).filter(
+                    self.message_model.session_id == session_id
+                ).first() is not None
+                restored = []
+                if not already_restored:
+                    for m in record['messages']:
+                        message = self.message_model.create(
+                            session_id, m['message_type'], m['content'], m.get('intent'), m.get('extra_data')
+                        )
+                        message.created_at = parse(m.get('created_at')) or message.created_at
+                        session.add(message)
+                        restored.append(message)
+                    session.flush()
+                restored = [m.to_dict() for m in restored]
+            
+            # Inside a unit of work the rows are only durable once it commits; until then the
+            # archive keeps its copy, and a rolled-back restore leaves the session archived
+            after_commit(lambda: self.archive.forget(session_id))
+        self.invalidate('chat_session', session_id)
+        print(f"♻️  Restored archived session {session_id[:8]} ({len(restored)} messages)")
+        return restored
+    
+    # Token accounting
+    def record_token_usage(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Add a batch of aggregated usage entries to the daily token_usage totals.
+
+        Each entry has day, session_id, intent, model, calls, prompt_tokens, cached_tokens,
+        completion_tokens and cost_usd. Returns the number of rows touched.
+        """
+        if not entries:
+            return 0
+        counters = ('calls', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'cost_usd')
+        for attempt in range(2):
+            try:
+                with get_db_session() as session:
+                    session_ids = {entry['session_id'] for entry in entries}
+                    # Sign-up and login link the user through users.session_id; chat_sessions.user_id
+                    # is only a fallback for sessions created for a known user
+                    owners = dict(session.query(User.session_id, User.id).filter(
+                        User.session_id.in_(session_ids)
+                    ).all())
+                    unowned = session_ids - set(owners)
+                    if unowned:
+                        owners.update(session.query(ChatSession.session_id, ChatSession.user_id).filter(
+                            ChatSession.session_id.in_(unowned), ChatSession.user_id.isnot(None)
+                        ).all())
+                    for entry in entries:
+                        row = session.query(TokenUsage).filter(
+                            TokenUsage.day == entry['day'],
+                            TokenUsage.session_id == entry['session_id'],
+                            TokenUsage.intent == entry['intent'],
+                            TokenUsage.model == entry['model']
+                        ).first()
+                        if row is None:
+                            row = TokenUsage(day=entry['day'], session_id=entry['session_id'],
+                                             intent=entry['intent'], model=entry['model'],
+                                             calls=0, prompt_tokens=0, cached_tokens=0,
+                                             completion_tokens=0, cost_usd=0.0)
+                            session.add(row)
+                        for name in counters:
+                            setattr(row, name, (getattr(row, name) or 0) + entry.get(name, 0))
+                        row.user_id = owners.get(entry['session_id'], row.user_id)
+                return len(entries)
+            except IntegrityError:
+                # Another process inserted one of the keys first; the retry updates its row
+                if attempt:
+                    raise
+
+    def get_usage_report(self, days: int = 7, limit: int = 10) -> Dict[str, Any]:
+        """Token and cost totals over the last days: top users and sessions, and per intent and model"""
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date()
+        totals = (
+            func.sum(TokenUsage.cost_usd).label('cost_usd'),
+            func.sum(TokenUsage.calls).label('calls'),
+            func.sum(TokenUsage.prompt_tokens).label('prompt_tokens'),
+            func.sum(TokenUsage.cached_tokens).label('cached_tokens'),
+            func.sum(TokenUsage.completion_tokens).label('completion_tokens')
+        )
+
+        def rows(key, group, top=None):
+            query = session.query(group, *totals).filter(TokenUsage.day >= since)
+            if key == 'user_id':
+                query = query.filter(TokenUsage.user_id.isnot(None))
+            query = query.group_by(group).order_by(desc('cost_usd'))
+            if top:
+                query = query.limit(top)
+            report = []
+            for row in query.all():
+                calls = int(row.calls or 0)
+                report.append({
+                    key: row[0],
+                    'calls': calls,
+                    'prompt_tokens': int(row.prompt_tokens or 0),
+                    'cached_tokens': int(row.cached_tokens or 0),
+                    'completion_tokens': int(row.completion_tokens or 0),
+                    'cost_usd': round(row.cost_usd or 0.0, 6),
+                    'avg_cost_per_call': round((row.cost_usd or 0.0) / calls, 6) if calls else None
+                })
+            return report
+
+        with get_db_session() as session:
+            overall = session.query(*totals).filter(TokenUsage.day >= since).one()
+            return {
+                'since': since.isoformat(),
+                'days': days,
+                'total': {
+                    'calls': int(overall.calls or 0),
+                    'prompt_tokens': int(overall.prompt_tokens or 0),
+                    'cached_tokens': int(overall.cached_tokens or 0),
+                    'completion_tokens': int(overall.completion_tokens or 0),
+                    'cost_usd': round(overall.cost_usd or 0.0, 6)
+                },
+                'top_users': rows('user_id', TokenUsage.user_id, limit),
+                'top_sessions': rows('session_id', TokenUsage.session_id, limit),
+                'by_intent': rows('intent', TokenUsage.intent),
+                'by_model': rows('model', TokenUsage.model)
+            }
+
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """Get user statistics"""
         with get_db_session() as session:
@@ -289,7 +679,9 @@ class DatabaseService:
                 ChatSession.user_id == user_id
             ).count()
             
-            total_messages = session.query(ChatMessage).join(ChatSession).filter(
+            total_messages = session.query(self.message_model).join(
+                ChatSession, ChatSession.session_id == self.message_model.session_id
+            ).filter(
                 ChatSession.user_id == user_id
             ).count()
             
@@ -0,0 +1,238 @@
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+
+def owner_id_for(memory_manager):
+    """Documents belong to the logged-in user when known, otherwise to the chat session."""
+    user_id = getattr(memory_manager, 'user_id', None)
+    return f"user-{user_id}" if user_id else f"session-{memory_manager.session_id}"
+
+
+def chunk_text(text, chunk_size=800, overlap=150):
+    """
+    Split text into overlapping chunks of roughly chunk_size characters.
+    Chunks end on paragraph or line breaks where possible so resume sections stay together.
+    """
+    text = re.sub(r'\n{3,}', '\n\n', text.strip())
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            for separator in ('\n\n', '\n', '. ', ' '):
+                split = text.rfind(separator, start + chunk_size // 2, end)
+                if split != -1:
+                    end = split + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class _OwnerIndex:
+    """Chunks and their embeddings for one owner."""
+
+    def __init__(self, vectors, chunks, version=None):
+        self.vectors = vectors  # float16 (n_chunks, dim) matrix
+        self.chunks = chunks    # [{'doc_id', 'doc_type', 'filename', 'text'}]
+        self.version = version  # (inode, mtime) of the file it was read from
+
+
+class DocumentStore:
+    """
+    Per-user store of uploaded documents for retrieval.
+
+    Documents are split into chunks, embedded, and saved under root_dir/<owner>/ as one
+    index.npz holding the float16 vectors and the chunks (as JSON), so readers always see a
+    matching pair. Later turns retrieve only the top-k chunks relevant to the question instead
+    of pasting whole documents into the prompt.
+
+    Several workers can share root_dir: writes hold a lock file in the owner's directory and
+    re-read the index under it, and cached indexes are reloaded when index.npz is replaced.
+    """
+
+    def __init__(self, embedder, root_dir=None, chunk_size=None, overlap=None, top_k=None,
+                 min_score=None, max_chunks_per_owner=None, cache_size=256):
+        """
+        Initialize the document store.
+
+        Args:
+            embedder: Object with embed(text), embed_many(texts) and a dim attribute
+            root_dir: Directory for the per-owner indexes (DOCUMENT_STORE_DIR)
+            chunk_size: Target chunk length in characters (DOCUMENT_CHUNK_SIZE)
+            overlap: Characters shared between neighbouring chunks (DOCUMENT_CHUNK_OVERLAP)
+            top_k: Chunks returned per query (DOCUMENT_TOP_K)
+            min_score: Minimum cosine similarity for a chunk to be returned (DOCUMENT_MIN_SCORE)
+            max_chunks_per_owner: Oldest chunks are dropped beyond this (DOCUMENT_MAX_CHUNKS)
+            cache_size: Number of owner indexes kept in memory
+        """
+        self.embedder = embedder
+        self.root_dir = root_dir or os.getenv('DOCUMENT_STORE_DIR', 'document_store')
+        self.chunk_size = chunk_size or int(os.getenv('DOCUMENT_CHUNK_SIZE', '800'))
+        self.overlap = overlap if overlap is not None else int(os.getenv('DOCUMENT_CHUNK_OVERLAP', '150'))
+        self.top_k = top_k or int(os.getenv('DOCUMENT_TOP_K', '4'))
+        self.min_score = min_score if min_score is not None else float(os.getenv('DOCUMENT_MIN_SCORE', '0.05'))
+        self.max_chunks = max_chunks_per_owner or int(os.getenv('DOCUMENT_MAX_CHUNKS', '200'))
+        self.indexes = TTLCache(max_size=cache_size, ttl_seconds=3600)
+        self.lock = threading.Lock()  # Guards owner_locks
+        self.owner_locks = {}  # {owner_id: threading.Lock}, so writers of different owners don't wait
+
+    def _owner_dir(self, owner_id):
+        return os.path.join(self.root_dir, re.sub(r'[^A-Za-z0-9_-]', '_', owner_id))
+
+    @staticmethod
+    def _version(stat):
+        """Identify one saved index; every save replaces the file, so the inode changes too."""
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    @contextmanager
+    def _owner_lock(self, owner_id):
+        """Serialize writes to an owner's index across threads and processes."""
+        with self.lock:
+            lock = self.owner_locks.setdefault(owner_id, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            owner_dir = self._owner_dir(owner_id)
+            os.makedirs(owner_dir, exist_ok=True)
+            with open(os.path.join(owner_dir, '.lock'), 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _load(self, owner_id):
+        """Return the owner's index from memory or disk (None if they have no documents)."""
+        owner_dir = self._owner_dir(owner_id)
+        try:
+            # The open file is the version we read even if a writer replaces it meanwhile
+            with open(os.path.join(owner_dir, 'index.npz'), 'rb') as f:
+                version = self._version(os.fstat(f.fileno()))
+                index = self.indexes.get(owner_id)
+                if index is not None and index.version == version:
+                    return index
+                with np.load(f) as data:
+                    vectors, chunks = data['vectors'], json.loads(str(data['chunks']))
+        except FileNotFoundError:
+            self.indexes.delete(owner_id)
+            return self._load_legacy(owner_id)
+        if vectors.shape != (len(chunks), self.embedder.dim):
+            # Written with a different embedder: re-embed from the chunk text
+            vectors = self.embedder.embed_many([c['text'] for c in chunks]).astype(np.float16)
+        index = _OwnerIndex(vectors, chunks, version)
+        self.indexes.set(owner_id, index)
+        return index
+
+    def _load_legacy(self, owner_id):
+        """Read an index saved as separate vectors.npy and chunks.json (replaced on the next save)."""
+        owner_dir = self._owner_dir(owner_id)
+        try:
+            with open(os.path.join(owner_dir, 'chunks.json')) as f:
+                chunks = json.load(f)
+        except FileNotFoundError:
+            return None
+        # The two files weren't written atomically together, so always re-embed
+        vectors = self.embedder.embed_many([c['text'] for c in chunks]).astype(np.float16)
+        return _OwnerIndex(vectors, chunks)
+
+    def _save(self, owner_id, index):
+        """Write the index atomically (temp file + rename)."""
+        owner_dir = self._owner_dir(owner_id)
+        os.makedirs(owner_dir, exist_ok=True)
+        index_tmp = os.path.join(owner_dir, 'index.tmp.npz')
+        with open(index_tmp, 'wb') as f:
+            np.savez(f, vectors=index.vectors, chunks=np.array(json.dumps(index.chunks)))
+        os.replace(index_tmp, os.path.join(owner_dir, 'index.npz'))
+        index.version = self._version(os.stat(os.path.join(owner_dir, 'index.npz')))
+        for name in ('vectors.npy', 'chunks.json'):
+            try:
+                os.remove(os.path.join(owner_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def add_document(self, owner_id, text, doc_type='document', filename=None):
+        """
+        Chunk, embed and persist a document.
+
+        Returns:
+            The new document's ID
+        """
+        texts = chunk_text(text, self.chunk_size, self.overlap)
+        if not texts:
+            return None
+        doc_id = str(uuid.uuid4())
+        vectors = self.embedder.embed_many(texts).astype(np.float16)
+        chunks = [{'doc_id': doc_id, 'doc_type': doc_type, 'filename': filename, 'text': t} for t in texts]
+
+        with self._owner_lock(owner_id):
+            # Another worker may have added documents since we cached the index
+            index = self._load(owner_id)
+            if index is None:
+                index = _OwnerIndex(np.zeros((0, self.embedder.dim), dtype=np.float16), [])
+            index = _OwnerIndex(
+                np.vstack([index.vectors, vectors])[-self.max_chunks:],
+                (index.chunks + chunks)[-self.max_chunks:]
+            )
+            self._save(owner_id, index)
+            self.indexes.set(owner_id, index)
+        print(f"📚 Indexed {doc_type} '{filename}' as {len(chunks)} chunks for {owner_id[:16]}")
+        return doc_id
+
+    def has_documents(self, owner_id):
+        index = self._load(owner_id)
+        return bool(index and index.chunks)
+
+    def search(self, owner_id, query, top_k=None):
+        """Return the top-k chunks most similar to the query, each with a 'score'."""
+        index = self._load(owner_id)
+        if index is None or not index.chunks:
+            return []
+        scores = index.vectors.astype(np.float32) @ self.embedder.embed(query)
+        top_k = min(top_k or self.top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            dict(index.chunks[i], score=round(float(scores[i]), 4))
+            for i in best if scores[i] >= self.min_score
+        ]
+
+    def delete_owner(self, owner_id):
+        """Remove all of an owner's documents."""
+        with self._owner_lock(owner_id):
+            self.indexes.delete(owner_id)
+            owner_dir = self._owner_dir(owner_id)
+            for name in ('index.npz', 'vectors.npy', 'chunks.json'):
+                try:
+                    os.remove(os.path.join(owner_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def build_context(self, owner_id, query, top_k=None):
+        """Format the relevant chunks for the prompt, or return None if there are none."""
+        results = self.search(owner_id, query, top_k)
+        if not results:
+            return None
+        excerpts = [
+            f"[{r['doc_type']}{': ' + r['filename'] if r['filename'] else ''}]\n{r['text']}"
+            for r in results
+        ]
+        return "Relevant excerpts from the user's uploaded documents:\n\n" + "\n\n---\n\n".join(excerpts)
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from usage_tracker import usage_tracker
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an the is are am be was were do does did i me my you your it its of to in on for with and or "
+    "should can could would will how what which when where why ok okay".split()
+)
+
+
+@lru_cache(maxsize=65536)
+def _feature_slot(feature, dim):
+    """Map a feature string to a (bucket, sign) pair with a stable hash."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+    return digest % dim, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embeddings using the hashing trick.
+
+    Words and their character trigrams are hashed into a fixed number of buckets, so
+    rephrasings that share vocabulary ("resume"/"resumes", reordered words) land close
+    together. No network or model download is needed, which keeps tests offline.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _features(self, text):
+        for word in TOKEN_PATTERN.findall(text.lower()):
+            if word in STOPWORDS:
+                continue
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def embed(self, text):
+        """Return an L2-normalized float32 vector for the text."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            bucket, sign = _feature_slot(feature, self.dim)
+            vector[bucket] += sign * weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts):
+        """Return a (len(texts), dim) matrix of embeddings."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.embed(text) for text in texts])
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI embeddings API."""
+
+    name = 'openai'
+
+    def __init__(self, client, model='text-embedding-3-small', dim=1536):
+        self.client = client
+        self.model = model
+        self.dim = dim
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        usage = getattr(response, 'usage', None)
+        usage_tracker.record(self.model, 'embedding', getattr(usage, 'prompt_tokens', 0) or 0)
+        matrix = np.array([item.embedding for item in response.data], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+def get_embedder(client=None):
+    """Build the embedder selected by the EMBEDDING_BACKEND environment variable."""
+    backend = os.getenv('EMBEDDING_BACKEND', 'hashing').lower()
+    if backend == 'openai' and client is not None:
+        return OpenAIEmbedder(client, model=os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'))
+    return HashingEmbedder(dim=int(os.getenv('EMBEDDING_DIM', '512')))
@@ -1,105 +1,207 @@
-from utils import Website
-from user_intent import get_system_prompt
+import json
+import os
+import time
+from utils import Website, estimate_tokens, estimate_message_tokens
+from user_intent import get_system_prompt, get_single_pass_tools, SINGLE_PASS_PROMPT, PERSONAL_DATA_PATTERNS
+from llm_admission import AdmissionRejected
+from model_router import ModelRouter
+from prompt_cache import prompt_cache_stats, cached_tokens_from_usage
+from document_store import owner_id_for
+
+# Replies used when the model picks an action but leaves out (or garbles) its arguments
+MISSING_URL_REPLY = "I couldn't find the job posting link. Please paste the full URL and I'll tailor your resume to it."
+MISSING_ARGS_REPLY = "Sorry, I didn't quite catch that. Could you rephrase it?"
 
 class GPTService:
     """Service class to handle all GPT-related operations."""
     
-    def __init__(self, client, response_handlers=None):
+    def __init__(self, client, response_handlers=None, router=None, answer_cache=None, document_store=None):
         """Initialize the GPT service with OpenAI client."""
         self.client = client
         self.system_prompt = get_system_prompt()
         self.response_handlers = response_handlers
+        self.router = router or ModelRouter()
+        self.single_pass_tools = get_single_pass_tools()
+        self.answer_cache = answer_cache  # SemanticCache for non-personalized career answers
+        self.answer_cache_max_chars = int(os.getenv('ANSWER_CACHE_MAX_CHARS', '300'))
+        self.document_store = document_store  # DocumentStore with the user's uploaded documents
+    
+    def retrieve_document_context(self, memory_manager, query):
+        """Return the uploaded-document excerpts relevant to the query, or None."""
+        if self.document_store is None or not query:
+            return None
+        try:
+            return self.document_store.build_context(owner_id_for(memory_manager), query)
+        except Exception as e:
+            print(f"⚠️  Document retrieval failed: {e}")
+            return None
 
-    def generate_streaming_response(self, intent_info, memory_manager, user_input):
-        """Generate a streaming response based on the intent."""
-        intent = intent_info['intent']
-        args = intent_info.get('args', {})
-        
-        # Get user info and chat history
+    def _local_response(self, intent, args, memory_manager):
+        """Answer intents that don't need GPT; returns None for GPT-powered intents."""
         user_info = memory_manager.get_user_info()
-        chat_history = memory_manager.get_chat_history()
         
-        # Handle simple non-GPT responses
         if intent == 'handle_greeting':
-            yield self.response_handlers.handle_greeting(args['greeting'], user_info)
-            return
+            return self.response_handlers.handle_greeting(args.get('greeting', ''), user_info)
             
         elif intent == 'handle_goodbye':
-            yield self.response_handlers.handle_goodbye(args['farewell'], user_info)
-            return
+            return self.response_handlers.handle_goodbye(args.get('farewell', ''), user_info)
             
         elif intent == 'handle_confirmation':
-            yield self.response_handlers.handle_confirmation(args['confirmation'], user_info)
-            return
+            return self.response_handlers.handle_confirmation(args.get('confirmation', ''), user_info)
             
         elif intent == 'handle_rejection':
-            yield self.response_handlers.handle_rejection(args['rejection'], user_info)
-            return
+            return self.response_handlers.handle_rejection(args.get('rejection', ''), user_info)
             
         elif intent == 'store_personal_info':
             # Store the personal information
-            info_type = args['info_type']
-            info_value = args['info_value']
+            info_type = args.get('info_type')
+            info_value = args.get('info_value')
+            if not info_type or not info_value:
+                return MISSING_ARGS_REPLY
             memory_manager.store_user_info(info_type, info_value)
             
             # Create a more specific confirmation message based on what was stored
             if info_type == 'experience':
-                yield f"Got it! I've noted that you have {info_value}. This will be helpful for tailoring your resume."
+                return f"Got it! I've noted that you have {info_value}. This will be helpful for tailoring your resume."
             elif info_type == 'current_role':
-                yield f"Perfect! I've noted that you work as {info_value}. Your background will be valuable for your career goals."
+                return f"Perfect! I've noted that you work as {info_value}. Your background will be valuable for your career goals."
             elif info_type == 'name':
-                yield f"Nice to meet you, {info_value}! How can I help with your career today?"
+                return f"Nice to meet you, {info_value}! How can I help with your career today?"
             elif info_type == 'career_interest':
-                yield f"Excellent! I've noted your interest in {info_value}. I'm here to help you with your job search in this field."
+                return f"Excellent! I've noted your interest in {info_value}. I'm here to help you with your job search in this field."
             else:
-                yield f"Thanks for sharing that information! I've noted your {info_type}: {info_value}."
-            return
+                return f"Thanks for sharing that information! I've noted your {info_type}: {info_value}."
             
         elif intent == 'handle_off_topic':
-            yield "I'm specialized in helping with resumes, job applications, and career advice. How can I assist you with your career today?"
+            return "I'm specialized in helping with resumes, job applications, and career advice. How can I assist you with your career today?"
+        
+        return None
+
+    def generate_streaming_response(self, intent_info, memory_manager, user_input):
+        """Generate a streaming response based on the intent."""
+        intent = intent_info['intent']
+        args = intent_info.get('args', {})
+        
+        # Handle simple non-GPT responses
+        local_response = self._local_response(intent, args, memory_manager)
+        if local_response is not None:
+            yield local_response
             return
         
-        # Handle GPT-powered responses with streaming
-        elif intent == 'process_job_url':
-            yield from self.generate_resume_sections_stream(args['url'], user_info, chat_history)
+        # Get user info, chat history and the relevant parts of any uploaded documents
+        user_info = memory_manager.get_user_info()
+        chat_history = memory_manager.get_chat_history()
+        documents = self.retrieve_document_context(memory_manager, user_input)
+        
+        # Handle GPT-powered responses with streaming. The model may leave out arguments, so
+        # missing ones fall back to the user's own message.
+        question = args.get('question') or user_input
+        if intent == 'process_job_url':
+            if args.get('url'):
+                yield from self.generate_resume_sections_stream(args['url'], user_info, chat_history, documents)
+            else:
+                yield MISSING_URL_REPLY
             
         elif intent == 'process_job_description':
-            yield from self.process_job_description_stream(args['job_description'], user_info, chat_history)
+            yield from self.process_job_description_stream(args.get('job_description') or user_input, user_info,
+                                                           chat_history, documents)
             
         elif intent == 'rewrite_resume_section':
-            section = args['section']
-            prompt = f"Please rewrite the {section} section of my resume to make it more effective."
-            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history)
+            section = args.get('section')
+            prompt = f"Please rewrite the {section} section of my resume to make it more effective." if section else user_input
+            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history, intent=intent,
+                                                      document_context=documents)
             
         elif intent == 'answer_career_question':
-            yield from self.chat_about_resumes_stream(args['question'], user_info, chat_history)
+            yield from self.chat_about_resumes_stream(question, user_info, chat_history,
+                                                      document_context=documents)
             
         elif intent == 'answer_yes_no_question':
-            prompt = f"{args['question']}\n\nPlease answer in one word: yes or no."
-            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history)
+            prompt = f"{question}\n\nPlease answer in one word: yes or no."
+            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history, intent=intent,
+                                                      document_context=documents)
 
         elif intent == 'answer_with_user_instuctions':
-            prompt = f"{args['question']}\n\nPlease answer using this style: {args['style']}."
-            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history)
+            style = args.get('style')
+            prompt = f"{question}\n\nPlease answer using this style: {style}." if style else question
+            yield from self.chat_about_resumes_stream(prompt, user_info, chat_history, intent=intent, style=style,
+                                                      document_context=documents)
             
         else:
             # Default to chat_about_resumes for unknown intents
-            yield from self.chat_about_resumes_stream(user_input, user_info, chat_history)
+            yield from self.chat_about_resumes_stream(user_input, user_info, chat_history, document_context=documents)
     
-    def _create_messages(self, content, is_website=True, user_info=None, chat_history=None):
-        """Create message format for GPT API."""
+    def generate_single_pass_response(self, memory_manager, user_input):
+        """
+        Classify and answer in a single streaming call.
+        
+        The action intents are offered as tools. A direct answer is streamed as it arrives;
+        tool calls (storing info, job URLs and descriptions, canned replies) are executed once the
+        stream ends. Direct answers use the single_pass route, so per-intent routes such as
+        yes_no or short_answer don't apply to them.
+        """
+        user_info = memory_manager.get_user_info()
+        chat_history = memory_manager.get_chat_history()
+        documents = self.retrieve_document_context(memory_manager, user_input)
+        messages = self._create_messages(user_input, is_website=False, user_info=user_info, chat_history=chat_history,
+                                         document_context=documents)
+        # Static tool guidance sits right after the system prompt to keep the prefix cacheable
+        messages.insert(1, {"role": "system", "content": SINGLE_PASS_PROMPT})
+        
+        tool_calls = {}
+        yield from self._stream_response_generator(
+            messages, temperature=0.7, intent='single_pass', tools=self.single_pass_tools, tool_calls=tool_calls
+        )
+        
+        for position, index in enumerate(sorted(tool_calls)):
+            name = tool_calls[index]['name']
+            try:
+                args = json.loads(tool_calls[index]['arguments'] or '{}')
+            except ValueError:
+                args = {}
+            if position > 0:
+                yield "\n\n"
+            
+            local_response = self._local_response(name, args, memory_manager)
+            if local_response is not None:
+                yield local_response
+            elif name == 'process_job_url':
+                if args.get('url'):
+                    yield from self.generate_resume_sections_stream(args['url'], memory_manager.get_user_info(),
+                                                                    chat_history, documents)
+                else:
+                    yield MISSING_URL_REPLY
+            elif name == 'process_job_description':
+                # Long descriptions can be cut off in the tool arguments; the message itself is the description
+                yield from self.process_job_description_stream(args.get('job_description') or user_input,
+                                                               memory_manager.get_user_info(), chat_history, documents)
+    
+    def _create_messages(self, content, is_website=True, user_info=None, chat_history=None, document_context=None):
+        """
+        Create message format for GPT API.
+        
+        Messages are ordered from most to least stable so consecutive calls share the longest
+        possible prefix for provider-side prompt caching: the static system prompt, then the
+        chat history, then user info (changes whenever something is stored), then document
+        excerpts retrieved for this request, then the current request. The history only grows
+        until the memory window is full; after that each turn evicts the oldest one, so from
+        then on only the system prompt is a stable prefix.
+        """
         messages = [
             {"role": "system", "content": self.system_prompt},
         ]
         
+        # Add chat history if available
+        if chat_history:
+            messages.append({"role": "system", "content": f"Previous conversation:\n{chat_history}"})
+        
         # Add user info context if available
         if user_info and len(user_info) > 0:
             memory_context = self._build_memory_context(user_info)
             messages.append({"role": "system", "content": memory_context})
         
-        # Add chat history if available
-        if chat_history:
-            messages.append({"role": "system", "content": f"Previous conversation:\n{chat_history}"})
+        if document_context:
+            messages.append({"role": "system", "content": document_context})
         
         # Add current content
         if is_website:
@@ -134,89 +236,227 @@ class GPTService:
         
         return memory_context
     
-    def _stream_response_generator(self, messages, temperature=0.3):
-        """Generate streaming response from GPT as a generator."""
+    def _answer_cache_for(self, query, user_info, intent, document_context=None, chat_history=None):
+        """
+        Return the answer cache if the answer can be shared between users, else None.
+        Answers are personalized once any user info is stored, so only anonymous
+        career questions without personal data are cached. Questions asked mid-conversation
+        can depend on earlier turns ("and for a cover letter?"), so they skip the cache too.
+        """
+        if self.answer_cache is None or intent != 'answer_career_question' or document_context:
+            return None
+        if chat_history:
+            return None
+        if any((user_info or {}).values()) or len(query) > self.answer_cache_max_chars:
+            return None
+        if any(pattern.search(query.lower()) for pattern in PERSONAL_DATA_PATTERNS):
+            return None
+        return self.answer_cache
+    
+    def _route(self, messages, intent=None, style=None, temperature=None):
+        """Pick the route and completion parameters for a call."""
+        route = self.router.select(intent, estimate_message_tokens(messages), style)
+        return route, self.router.completion_params(route, temperature)
+    
+    def _stream_response_generator(self, messages, temperature=0.3, intent=None, style=None,
+                                   tools=None, tool_calls=None, outcome=None):
+        """
+        Generate streaming response from GPT as a generator.
+        
+        When tools are given, tool calls streamed by the model are collected into the
+        tool_calls dict as {index: {'name': ..., 'arguments': ...}}. If an outcome dict is
+        given, outcome['error'] is set once the stream ends.
+        """
+        route, params = self._route(messages, intent, style, temperature)
+        started = time.monotonic()
+        first_token_at = None
+        usage = None
+        served_model = None
+        completion_text = ""
+        error = False
         try:
+            if tools:
+                params = dict(params, tools=tools, tool_choice="auto")
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
                 messages=messages,
-                max_tokens=1500,
-                temperature=temperature,
-                stream=True
+                stream=True,
+                stream_options={"include_usage": True},
+                **params
             )
             
             for chunk in response:
+                # The final chunk carries usage and no choices
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                served_model = getattr(chunk, 'model', None) or served_model
+                if not chunk.choices:
+                    continue
+                if tool_calls is not None:
+                    for call in getattr(chunk.choices[0].delta, 'tool_calls', None) or []:
+                        entry = tool_calls.setdefault(call.index, {'name': '', 'arguments': ''})
+                        if call.function.name:
+                            entry['name'] = call.function.name
+                        if call.function.arguments:
+                            entry['arguments'] += call.function.arguments
                 if chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    completion_text += content
                     yield content  # Yield immediately without printing
                     
+        except AdmissionRejected:
+            # Surface capacity errors so the API can answer 503
+            error = True
+            raise
         except Exception as e:
+            error = True
             yield f"I apologize, but I encountered an error: {str(e)}"
+        finally:
+            if outcome is not None:
+                outcome['error'] = error
+            prompt_cache_stats.record(usage)
+            self.router.record(
+                route['name'],
+                time.monotonic() - started,
+                prompt_tokens=usage.prompt_tokens if usage else estimate_message_tokens(messages),
+                completion_tokens=usage.completion_tokens if usage else estimate_tokens(completion_text),
+                time_to_first_token=(first_token_at - started) if first_token_at else None,
+                error=error,
+                intent=intent,
+                cached_tokens=cached_tokens_from_usage(usage),
+                model=served_model
+            )
     
     # Keep the old non-streaming methods for backward compatibility
-    def _stream_response(self, messages, temperature=0.3):
+    def _stream_response(self, messages, temperature=0.3, intent=None, style=None, outcome=None):
         """Generate complete response from GPT (non-streaming)."""
+        route, params = self._route(messages, intent, style, temperature)
+        started = time.monotonic()
+        if outcome is not None:
+            outcome['error'] = True
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
                 messages=messages,
-                max_tokens=1500,
-                temperature=temperature,
-                stream=False
+                stream=False,
+                **params
             )
             
+            usage = getattr(response, 'usage', None)
+            prompt_cache_stats.record(usage)
+            self.router.record(
+                route['name'],
+                time.monotonic() - started,
+                prompt_tokens=usage.prompt_tokens if usage else estimate_message_tokens(messages),
+                completion_tokens=usage.completion_tokens if usage else estimate_tokens(response.choices[0].message.content),
+                intent=intent,
+                cached_tokens=cached_tokens_from_usage(usage),
+                model=getattr(response, 'model', None)
+            )
+            if outcome is not None:
+                outcome['error'] = False
             return response.choices[0].message.content
+        except AdmissionRejected:
+            self.router.record(route['name'], time.monotonic() - started, error=True, intent=intent)
+            raise
         except Exception as e:
+            self.router.record(route['name'], time.monotonic() - started, error=True, intent=intent)
             return f"I apologize, but I encountered an error: {str(e)}"
     
     # Streaming versions of the methods
-    def generate_resume_sections_stream(self, url, user_info=None, chat_history=None):
+    def generate_resume_sections_stream(self, url, user_info=None, chat_history=None, document_context=None):
         """Generate resume sections from a job posting URL with streaming."""
         try:
             website = Website(url)
-            messages = self._create_messages(website, is_website=True, user_info=user_info, chat_history=chat_history)
-            yield from self._stream_response_generator(messages, temperature=0.3)
+            messages = self._create_messages(website, is_website=True, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            yield from self._stream_response_generator(messages, temperature=0.3, intent='process_job_url')
+        except AdmissionRejected:
+            raise
         except Exception as e:
             yield f"Error processing URL: {e}"
     
-    def process_job_description_stream(self, text, user_info=None, chat_history=None):
+    def process_job_description_stream(self, text, user_info=None, chat_history=None, document_context=None):
         """Process a job description directly from text with streaming."""
         try:
-            messages = self._create_messages(text, is_website=False, user_info=user_info, chat_history=chat_history)
-            yield from self._stream_response_generator(messages, temperature=0.3)
+            messages = self._create_messages(text, is_website=False, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            yield from self._stream_response_generator(messages, temperature=0.3, intent='process_job_description')
+        except AdmissionRejected:
+            raise
         except Exception as e:
             yield f"Error processing job description: {e}"
     
-    def chat_about_resumes_stream(self, query, user_info=None, chat_history=None):
+    def chat_about_resumes_stream(self, query, user_info=None, chat_history=None,
+                                  intent='answer_career_question', style=None, document_context=None):
         """Chat about resume and career-related topics with streaming."""
         try:
-            messages = self._create_messages(query, is_website=False, user_info=user_info, chat_history=chat_history)
-            yield from self._stream_response_generator(messages, temperature=0.7)
+            cache = self._answer_cache_for(query, user_info, intent, document_context, chat_history)
+            if cache is not None:
+                cached = cache.get(query)
+                if cached is not None:
+                    yield cached
+                    return
+            
+            messages = self._create_messages(query, is_website=False, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            started = time.monotonic()
+            outcome = {}
+            answer = []
+            for chunk in self._stream_response_generator(messages, temperature=0.7, intent=intent, style=style,
+                                                         outcome=outcome):
+                answer.append(chunk)
+                yield chunk
+            if cache is not None and not outcome.get('error'):
+                cache.set(query, ''.join(answer), latency=time.monotonic() - started)
+        except AdmissionRejected:
+            raise
         except Exception as e:
             yield f"Error in chat response: {e}"
     
     # Keep non-streaming versions for other endpoints
-    def generate_resume_sections(self, url, user_info=None, chat_history=None):
+    def generate_resume_sections(self, url, user_info=None, chat_history=None, document_context=None):
         """Generate resume sections from a job posting URL."""
         try:
             website = Website(url)
-            messages = self._create_messages(website, is_website=True, user_info=user_info, chat_history=chat_history)
-            return self._stream_response(messages, temperature=0.3)
+            messages = self._create_messages(website, is_website=True, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            return self._stream_response(messages, temperature=0.3, intent='process_job_url')
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return f"Error processing URL: {e}"
     
-    def process_job_description(self, text, user_info=None, chat_history=None):
+    def process_job_description(self, text, user_info=None, chat_history=None, document_context=None):
         """Process a job description directly from text."""
         try:
-            messages = self._create_messages(text, is_website=False, user_info=user_info, chat_history=chat_history)
-            return self._stream_response(messages, temperature=0.3)
+            messages = self._create_messages(text, is_website=False, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            return self._stream_response(messages, temperature=0.3, intent='process_job_description')
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return f"Error processing job description: {e}"
     
-    def chat_about_resumes(self, query, user_info=None, chat_history=None):
+    def chat_about_resumes(self, query, user_info=None, chat_history=None,
+                           intent='answer_career_question', style=None, document_context=None):
         """Chat about resume and career-related topics."""
         try:
-            messages = self._create_messages(query, is_website=False, user_info=user_info, chat_history=chat_history)
-            return self._stream_response(messages, temperature=0.7)
+            cache = self._answer_cache_for(query, user_info, intent, document_context, chat_history)
+            if cache is not None:
+                cached = cache.get(query)
+                if cached is not None:
+                    return cached
+            
+            messages = self._create_messages(query, is_website=False, user_info=user_info, chat_history=chat_history,
+                                             document_context=document_context)
+            started = time.monotonic()
+            outcome = {}
+            answer = self._stream_response(messages, temperature=0.7, intent=intent, style=style, outcome=outcome)
+            if cache is not None and not outcome.get('error'):
+                cache.set(query, answer, latency=time.monotonic() - started)
+            return answer
+        except AdmissionRejected:
+            raise
         except Exception as e:
             return f"Error in chat response: {e}"
\ No newline at end of file
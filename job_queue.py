@@ -0,0 +1,300 @@
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, null
+from database.connection import get_db_session
+from database.models import BackgroundJob
+
+
+class JobQueue:
+    """Database-backed background job queue with thread and process worker pools."""
+
+    def __init__(self, io_workers=None, cpu_workers=None, poll_interval=None,
+                 max_attempts=3, retry_backoff_seconds=5, stale_after_seconds=600, heartbeat_seconds=30):
+        """
+        Initialize the job queue.
+
+        Args:
+            io_workers: Threads running job handlers (I/O-bound work such as LLM calls)
+            cpu_workers: Processes available to handlers through run_cpu (e.g. PDF parsing)
+            poll_interval: Seconds between database polls for queued jobs
+            max_attempts: Default number of attempts before a job is marked failed
+            retry_backoff_seconds: Base delay before a failed job is retried (doubles per attempt)
+            stale_after_seconds: Running jobs without a heartbeat for this long are taken back (worker died)
+            heartbeat_seconds: How often running jobs' heartbeats are refreshed, and stale jobs looked for
+        """
+        self.io_workers = int(io_workers or os.getenv('JOB_IO_WORKERS', '4'))
+        self.cpu_workers = int(cpu_workers or os.getenv('JOB_CPU_WORKERS', '2'))
+        self.poll_interval = float(poll_interval or os.getenv('JOB_POLL_INTERVAL', '0.5'))
+        self.max_attempts = max_attempts
+        self.retry_backoff = timedelta(seconds=retry_backoff_seconds)
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self.heartbeat_interval = heartbeat_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.handlers = {}  # {job_type: callable(payload) -> JSON-serializable result}
+        self.schedules = {}  # {job_type: {'every', 'payload', 'next_run'}}, see schedule()
+        self.lock = threading.Lock()
+        self._active = 0
+        self._running = set()  # job_ids executing in this process, kept alive by _heartbeat
+        self._io_pool = None
+        self._cpu_pool = None
+        self._dispatcher = None
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+
+    def register(self, job_type):
+        """Decorator registering a handler for a job type."""
+        def decorator(func):
+            self.handlers[job_type] = func
+            return func
+        return decorator
+
+    def schedule(self, job_type, every_seconds, payload=None):
+        """
+        Enqueue job_type every every_seconds while the dispatcher runs. A run is skipped while a job
+        of that type is still queued or running, so several processes don't pile up copies.
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"No handler registered for job type '{job_type}'")
+        self.schedules[job_type] = {
+            'every': every_seconds,
+            'payload': payload or {},
+            'next_run': time.monotonic() + every_seconds
+        }
+
+    # Producer side
+    def enqueue(self, job_type, payload=None, session_id=None, priority=0, max_attempts=None):
+        """Persist a new job and return its job_id."""
+        if job_type not in self.handlers:
+            raise ValueError(f"No handler registered for job type '{job_type}'")
+
+        job_id = str(uuid.uuid4())
+        with get_db_session() as session:
+            session.add(BackgroundJob(
+                job_id=job_id,
+                job_type=job_type,
+                session_id=session_id,
+                status='queued',
+                priority=priority,
+                payload=payload or {},
+                attempts=0,
+                max_attempts=max_attempts or self.max_attempts,
+                run_after=datetime.now(timezone.utc)
+            ))
+
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get_job(self, job_id):
+        """Return the job as a dictionary, or None if it does not exist."""
+        with get_db_session() as session:
+            job = session.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).first()
+            return job.to_dict() if job else None
+
+    def run_cpu(self, func, *args):
+        """Run a picklable function in the process pool and wait for its result."""
+        with self.lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._cpu_pool.submit(func, *args).result()
+
+    # Worker side
+    def start(self):
+        """Start the dispatcher thread if it is not already running."""
+        with self.lock:
+            if self._dispatcher and self._dispatcher.is_alive():
+                return
+            self._stop_event.clear()
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='job-worker')
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+            self._dispatcher.start()
+        print(f"🧵 Job queue started ({self.io_workers} threads, {self.cpu_workers} processes)")
+
+    def stop(self, wait=True):
+        """Stop dispatching new jobs and shut down the worker pools."""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout=5)
+        if self._io_pool:
+            self._io_pool.shutdown(wait=wait)
+        if self._cpu_pool:
+            self._cpu_pool.shutdown(wait=wait)
+            self._cpu_pool = None
+
+    def get_stats(self):
+        """Return counts of jobs per status plus local worker utilisation."""
+        with get_db_session() as session:
+            counts = {}
+            for status in ('queued', 'running', 'succeeded', 'failed'):
+                counts[status] = session.query(BackgroundJob).filter(BackgroundJob.status == status).count()
+        return {
+            'jobs': counts,
+            'active_workers': self._active,
+            'io_workers': self.io_workers,
+            'cpu_workers': self.cpu_workers
+        }
+
+    def _dispatch_loop(self):
+        next_heartbeat = 0
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_heartbeat:
+                next_heartbeat = time.monotonic() + self.heartbeat_interval
+                try:
+                    self._heartbeat()
+                    self._requeue_stale_jobs()
+                except Exception as e:
+                    print(f"⚠️  Failed to refresh job heartbeats: {e}")
+            try:
+                self._enqueue_scheduled()
+                free_slots = self.io_workers - self._active
+                for job in (self._claim_jobs(free_slots) if free_slots > 0 else []):
+                    with self.lock:
+                        self._active += 1
+                    self._io_pool.submit(self._execute, job)
+            except Exception as e:
+                print(f"⚠️  Job dispatcher error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _enqueue_scheduled(self):
+        """Enqueue the scheduled jobs that are due."""
+        now = time.monotonic()
+        for job_type, entry in self.schedules.items():
+            if now < entry['next_run']:
+                continue
+            entry['next_run'] = now + entry['every']
+            with get_db_session() as session:
+                pending = session.query(BackgroundJob.id).filter(
+                    BackgroundJob.job_type == job_type,
+                    BackgroundJob.status.in_(('queued', 'running'))
+                ).first()
+            if pending is None:
+                self.enqueue(job_type, entry['payload'])
+
+    def _claim_jobs(self, limit):
+        """Atomically move up to `limit` due jobs from queued to running."""
+        now = datetime.now(timezone.utc)
+        claimed = []
+        with get_db_session() as session:
+            candidates = session.query(BackgroundJob.job_id).filter(
+                BackgroundJob.status == 'queued',
+                BackgroundJob.run_after <= now
+            ).order_by(BackgroundJob.priority.desc(), BackgroundJob.created_at).limit(limit).all()
+
+            for (job_id,) in candidates:
+                # Conditional update so concurrent workers never claim the same job
+                updated = session.query(BackgroundJob).filter(
+                    BackgroundJob.job_id == job_id,
+                    BackgroundJob.status == 'queued'
+                ).update({
+                    BackgroundJob.status: 'running',
+                    BackgroundJob.locked_by: self.worker_id,
+                    BackgroundJob.started_at: now,
+                    BackgroundJob.heartbeat_at: now,
+                    BackgroundJob.attempts: BackgroundJob.attempts + 1
+                }, synchronize_session=False)
+                if updated:
+                    claimed.append(job_id)
+            with self.lock:
+                self._running.update(claimed)
+
+            jobs = session.query(BackgroundJob).filter(BackgroundJob.job_id.in_(claimed)).all() if claimed else []
+            return [
+                {
+                    'job_id': job.job_id,
+                    'job_type': job.job_type,
+                    'payload': job.payload or {},
+                    'attempts': job.attempts,
+                    'max_attempts': job.max_attempts
+                }
+                for job in jobs
+            ]
+
+    def _execute(self, job):
+        try:
+            handler = self.handlers[job['job_type']]
+            result = handler(job['payload'])
+            self._finish(job, result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, error=f"{type(e).__name__}: {e}")
+        finally:
+            with self.lock:
+                self._active -= 1
+                self._running.discard(job['job_id'])
+            self._wakeup.set()
+
+    def _finish(self, job, result=None, error=None):
+        now = datetime.now(timezone.utc)
+        with get_db_session() as session:
+            record = session.query(BackgroundJob).filter(BackgroundJob.job_id == job['job_id']).first()
+            if not record:
+                return
+            record.locked_by = None
+            if error is None:
+                record.status = 'succeeded'
+                record.result = result
+                record.error = None
+                record.finished_at = now
+                record.payload = null()  # May hold a whole uploaded file
+            elif job['attempts'] < job['max_attempts']:
+                # Exponential backoff before the next attempt
+                record.status = 'queued'
+                record.error = error
+                record.run_after = now + self.retry_backoff * (2 ** (job['attempts'] - 1))
+                print(f"🔁 Job {job['job_id'][:8]} failed (attempt {job['attempts']}), retrying")
+            else:
+                record.status = 'failed'
+                record.error = error
+                record.finished_at = now
+                record.payload = null()
+                print(f"❌ Job {job['job_id'][:8]} failed permanently: {error}")
+
+    def _heartbeat(self):
+        """Mark the jobs this process is running as alive."""
+        with self.lock:
+            running = list(self._running)
+        if running:
+            with get_db_session() as session:
+                session.query(BackgroundJob).filter(
+                    BackgroundJob.job_id.in_(running),
+                    BackgroundJob.status == 'running'
+                ).update({BackgroundJob.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False)
+
+    def _requeue_stale_jobs(self):
+        """
+        Take back jobs whose worker stopped sending heartbeats: requeue them, or mark them failed
+        once they have used all their attempts (e.g. a job that keeps killing its worker).
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - self.stale_after
+        stale = (
+            BackgroundJob.status == 'running',
+            func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.started_at) < cutoff
+        )
+        with get_db_session() as session:
+            failed = session.query(BackgroundJob).filter(
+                *stale, BackgroundJob.attempts >= BackgroundJob.max_attempts
+            ).update({
+                BackgroundJob.status: 'failed',
+                BackgroundJob.error: 'Worker stopped while running the job',
+                BackgroundJob.locked_by: None,
+                BackgroundJob.finished_at: now,
+                BackgroundJob.payload: null()
+            }, synchronize_session=False)
+            requeued = session.query(BackgroundJob).filter(*stale).update({
+                BackgroundJob.status: 'queued',
+                BackgroundJob.locked_by: None
+            }, synchronize_session=False)
+        if failed:
+            print(f"❌ Failed {failed} stale job(s) out of attempts")
+        if requeued:
+            print(f"🔁 Requeued {requeued} stale job(s)")
@@ -0,0 +1,53 @@
+import importlib
+import os
+import threading
+import time
+
+
+class LazyObject:
+    """
+    Stand-in that builds the real object on first attribute access, so expensive imports
+    (e.g. the OpenAI SDK) happen on first use or in warm_up() rather than at worker boot.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def warm_up(*loaders):
+    """
+    Run deferred imports and initializers on a daemon thread once the worker has booted, so
+    the first request doesn't pay for them. Loaders are module names or callables; failures
+    are logged and left to surface on first use. Set LAZY_WARM_UP=false to skip.
+    """
+    if os.getenv('LAZY_WARM_UP', 'true').lower() != 'true':
+        return None
+
+    def run():
+        started = time.monotonic()
+        for loader in loaders:
+            try:
+                importlib.import_module(loader) if isinstance(loader, str) else loader()
+            except Exception as e:
+                print(f"⚠️  Warm-up of {getattr(loader, '__qualname__', loader)} failed: {e}")
+        print(f"🔥 Deferred imports warmed up in {time.monotonic() - started:.2f}s")
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
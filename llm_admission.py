@@ -0,0 +1,320 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from utils import estimate_message_tokens
+
+# Request priorities - lower values are admitted first
+INTERACTIVE = 0  # Streaming chat the user is watching
+STANDARD = 1     # Non-streaming request/response calls
+BATCH = 2        # Background jobs
+
+_current_priority = ContextVar('llm_priority', default=None)
+
+
+@contextmanager
+def llm_priority(priority):
+    """Run the enclosed LLM calls with the given admission priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM call cannot be admitted soon enough."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class _FileSlots:
+    """Cross-process concurrency slots backed by fcntl locks on files in a shared directory."""
+
+    def __init__(self, lock_dir, slots):
+        import fcntl
+        self.fcntl = fcntl
+        self.lock_dir = lock_dir
+        self.slots = slots
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def acquire(self, deadline):
+        while True:
+            for index in range(self.slots):
+                handle = open(os.path.join(self.lock_dir, f"llm-slot-{index}.lock"), 'a')
+                try:
+                    self.fcntl.flock(handle, self.fcntl.LOCK_EX | self.fcntl.LOCK_NB)
+                    return handle
+                except OSError:
+                    handle.close()
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def release(self, handle):
+        self.fcntl.flock(handle, self.fcntl.LOCK_UN)
+        handle.close()
+
+
+class AdmissionController:
+    """Process-wide admission control for outbound LLM calls."""
+
+    def __init__(self, max_concurrency=None, tokens_per_minute=None, max_queue_depth=None,
+                 max_wait_seconds=None, lock_dir=None, global_concurrency=None):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_concurrency: Maximum in-flight LLM calls in this process
+            tokens_per_minute: Token budget per rolling minute (0 disables the budget)
+            max_queue_depth: Callers waiting beyond this depth are rejected immediately
+            max_wait_seconds: Longest a caller may wait for admission before being rejected
+            lock_dir: Optional shared directory enabling a cross-worker concurrency cap
+            global_concurrency: Slots shared by all workers using lock_dir
+        """
+        self.max_concurrency = int(max_concurrency or os.getenv('LLM_MAX_CONCURRENCY', '8'))
+        self.tokens_per_minute = int(tokens_per_minute if tokens_per_minute is not None
+                                     else os.getenv('LLM_TOKENS_PER_MINUTE', '200000'))
+        self.max_queue_depth = int(max_queue_depth if max_queue_depth is not None
+                                   else os.getenv('LLM_MAX_QUEUE_DEPTH', '50'))
+        self.max_wait = float(max_wait_seconds or os.getenv('LLM_MAX_QUEUE_WAIT', '30'))
+
+        lock_dir = lock_dir or os.getenv('LLM_ADMISSION_LOCK_DIR')
+        self.file_slots = None
+        if lock_dir:
+            slots = int(global_concurrency or os.getenv('LLM_GLOBAL_CONCURRENCY', str(self.max_concurrency)))
+            self.file_slots = _FileSlots(lock_dir, slots)
+
+        self.condition = threading.Condition()
+        self.waiters = []  # heap of (priority, seq)
+        self.sequence = itertools.count()
+        self.in_flight = 0
+        self.token_log = deque()  # [timestamp, tokens] within the last minute, one per admitted call
+        self.tokens_in_window = 0
+
+        # Stats
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self.recent_waits = deque(maxlen=200)
+        self.recent_durations = deque(maxlen=200)
+
+    def _expire_tokens(self, now):
+        while self.token_log and now - self.token_log[0][0] >= 60:
+            self.tokens_in_window -= self.token_log.popleft()[1]
+
+    def _budget_allows(self, estimated_tokens, now):
+        if not self.tokens_per_minute:
+            return True
+        self._expire_tokens(now)
+        # A single oversized call is still admitted once the window is empty
+        return self.tokens_in_window == 0 or self.tokens_in_window + estimated_tokens <= self.tokens_per_minute
+
+    def _estimated_retry_after(self):
+        """Seconds until capacity is likely to free up."""
+        now = time.monotonic()
+        if self.tokens_per_minute and self.token_log and self.tokens_in_window >= self.tokens_per_minute:
+            return 60 - (now - self.token_log[0][0])
+        average = (sum(self.recent_durations) / len(self.recent_durations)) if self.recent_durations else 2.0
+        return average * (len(self.waiters) + 1) / self.max_concurrency
+
+    def check_capacity(self):
+        """Fail fast (AdmissionRejected) if the wait queue is already too deep."""
+        with self.condition:
+            if len(self.waiters) >= self.max_queue_depth:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    f"LLM queue is full ({len(self.waiters)} waiting)",
+                    retry_after=self._estimated_retry_after()
+                )
+
+    def acquire(self, priority=STANDARD, estimated_tokens=0):
+        """Block until the call may proceed; returns a ticket for release()."""
+        start = time.monotonic()
+        deadline = start + self.max_wait
+
+        with self.condition:
+            if len(self.waiters) >= self.max_queue_depth:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    f"LLM queue is full ({len(self.waiters)} waiting)",
+                    retry_after=self._estimated_retry_after()
+                )
+
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if (self.waiters[0] == entry and self.in_flight < self.max_concurrency
+                            and self._budget_allows(estimated_tokens, now)):
+                        break
+                    if now >= deadline:
+                        self.rejected += 1
+                        raise AdmissionRejected(
+                            f"Timed out after {self.max_wait:.0f}s waiting for LLM capacity",
+                            retry_after=self._estimated_retry_after()
+                        )
+                    # Token budget frees up as the window slides, so never sleep past that
+                    self.condition.wait(timeout=min(deadline - now, 0.5))
+            finally:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+                self.condition.notify_all()
+
+            self.in_flight += 1
+            now = time.monotonic()
+            token_entry = None
+            if estimated_tokens:
+                token_entry = [now, estimated_tokens]
+                self.token_log.append(token_entry)
+                self.tokens_in_window += estimated_tokens
+
+        slot = None
+        if self.file_slots:
+            slot = self.file_slots.acquire(deadline)
+            if slot is None:
+                self.release({'slot': None, 'started': now, 'estimated_tokens': estimated_tokens,
+                              'token_entry': token_entry})
+                with self.condition:
+                    self.rejected += 1
+                raise AdmissionRejected("Timed out waiting for a cross-worker LLM slot",
+                                        retry_after=self._estimated_retry_after())
+
+        waited = time.monotonic() - start
+        with self.condition:
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_observed_wait = max(self.max_observed_wait, waited)
+            self.recent_waits.append(waited)
+
+        return {'slot': slot, 'started': time.monotonic(), 'estimated_tokens': estimated_tokens,
+                'token_entry': token_entry}
+
+    def release(self, ticket, actual_tokens=None):
+        """Release a slot; optionally correct the token budget with actual usage."""
+        if ticket.get('slot') and self.file_slots:
+            self.file_slots.release(ticket['slot'])
+        with self.condition:
+            self.in_flight -= 1
+            self.recent_durations.append(time.monotonic() - ticket['started'])
+            if actual_tokens is not None:
+                now = time.monotonic()
+                entry = ticket.get('token_entry')
+                if entry is None:
+                    if actual_tokens:
+                        self.token_log.append([now, actual_tokens])
+                        self.tokens_in_window += actual_tokens
+                else:
+                    # Correct the estimate in place, so it expires with the call's own timestamp
+                    self._expire_tokens(now)
+                    if now - entry[0] < 60:  # Still counted in the window
+                        self.tokens_in_window += actual_tokens - entry[1]
+                    entry[1] = actual_tokens
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, priority=STANDARD, estimated_tokens=0):
+        """Context manager wrapping acquire/release."""
+        ticket = self.acquire(priority, estimated_tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_stats(self):
+        """Return queue depth, in-flight calls and wait-time statistics."""
+        with self.condition:
+            self._expire_tokens(time.monotonic())
+            waits = sorted(self.recent_waits)
+            return {
+                'queue_depth': len(self.waiters),
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'max_queue_depth': self.max_queue_depth,
+                'tokens_last_minute': self.tokens_in_window,
+                'tokens_per_minute': self.tokens_per_minute,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_wait_seconds': round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+                'p95_wait_seconds': round(waits[int(len(waits) * 0.95) - 1], 4) if waits else 0.0,
+                'max_wait_seconds': round(self.max_observed_wait, 4),
+                'cross_worker': self.file_slots is not None
+            }
+
+
+class AdmissionControlledClient:
+    """OpenAI client wrapper that routes chat completions through an AdmissionController."""
+
+    def __init__(self, client, controller):
+        self._client = client
+        self.controller = controller
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _create_completion(self, **kwargs):
+        priority = _current_priority.get()
+        if priority is None:
+            priority = INTERACTIVE if kwargs.get('stream') else STANDARD
+        estimated = estimate_message_tokens(kwargs.get('messages', [])) + (kwargs.get('max_tokens') or 0)
+
+        ticket = self.controller.acquire(priority, estimated)
+        try:
+            response = self._client.chat.completions.create(**kwargs)
+        except Exception:
+            self.controller.release(ticket)
+            raise
+
+        if kwargs.get('stream'):
+            # Hold the slot until the stream is fully consumed or closed
+            return _ReleasingStream(response, lambda: self.controller.release(ticket))
+
+        usage = getattr(response, 'usage', None)
+        self.controller.release(ticket, getattr(usage, 'total_tokens', None))
+        return response
+
+
+class _ReleasingStream:
+    """Iterator over a streaming response that runs a callback exactly once when done."""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self._stream, 'close'):
+                self._stream.close()
+        finally:
+            self._on_close()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,258 @@
+import contextvars
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {'APITimeoutError', 'APIConnectionError', 'Timeout', 'ConnectionError', 'TimeoutError'}
+
+_END = object()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call (including its retries) runs past its deadline."""
+
+
+def is_retryable(error):
+    """Check whether an exception from the completions API is worth retrying."""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def get_retry_after(error):
+    """Return the server-requested delay in seconds from a Retry-After header, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return getattr(error, 'retry_after', None)
+
+
+class ResiliencePolicy:
+    """Deadline, retry and hedging settings for LLM calls."""
+
+    def __init__(self, deadline_seconds=None, max_retries=None, base_delay=None, max_delay=None,
+                 hedge=None, hedge_after=None, hedge_min_samples=20):
+        """
+        Initialize the policy.
+
+        Args:
+            deadline_seconds: Total time budget for a call including retries
+            max_retries: Retries after the first attempt for retryable errors
+            base_delay: First backoff delay in seconds (doubled per retry, full jitter)
+            max_delay: Upper bound for a single backoff delay
+            hedge: Send a second request when the first is slower than the observed p95
+            hedge_after: Fixed hedge delay in seconds instead of the observed p95
+            hedge_min_samples: Latency samples needed before the p95 is trusted
+        """
+        self.deadline_seconds = float(deadline_seconds or os.getenv('LLM_CALL_DEADLINE', '60'))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv('LLM_MAX_RETRIES', '2'))
+        self.base_delay = float(base_delay if base_delay is not None else os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+        self.max_delay = float(max_delay if max_delay is not None else os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+        if hedge is None:
+            hedge = os.getenv('LLM_HEDGE_REQUESTS', 'false').lower() == 'true'
+        self.hedge = hedge
+        hedge_after = hedge_after if hedge_after is not None else os.getenv('LLM_HEDGE_AFTER')
+        self.hedge_after = float(hedge_after) if hedge_after else None
+        self.hedge_min_samples = hedge_min_samples
+
+
+class _PrefetchedStream:
+    """Streaming response whose first chunk has already been read."""
+
+    def __init__(self, response, iterator, first):
+        self._response = response
+        self._iterator = iterator
+        self._pending = first
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._pending is not _END:
+            chunk, self._pending = self._pending, _END
+            return chunk
+        return next(self._iterator)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def close(self):
+        if hasattr(self._response, 'close'):
+            self._response.close()
+
+
+class ResilientClient:
+    """OpenAI client wrapper adding deadlines, jittered retries and request hedging to chat completions."""
+
+    def __init__(self, client, policy=None, sleep=time.sleep, rng=None):
+        self._client = client
+        self.policy = policy or ResiliencePolicy()
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+        self.lock = threading.Lock()
+        self.latencies = {True: deque(maxlen=500), False: deque(maxlen=500)}  # time to first token / response
+        self.stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'hedged': 0, 'hedge_wins': 0,
+                      'deadline_exceeded': 0, 'failures': 0}
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def p95_latency(self, stream):
+        """Observed p95 time to first token (streaming) or to the full response."""
+        with self.lock:
+            samples = sorted(self.latencies[stream])
+        if len(samples) < self.policy.hedge_min_samples:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _hedge_delay(self, stream):
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_after is not None:
+            return self.policy.hedge_after
+        return self.p95_latency(stream)
+
+    def _backoff(self, retry_number, error, deadline):
+        """Sleep before the next attempt; raise if that would pass the deadline."""
+        delay = self.rng.uniform(0, min(self.policy.max_delay, self.policy.base_delay * (2 ** retry_number)))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if time.monotonic() + delay >= deadline:
+            self._count('deadline_exceeded')
+            raise DeadlineExceeded(f"LLM call deadline exceeded while backing off: {error}") from error
+        self.sleep(delay)
+
+    def _create_completion(self, **kwargs):
+        deadline = time.monotonic() + kwargs.pop('deadline', self.policy.deadline_seconds)
+        stream = bool(kwargs.get('stream'))
+        self._count('calls')
+
+        retry_number = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count('deadline_exceeded')
+                raise DeadlineExceeded("LLM call deadline exceeded")
+            try:
+                return self._attempt(dict(kwargs, timeout=remaining), stream, deadline)
+            except DeadlineExceeded:
+                self._count('deadline_exceeded')
+                raise
+            except Exception as e:
+                if retry_number >= self.policy.max_retries or not is_retryable(e):
+                    self._count('failures')
+                    raise
+                self._backoff(retry_number, e, deadline)
+                retry_number += 1
+                self._count('retries')
+
+    def _call_once(self, kwargs, stream):
+        """One request; for streams, read up to the first chunk so failures surface before we commit."""
+        started = time.monotonic()
+        self._count('attempts')
+        response = self._client.chat.completions.create(**kwargs)
+        if stream:
+            iterator = iter(response)
+            first = next(iterator, _END)
+            result = _PrefetchedStream(response, iterator, first)
+        else:
+            result = response
+        with self.lock:
+            self.latencies[stream].append(time.monotonic() - started)
+        return result
+
+    def _attempt(self, kwargs, stream, deadline):
+        hedge_delay = self._hedge_delay(stream)
+        if hedge_delay is None:
+            return self._call_once(kwargs, stream)
+
+        results = queue.Queue()
+
+        def run(tag):
+            try:
+                results.put((tag, self._call_once(kwargs, stream), None))
+            except Exception as e:
+                results.put((tag, None, e))
+
+        def launch(tag):
+            # Copy context so admission priority and similar context travels with the request
+            threading.Thread(target=contextvars.copy_context().run, args=(run, tag), daemon=True).start()
+
+        launch('primary')
+        launched, errors = 1, []
+        hedge_at = time.monotonic() + hedge_delay
+        while True:
+            now = time.monotonic()
+            hedge_pending = launched == 1
+            wait_until = min(hedge_at, deadline) if hedge_pending else deadline
+            try:
+                tag, result, error = results.get(timeout=max(0, wait_until - now))
+            except queue.Empty:
+                if hedge_pending and now < deadline:
+                    launch('hedge')
+                    launched += 1
+                    self._count('hedged')
+                    continue
+                self._discard_late(results, launched - len(errors))
+                raise DeadlineExceeded("LLM call deadline exceeded waiting for a response")
+
+            if error is None:
+                if tag == 'hedge':
+                    self._count('hedge_wins')
+                self._discard_late(results, launched - len(errors) - 1)
+                return result
+
+            errors.append(error)
+            if hedge_pending or len(errors) == launched:
+                # Nothing else in flight - let the retry loop decide
+                raise errors[0]
+
+    def _discard_late(self, results, outstanding):
+        """Close responses from losing requests when they eventually arrive."""
+        if outstanding <= 0:
+            return
+
+        def drain():
+            for _ in range(outstanding):
+                _, result, _ = results.get()
+                if result is not None and hasattr(result, 'close'):
+                    try:
+                        result.close()
+                    except Exception:
+                        pass
+
+        threading.Thread(target=drain, daemon=True).start()
+
+    def get_stats(self):
+        """Return retry/hedge counters and observed latency percentiles."""
+        with self.lock:
+            stats = dict(self.stats)
+        stats['p95_time_to_first_token'] = self.p95_latency(True)
+        stats['p95_response_time'] = self.p95_latency(False)
+        stats['hedging_enabled'] = self.policy.hedge
+        return stats
@@ -1,7 +1,9 @@
-from langchain.memory import ConversationBufferWindowMemory
 import uuid
 from datetime import datetime
 from typing import Optional
+from chat_history import ChatHistory
+from session_snapshot import pair_messages, turn_messages, snapshot_chunks, read_snapshot
+from tracing import tracer
 
 
 class MemoryManager:
@@ -34,7 +36,7 @@ class MemoryManager:
     
     def _reset_memory(self):
         """Reset all memory components."""
-        self.memory = ConversationBufferWindowMemory(k=self.k)
+        self.memory = ChatHistory(self.k)
         self.user_info = {}
         print(f"🔄 New session started: {self.session_id[:8]}...")
     
@@ -42,12 +44,15 @@ class MemoryManager:
         """Load previous chat history from the database if available."""
         try:
             messages = self.db_service.get_session_messages(self.session_id, limit=1000)
+            if not messages:
+                # Sessions moved to cold storage come back on first access
+                messages = self.db_service.restore_archived_session(self.session_id)[:1000]
             user_msg = None
             for msg in messages:
                 if msg['message_type'] == 'user':
                     user_msg = msg['content']
                 elif msg['message_type'] == 'assistant' and user_msg is not None:
-                    self.memory.save_context({"input": user_msg}, {"output": msg['content']})
+                    self.memory.add(user_msg, msg['content'])
                     user_msg = None
         except Exception as e:
             print(f"⚠️  Failed to load history for {self.session_id[:8]}: {e}")
@@ -85,13 +90,14 @@ class MemoryManager:
     
     def add_message(self, human_message: str, ai_message: str):
         """Add a message pair to memory and optionally store in the database."""
-        self.memory.save_context({"input": human_message}, {"output": ai_message})
-        if self.db_service:
-            try:
-                self.db_service.save_message(self.session_id, "user", human_message)
-                self.db_service.save_message(self.session_id, "assistant", ai_message)
-            except Exception as e:
-                print(f"⚠️  Failed to save message: {e}")
+        with tracer.span('add_message'):
+            self.memory.add(human_message, ai_message)
+            if self.db_service:
+                try:
+                    self.db_service.save_message(self.session_id, "user", human_message)
+                    self.db_service.save_message(self.session_id, "assistant", ai_message)
+                except Exception as e:
+                    print(f"⚠️  Failed to save message: {e}")
     
     def get_chat_history(self) -> str:
         """Get the chat history as a formatted string."""
@@ -113,7 +119,7 @@ class MemoryManager:
     
     def get_memory_variables(self):
         """Get memory variables for context inclusion."""
-        return self.memory.load_memory_variables({})
+        return {'history': self.memory.buffer}
     
     def get_session_info(self):
         """Get information about current session."""
@@ -121,7 +127,8 @@ class MemoryManager:
             'session_id': self.session_id,
             'start_time': self.session_start,
             'user_info_count': len(self.user_info),
-            'chat_history_length': len(self.get_chat_history().split()) if self.get_chat_history() else 0
+            'chat_history_length': len(self.memory.buffer.split()),
+            'chat_history_tokens': self.memory.tokens
         }
     
     def clear_user_info_only(self):
@@ -131,7 +138,7 @@ class MemoryManager:
     
     def clear_chat_history_only(self):
         """Clear only chat history but keep user info."""
-        self.memory = ConversationBufferWindowMemory(k=self.k)
+        self.memory = ChatHistory(self.k)
         if self.db_service:
             try:
                 self.db_service.clear_session_messages(self.session_id)
@@ -146,7 +153,8 @@ class MemoryManager:
             'session_start': self.session_start.isoformat(),
             'user_info': self.user_info.copy(),
             'chat_history': self.get_chat_history(),
-            'message_count': len(self.memory.chat_memory.messages) if hasattr(self.memory, 'chat_memory') else 0
+            'message_count': self.memory.total_messages,
+            'turns': self.memory.pairs()
         }
     
     def import_session_data(self, session_data):
@@ -157,8 +165,79 @@ class MemoryManager:
         )
         self.user_info = session_data.get('user_info', {})
         
-        # Recreate memory with chat history if available
-        self.memory = ConversationBufferWindowMemory(k=self.k)
-        if session_data.get('chat_history'):
-            # Note: This is a simplified restoration - full restoration would need message pairs
-            print(f"📥 Session data imported: {self.session_id[:8]}...")
\ No newline at end of file
+        # Rebuild the window from its message pairs (exports without them restore an empty history)
+        self.memory = ChatHistory(self.k)
+        for human, ai in session_data.get('turns', []):
+            self.memory.add(human, ai)
+        print(f"📥 Session data imported: {self.session_id[:8]}...")
+
+    def iter_turns(self):
+        """Every exchange of the session, oldest first: all stored messages, or the in-memory window without a database."""
+        if self.db_service:
+            yield from pair_messages(self.db_service.iter_session_messages(self.session_id))
+        else:
+            for human, ai in self.memory.pairs():
+                yield {'human': human, 'ai': ai}
+
+    def export_snapshot(self, compression: str = 'gzip'):
+        """Stream the full session as a versioned snapshot (see session_snapshot); yields bytes chunks."""
+        header = {
+            'session_id': self.session_id,
+            'session_start': self.session_start.isoformat(),
+            'user_id': self.user_id,
+            'user_info': self.user_info.copy(),
+            'k': self.k
+        }
+        return snapshot_chunks(header, self.iter_turns(), compression)
+
+    def import_snapshot(self, stream):
+        """
+        Replace this session's history and user info with a snapshot, keeping self.session_id.
+
+        Stored messages are replaced in one transaction with bulk inserts, so a truncated or
+        corrupt snapshot (ValueError) leaves the session as it was.
+
+        Returns:
+            Dict with the number of turns and messages restored
+        """
+        header, turns = read_snapshot(stream)
+        return self._restore(header, turns)
+
+    def _restore(self, header, turns):
+        """Rebuild memory and stored messages from an opened snapshot."""
+        memory = ChatHistory(self.k)
+        counts = {'turns': 0, 'messages': 0}
+
+        def replay():
+            for turn in turns:
+                counts['turns'] += 1
+                # Same pairing as _load_history_from_db: unanswered messages aren't in the window
+                if turn['human'] is not None and turn['ai'] is not None:
+                    memory.add(turn['human'], turn['ai'])
+                yield from turn_messages(turn)
+
+        with tracer.span('import_snapshot'):
+            if self.db_service:
+                counts['messages'] = self.db_service.bulk_save_messages(self.session_id, replay(), replace=True,
+                                                                     user_id=self.user_id)
+            else:
+                counts['messages'] = sum(1 for _ in replay())
+
+        self.memory = memory
+        self.user_info = header.get('user_info') or {}
+        if header.get('session_start'):
+            self.session_start = datetime.fromisoformat(header['session_start'])
+        print(f"📥 Snapshot imported into {self.session_id[:8]}: {counts['turns']} turns, {counts['messages']} messages")
+        return dict(counts, source_session_id=header.get('session_id'), version=header['version'])
+
+    @classmethod
+    def from_snapshot(cls, stream, k: int = 30, db_service=None, session_id: Optional[str] = None,
+                      user_id: Optional[int] = None):
+        """Create a manager for a snapshot's session (or session_id, to import under a new ID) and import it."""
+        header, turns = read_snapshot(stream)
+        # The session row is written by bulk_save_messages in the same transaction as the messages,
+        # so a snapshot that turns out to be invalid leaves nothing behind
+        manager = cls(k=k, session_id=session_id or header.get('session_id'), user_id=user_id)
+        manager.db_service = db_service
+        manager._restore(header, turns)
+        return manager
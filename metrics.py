@@ -0,0 +1,117 @@
+import threading
+
+# Default latency buckets in seconds (LLM-backed requests take seconds, not milliseconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """In-process counters and histograms rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}  # {name: {'type', 'help', 'buckets', 'samples': {labels: value}}}
+        self.collectors = []  # Callables returning gauges computed at scrape time
+
+    def counter(self, name, help_text):
+        self.metrics[name] = {'type': 'counter', 'help': help_text, 'samples': {}}
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.metrics[name] = {'type': 'histogram', 'help': help_text, 'buckets': tuple(buckets), 'samples': {}}
+
+    def register_collector(self, collector):
+        """
+        Register a callable evaluated on every scrape.
+
+        It returns a list of (name, type, help, [(labels_dict, value), ...]) tuples.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter."""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            samples = self.metrics[name]['samples']
+            samples[key] = samples.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            metric = self.metrics[name]
+            state = metric['samples'].get(key)
+            if state is None:
+                state = metric['samples'][key] = {'buckets': [0] * len(metric['buckets']), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    state['buckets'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def value(self, name, **labels):
+        """Current value of a counter (or observation count of a histogram)."""
+        with self.lock:
+            sample = self.metrics[name]['samples'].get(tuple(sorted(labels.items())))
+        if isinstance(sample, dict):
+            return sample['count']
+        return sample or 0
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        lines = []
+        with self.lock:
+            for name, metric in self.metrics.items():
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                for key, sample in metric['samples'].items():
+                    if metric['type'] != 'histogram':
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(sample)}")
+                        continue
+                    # observe() already counts a value in every bucket it fits, so these are cumulative as stored
+                    for bound, count in zip(metric['buckets'] + (float('inf'),), sample['buckets'] + [sample['count']]):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(sample['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {sample['count']}")
+
+        for collector in self.collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"⚠️  Metrics collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by the app and the LLM call sites
+metrics = MetricsRegistry()
+metrics.counter('http_requests_total', 'HTTP requests by method, route and status.')
+metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route (streams until the last byte).')
+metrics.counter('llm_calls_total', 'LLM calls by intent and route.')
+metrics.counter('llm_errors_total', 'Failed LLM calls by intent and route.')
+metrics.counter('llm_tokens_total', 'LLM tokens by intent and kind (prompt or completion).')
+metrics.histogram('llm_time_to_first_token_seconds', 'Time to the first streamed token by intent.')
+metrics.counter('pdf_bytes_processed_total', 'Bytes of uploaded PDFs processed.')
+metrics.counter('pdf_documents_processed_total', 'Uploaded PDFs processed.')
+metrics.counter('rate_limit_rejections_total', 'Requests rejected by the message rate limit, by route.')
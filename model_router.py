@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import metrics as runtime_metrics
+from tracing import tracer
+from usage_tracker import usage_tracker
+
+# Routes are checked in order; the first match wins. A value of None for max_tokens or
+# temperature keeps the caller's default. Matching keys:
+#   intents            - list of intents (omit to match any intent)
+#   styles             - list of requested answer styles (omit to match any style)
+#   min_prompt_tokens  - estimated prompt size lower bound
+#   max_prompt_tokens  - estimated prompt size upper bound
+DEFAULT_ROUTES = [
+    {
+        'name': 'intent_classification',
+        'intents': ['classify_intent'],
+        'model': 'gpt-4o-mini',
+        'max_tokens': None,  # function arguments may echo a full job description
+        'temperature': 0.1
+    },
+    {
+        'name': 'yes_no',
+        'intents': ['answer_yes_no_question'],
+        'model': 'gpt-4o-mini',
+        'max_tokens': 10,
+        'temperature': 0.0
+    },
+    {
+        'name': 'short_answer',
+        'intents': ['answer_with_user_instuctions'],
+        'styles': ['one word', 'one line', 'one sentence', 'two sentences', 'short answer', 'brief answer'],
+        'model': 'gpt-4o-mini',
+        'max_tokens': 200,
+        'temperature': 0.5
+    },
+    {
+        'name': 'job_tailoring',
+        'intents': ['process_job_url', 'process_job_description'],
+        'model': 'gpt-4o-mini',
+        'max_tokens': 2500,
+        'temperature': 0.3
+    },
+    {
+        'name': 'large_document',
+        'min_prompt_tokens': 6000,
+        'model': 'gpt-4o-mini',
+        'max_tokens': 2000,
+        'temperature': None
+    },
+    {
+        'name': 'default',
+        'model': 'gpt-4o-mini',
+        'max_tokens': 1500,
+        'temperature': None
+    }
+]
+
+
+class ModelRouter:
+    """Pick model, max_tokens and temperature per call from a configurable routing table."""
+
+    def __init__(self, routes=None, routes_file=None):
+        """
+        Initialize the router.
+
+        Args:
+            routes: Explicit routing table (list of route dicts)
+            routes_file: JSON file with a routing table; reloaded when it changes on disk.
+                         Defaults to the MODEL_ROUTES_FILE environment variable.
+        """
+        self.routes_file = routes_file or os.getenv('MODEL_ROUTES_FILE')
+        self.routes = routes or DEFAULT_ROUTES
+        self._routes_mtime = None
+        self.lock = threading.Lock()
+        self.metrics = {}  # {route_name: {...}}
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        if not self.routes_file:
+            return
+        try:
+            mtime = os.path.getmtime(self.routes_file)
+            if mtime == self._routes_mtime:
+                return
+            with open(self.routes_file) as f:
+                routes = json.load(f)
+            self.routes = routes
+            self._routes_mtime = mtime
+            print(f"🧭 Loaded {len(routes)} model routes from {self.routes_file}")
+        except Exception as e:
+            print(f"⚠️  Failed to load model routes from {self.routes_file}: {e}")
+
+    @staticmethod
+    def _matches(route, intent, prompt_tokens, style):
+        if 'intents' in route and intent not in route['intents']:
+            return False
+        if 'styles' in route and (style or '').lower() not in route['styles']:
+            return False
+        if prompt_tokens < route.get('min_prompt_tokens', 0):
+            return False
+        if 'max_prompt_tokens' in route and prompt_tokens > route['max_prompt_tokens']:
+            return False
+        return True
+
+    def select(self, intent=None, prompt_tokens=0, style=None):
+        """Return the first matching route for the call."""
+        self._reload_if_changed()
+        for route in self.routes:
+            if self._matches(route, intent, prompt_tokens, style):
+                return route
+        return DEFAULT_ROUTES[-1]
+
+    def completion_params(self, route, temperature=None):
+        """Build model/max_tokens/temperature kwargs for chat.completions.create."""
+        params = {'model': route.get('model', 'gpt-4o-mini')}
+        if route.get('max_tokens') is not None:
+            params['max_tokens'] = route['max_tokens']
+        if route.get('temperature') is not None:
+            params['temperature'] = route['temperature']
+        elif temperature is not None:
+            params['temperature'] = temperature
+        return params
+
+    def record(self, route_name, latency, prompt_tokens=0, completion_tokens=0,
+               time_to_first_token=None, error=False, intent=None, cached_tokens=0, model=None):
+        """
+        Record latency and token usage for a routed call.
+        The call is also traced as an llm.<route> span, counted per intent in the metrics and
+        billed to the current session by the usage tracker. model is the one that served the call
+        (response.model); the route's configured model is billed only when the response has none.
+        """
+        self._trace(route_name, latency, prompt_tokens, completion_tokens, time_to_first_token, error)
+        intent = intent or 'none'
+        if prompt_tokens or completion_tokens:
+            usage_tracker.record(model or self._model(route_name), intent, prompt_tokens, completion_tokens, cached_tokens)
+        runtime_metrics.inc('llm_calls_total', intent=intent, route=route_name)
+        if error:
+            runtime_metrics.inc('llm_errors_total', intent=intent, route=route_name)
+        runtime_metrics.inc('llm_tokens_total', prompt_tokens or 0, intent=intent, kind='prompt')
+        runtime_metrics.inc('llm_tokens_total', completion_tokens or 0, intent=intent, kind='completion')
+        if time_to_first_token is not None:
+            runtime_metrics.observe('llm_time_to_first_token_seconds', time_to_first_token, intent=intent)
+        with self.lock:
+            metrics = self.metrics.setdefault(route_name, {
+                'calls': 0,
+                'errors': 0,
+                'total_latency': 0.0,
+                'latencies': deque(maxlen=500),
+                'ttfts': deque(maxlen=500),
+                'prompt_tokens': 0,
+                'completion_tokens': 0
+            })
+            metrics['calls'] += 1
+            metrics['errors'] += 1 if error else 0
+            metrics['total_latency'] += latency
+            metrics['latencies'].append(latency)
+            if time_to_first_token is not None:
+                metrics['ttfts'].append(time_to_first_token)
+            metrics['prompt_tokens'] += prompt_tokens or 0
+            metrics['completion_tokens'] += completion_tokens or 0
+
+    def _model(self, route_name):
+        route = next((r for r in self.routes if r.get('name') == route_name), None)
+        return (route or {}).get('model', 'gpt-4o-mini')
+
+    @staticmethod
+    def _trace(route_name, latency, prompt_tokens, completion_tokens, time_to_first_token, error):
+        started = time.time() - latency
+        attributes = {'route': route_name, 'prompt_tokens': prompt_tokens or 0,
+                      'completion_tokens': completion_tokens or 0, 'error': error}
+        if time_to_first_token is not None:
+            attributes['ttft_ms'] = round(time_to_first_token * 1000, 1)
+            streaming = latency - time_to_first_token
+            if completion_tokens and streaming > 0:
+                attributes['tokens_per_second'] = round(completion_tokens / streaming, 1)
+            tracer.record('llm_first_token', started, time_to_first_token, route=route_name)
+        tracer.record(f"llm.{route_name}", started, latency, **attributes)
+
+    def get_metrics(self):
+        """Return per-route call counts, latency percentiles and token totals."""
+        def percentile(samples, fraction):
+            samples = sorted(samples)
+            return round(samples[max(0, int(len(samples) * fraction) - 1)], 4) if samples else None
+
+        with self.lock:
+            report = {}
+            for name, metrics in self.metrics.items():
+                calls = metrics['calls']
+                report[name] = {
+                    'calls': calls,
+                    'errors': metrics['errors'],
+                    'avg_latency': round(metrics['total_latency'] / calls, 4) if calls else None,
+                    'p50_latency': percentile(metrics['latencies'], 0.5),
+                    'p95_latency': percentile(metrics['latencies'], 0.95),
+                    'p95_time_to_first_token': percentile(metrics['ttfts'], 0.95),
+                    'prompt_tokens': metrics['prompt_tokens'],
+                    'completion_tokens': metrics['completion_tokens'],
+                    'avg_completion_tokens': round(metrics['completion_tokens'] / calls, 1) if calls else None
+                }
+            return report
@@ -1,4 +1,3 @@
-import PyPDF2
 import io
 import os
 from tempfile import NamedTemporaryFile
@@ -20,6 +19,7 @@ class PDFProcessor:
         Returns:
             str: The extracted text content
         """
+        import PyPDF2  # Deferred: only PDF uploads need it
         try:
             # Create a temporary file to save the PDF content
             with NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
@@ -162,5 +162,19 @@ class PDFProcessor:
         else:
             return 'unknown'
 
+def extract_text_from_bytes(data):
+    """
+    Extract text from raw PDF bytes.
+    
+    Module-level so it can be shipped to a worker process.
+    
+    Args:
+        data: The PDF file content as bytes
+        
+    Returns:
+        str: The extracted text content
+    """
+    return PDFProcessor().extract_text_from_pdf(io.BytesIO(data))
+
 # Import re module at the top level
 import re
\ No newline at end of file
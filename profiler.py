@@ -0,0 +1,129 @@
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+
+def frame_label(code):
+    """'qualified.name (file.py:line)' for one stack frame."""
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame):
+    """Frames from the outermost call to frame, joined with ';' (collapsed-stack format)."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples the stacks of running threads at a fixed
+    interval and counts identical stacks. Output is in the collapsed-stack format read by
+    flamegraph.pl, speedscope and most flamegraph viewers.
+    """
+
+    def __init__(self, interval=None, thread_ids=None, exclude_ids=()):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval: Seconds between samples (default PROFILE_INTERVAL_MS / 1000, 10 ms)
+            thread_ids: Only sample these threads (default: all threads)
+            exclude_ids: Threads never sampled (e.g. the one waiting for the profile)
+        """
+        self.interval = interval or int(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.exclude_ids = set(exclude_ids)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns self so results can be read."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.monotonic() - self.started if self.started else 0.0
+        return self
+
+    def _run(self):
+        self.exclude_ids.add(threading.get_ident())
+        per_thread = self.thread_ids is None or len(self.thread_ids) > 1
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()} if per_thread else {}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in self.exclude_ids or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = collapse_stack(frame)
+                if per_thread:
+                    # Group pool threads (job-worker_0, job-worker_1, ...) under one root
+                    stack = re.sub(r'[_-]?\d+$', '', names.get(thread_id, 'thread')) + ';' + stack
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Return 'frame;frame;... count' lines, most frequent first."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top=10):
+        """Sample counts and the functions most often on top of the stack."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(self.stacks.values()) or 1
+        return {
+            'samples': self.samples,
+            'stacks': sum(self.stacks.values()),
+            'duration_seconds': round(self.duration, 3),
+            'interval_ms': round(self.interval * 1000, 3),
+            'top_frames': [{'frame': frame, 'share': round(count / total, 4)} for frame, count in leaves.most_common(top)]
+        }
+
+    def save(self, path):
+        """Write the collapsed stacks to path; returns the path."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        return path
+
+
+def profile_path(name, directory=None):
+    """Unique '<timestamp>-<name>-<id>.collapsed' path in directory (default PROFILE_DIR)."""
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'profile'
+    filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{safe_name}-{uuid.uuid4().hex[:6]}.collapsed"
+    return os.path.join(directory or PROFILE_DIR, filename)
+
+
+# Only one whole-process capture runs at a time
+capture_lock = threading.Lock()
+
+
+def profile_for(seconds, interval=None):
+    """Sample all threads (except the caller) for seconds; returns the stopped profiler, or None if busy."""
+    if not capture_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval, exclude_ids=[threading.get_ident()]).start()
+        time.sleep(seconds)
+        return profiler.stop()
+    finally:
+        capture_lock.release()
@@ -0,0 +1,59 @@
+import threading
+
+try:
+    from flask import has_request_context, request
+except ImportError:  # Flask is only needed for per-endpoint attribution
+    has_request_context = None
+
+
+def current_endpoint():
+    """Name of the Flask endpoint serving the current request, or 'background'."""
+    if has_request_context and has_request_context():
+        return request.endpoint or request.path
+    return 'background'
+
+
+def cached_tokens_from_usage(usage):
+    """Read the cached prompt token count from a completions usage object."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return getattr(details, 'cached_tokens', 0) or 0
+
+
+class PromptCacheStats:
+    """Track provider prompt-cache hits (cached prompt tokens) per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}  # {endpoint: {'calls', 'cache_hits', 'prompt_tokens', 'cached_tokens'}}
+
+    def record(self, usage, endpoint=None):
+        """Record the usage of one completion call."""
+        if usage is None:
+            return
+        endpoint = endpoint or current_endpoint()
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        cached_tokens = cached_tokens_from_usage(usage)
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'cached_tokens': 0
+            })
+            stats['calls'] += 1
+            stats['cache_hits'] += 1 if cached_tokens else 0
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached_tokens
+
+    def get_stats(self):
+        """Return per-endpoint call and token hit rates."""
+        with self.lock:
+            report = {}
+            for endpoint, stats in self.endpoints.items():
+                report[endpoint] = dict(stats)
+                report[endpoint]['call_hit_rate'] = round(stats['cache_hits'] / stats['calls'], 4) if stats['calls'] else 0.0
+                report[endpoint]['token_hit_rate'] = (
+                    round(stats['cached_tokens'] / stats['prompt_tokens'], 4) if stats['prompt_tokens'] else 0.0
+                )
+            return report
+
+
+# Shared by GPTService and IntentClassifier
+prompt_cache_stats = PromptCacheStats()
@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta, timezone
 import json
+import os
 import threading
+from sqlalchemy import select, update, or_, func
+from sqlalchemy.exc import IntegrityError
 from database.connection import get_db_session, init_database
+from database.async_connection import get_async_db_session
 from database.models import ChatSession
 
-# Ensure the required tables exist when this module is imported
-init_database()
-
 class InMemoryRateLimiter:
     """Simple in-memory rate limiter - no database required!"""
     
@@ -142,65 +143,119 @@ class InMemoryRateLimiter:
 
 
 class DatabaseRateLimiter:
-    """Rate limiter that stores counts in the database."""
+    """
+    Rate limiter that stores counts in the database.
 
-    def __init__(self, message_limit=50, reset_period_hours=24):
-        # Ensure database tables are created
+    Besides messages, each session has a token budget per window. Requests reserve an
+    estimate up front (reserve_tokens) and settle it with actual usage afterwards (settle_tokens).
+    """
+
+    def __init__(self, message_limit=50, reset_period_hours=24, token_limit=None):
+        """
+        Args:
+            message_limit: Maximum messages per session and window
+            reset_period_hours: Window length
+            token_limit: Prompt + completion tokens per session and window
+                         (default TOKEN_LIMIT_PER_WINDOW, 200000; 0 disables the token budget)
+        """
+        # Ensure database tables are created (a no-op once the schema is set up)
         init_database()
         self.message_limit = message_limit
         self.reset_period = timedelta(hours=reset_period_hours)
+        self.token_limit = int(token_limit if token_limit is not None else os.getenv('TOKEN_LIMIT_PER_WINDOW', '200000'))
 
     def _get_session(self, session, session_id):
         return session.query(ChatSession).filter(ChatSession.session_id == session_id).first()
 
-    def check_limit(self, session_id):
-        with get_db_session() as session:
-            chat_session = self._get_session(session, session_id)
-            if not chat_session:
+    def _limit_status(self, chat_session):
+        """Compute the limit status for a session row, resetting an expired window in place."""
+        if not chat_session:
+            return {
+                'allowed': True,
+                'current_count': 0,
+                'limit': self.message_limit,
+                'reset_time': None,
+                'remaining': self.message_limit,
+                'time_until_reset': None,
+                **self._token_status(0)
+            }
+
+        first_time = chat_session.first_message_time
+        if first_time and first_time.tzinfo is None:
+            first_time = first_time.replace(tzinfo=timezone.utc)
+        if first_time:
+            reset_time = first_time + self.reset_period
+            if datetime.now(timezone.utc) >= reset_time:
+                chat_session.message_count = 0
+                chat_session.token_count = 0
+                chat_session.first_message_time = None
                 return {
                     'allowed': True,
                     'current_count': 0,
                     'limit': self.message_limit,
                     'reset_time': None,
                     'remaining': self.message_limit,
-                    'time_until_reset': None
+                    **self._token_status(0)
                 }
+        else:
+            reset_time = None
 
-            first_time = chat_session.first_message_time
-            if first_time and first_time.tzinfo is None:
-                first_time = first_time.replace(tzinfo=timezone.utc)
-            if first_time:
-                reset_time = first_time + self.reset_period
-                if datetime.now(timezone.utc) >= reset_time:
-                    chat_session.message_count = 0
-                    chat_session.first_message_time = None
-                    session.flush()
-                    return {
-                        'allowed': True,
-                        'current_count': 0,
-                        'limit': self.message_limit,
-                        'reset_time': None,
-                        'remaining': self.message_limit
-                    }
-            else:
-                reset_time = None
 
+        count = chat_session.message_count or 0
+        allowed = count < self.message_limit
+        remaining = max(0, self.message_limit - count)
+        time_until_reset = None
+        if reset_time:
+            time_until_reset = str(reset_time - datetime.now(timezone.utc)).split('.')[0]
 
-            count = chat_session.message_count or 0
-            allowed = count < self.message_limit
-            remaining = max(0, self.message_limit - count)
-            time_until_reset = None
-            if reset_time:
-                time_until_reset = str(reset_time - datetime.now(timezone.utc)).split('.')[0]
+        return {
+            'allowed': allowed,
+            'current_count': count,
+            'limit': self.message_limit,
+            'reset_time': reset_time,
+            'remaining': remaining,
+            'time_until_reset': time_until_reset,
+            **self._token_status(chat_session.token_count)
+        }
 
-            return {
-                'allowed': allowed,
-                'current_count': count,
-                'limit': self.message_limit,
-                'reset_time': reset_time,
-                'remaining': remaining,
-                'time_until_reset': time_until_reset
-            }
+    def _token_status(self, used):
+        used = max(0, used or 0)  # Settling after a window reset can leave a small negative balance
+        return {
+            'token_limit': self.token_limit,
+            'tokens_used': used,
+            'tokens_remaining': max(0, self.token_limit - used) if self.token_limit else None
+        }
+
+    def _reserve_statement(self, session_id, tokens):
+        """
+        Atomically add tokens to the session's balance if they fit the budget. A session with
+        nothing spent in the window is always let through, so one oversized request can still run.
+        """
+        used = func.coalesce(ChatSession.token_count, 0)
+        return update(ChatSession).where(
+            ChatSession.session_id == session_id,
+            or_(used + tokens <= self.token_limit, used <= 0)
+        ).values(token_count=used + tokens).execution_options(synchronize_session=False)
+
+    @staticmethod
+    def _settle_statement(session_id, delta):
+        return update(ChatSession).where(ChatSession.session_id == session_id).values(
+            token_count=func.coalesce(ChatSession.token_count, 0) + delta
+        ).execution_options(synchronize_session=False)
+
+    @staticmethod
+    def _count_message(chat_session):
+        """Add one message to a session row, starting the window on the first message."""
+        if chat_session.first_message_time is None:
+            chat_session.first_message_time = datetime.now(timezone.utc)
+        chat_session.message_count = (chat_session.message_count or 0) + 1
+        return chat_session.message_count
+
+    def check_limit(self, session_id):
+        with get_db_session() as session:
+            status = self._limit_status(self._get_session(session, session_id))
+            session.flush()
+            return status
 
     def increment_count(self, session_id):
         with get_db_session() as session:
@@ -209,17 +264,48 @@ class DatabaseRateLimiter:
                 chat_session = ChatSession.create_session()
                 chat_session.session_id = session_id
                 session.add(chat_session)
-            if chat_session.first_message_time is None:
-                chat_session.first_message_time = datetime.now(timezone.utc)
-            chat_session.message_count = (chat_session.message_count or 0) + 1
+            count = self._count_message(chat_session)
             session.flush()
-            return chat_session.message_count
+            return count
+
+    def reserve_tokens(self, session_id, tokens):
+        """
+        Reserve an estimated number of tokens before serving a request.
+
+        Returns:
+            bool: False if the reservation would exceed the session's token budget
+        """
+        if not self.token_limit:
+            return True
+        for attempt in range(2):
+            try:
+                with get_db_session() as session:
+                    if session.execute(self._reserve_statement(session_id, tokens)).rowcount:
+                        return True
+                    if self._get_session(session, session_id) is not None:
+                        return False
+                    # First request of a session without a row yet
+                    session.add(ChatSession.create_session(session_id=session_id))
+                    session.flush()
+                    return bool(session.execute(self._reserve_statement(session_id, tokens)).rowcount)
+            except IntegrityError:
+                # A concurrent first request inserted the row; the retry reserves against it
+                if attempt:
+                    raise
+
+    def settle_tokens(self, session_id, reserved, actual):
+        """Replace a reservation with the tokens actually used."""
+        if not self.token_limit or actual == reserved:
+            return
+        with get_db_session() as session:
+            session.execute(self._settle_statement(session_id, actual - reserved))
 
     def reset_session(self, session_id):
         with get_db_session() as session:
             chat_session = self._get_session(session, session_id)
             if chat_session:
                 chat_session.message_count = 0
+                chat_session.token_count = 0
                 chat_session.first_message_time = None
                 session.flush()
 
@@ -248,5 +334,71 @@ class DatabaseRateLimiter:
                 reset_time = first_time + self.reset_period
                 if now >= reset_time:
                     s.message_count = 0
+                    s.token_count = 0
                     s.first_message_time = None
-            session.flush()
\ No newline at end of file
+            session.flush()
+
+
+class AsyncDatabaseRateLimiter(DatabaseRateLimiter):
+    """Async counterpart of DatabaseRateLimiter; shares its limit logic."""
+
+    def __init__(self, message_limit=50, reset_period_hours=24, token_limit=None):
+        # Tables are created by AsyncDatabaseService.init() (or the sync engine)
+        self.message_limit = message_limit
+        self.reset_period = timedelta(hours=reset_period_hours)
+        self.token_limit = int(token_limit if token_limit is not None else os.getenv('TOKEN_LIMIT_PER_WINDOW', '200000'))
+
+    async def _get_session(self, session, session_id):
+        return await session.scalar(select(ChatSession).where(ChatSession.session_id == session_id))
+
+    async def check_limit(self, session_id):
+        async with get_async_db_session() as session:
+            status = self._limit_status(await self._get_session(session, session_id))
+            await session.flush()
+            return status
+
+    async def increment_count(self, session_id):
+        async with get_async_db_session() as session:
+            chat_session = await self._get_session(session, session_id)
+            if not chat_session:
+                chat_session = ChatSession.create_session(session_id=session_id)
+                session.add(chat_session)
+            count = self._count_message(chat_session)
+            await session.flush()
+            return count
+
+    async def reserve_tokens(self, session_id, tokens):
+        if not self.token_limit:
+            return True
+        for attempt in range(2):
+            try:
+                async with get_async_db_session() as session:
+                    if (await session.execute(self._reserve_statement(session_id, tokens))).rowcount:
+                        return True
+                    if await self._get_session(session, session_id) is not None:
+                        return False
+                    session.add(ChatSession.create_session(session_id=session_id))
+                    await session.flush()
+                    return bool((await session.execute(self._reserve_statement(session_id, tokens))).rowcount)
+            except IntegrityError:
+                # A concurrent first request inserted the row; the retry reserves against it
+                if attempt:
+                    raise
+
+    async def settle_tokens(self, session_id, reserved, actual):
+        if not self.token_limit or actual == reserved:
+            return
+        async with get_async_db_session() as session:
+            await session.execute(self._settle_statement(session_id, actual - reserved))
+
+    async def reset_session(self, session_id):
+        async with get_async_db_session() as session:
+            chat_session = await self._get_session(session, session_id)
+            if chat_session:
+                chat_session.message_count = 0
+                chat_session.token_count = 0
+                chat_session.first_message_time = None
+                await session.flush()
+
+    async def get_session_stats(self, session_id):
+        return await self.check_limit(session_id)
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # FAISS is optional; the NumPy scan is fast enough for a few thousand entries
+    faiss = None
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    Questions are embedded and stored in a fixed-size matrix; a lookup returns the answer of
+    the most similar live entry when its cosine similarity reaches the threshold. Entries
+    expire after a TTL and the least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, embedder, threshold=0.9, max_size=1000, ttl_seconds=86400,
+                 clock=time.monotonic, use_faiss=False):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder: Object with embed(text) returning an L2-normalized vector and a dim attribute
+            threshold: Minimum cosine similarity for a hit
+            max_size: Maximum number of cached answers
+            ttl_seconds: Lifetime of a cached answer in seconds
+            clock: Time source (injectable for tests)
+            use_faiss: Search with a FAISS inner-product index when faiss is installed
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.vectors = np.zeros((max_size, embedder.dim), dtype=np.float32)
+        self.expires_at = np.full(max_size, -np.inf)  # -inf marks an empty slot
+        self.last_used = np.zeros(max_size, dtype=np.int64)
+        self.answers = [None] * max_size
+        self.latencies = [0.0] * max_size  # How long the cached answer took to generate
+        self._tick = 0
+
+        self.index = None
+        if use_faiss and faiss is not None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedder.dim))
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.latency_saved = 0.0
+        self.lookup_time = 0.0
+
+    def _touch(self, slot):
+        self._tick += 1
+        self.last_used[slot] = self._tick
+
+    def _nearest(self, vector, now):
+        """Return (slot, similarity) of the most similar live entry, or (None, 0.0)."""
+        live = self.expires_at > now
+        if not live.any():
+            return None, 0.0
+        if self.index is not None:
+            scores, ids = self.index.search(vector.reshape(1, -1), min(8, self.index.ntotal))
+            for score, slot in zip(scores[0], ids[0]):
+                if slot >= 0 and live[slot]:
+                    return int(slot), float(score)
+            return None, 0.0
+        scores = np.where(live, self.vectors @ vector, -np.inf)
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def _clear_slot(self, slot):
+        self.expires_at[slot] = -np.inf
+        self.answers[slot] = None
+        if self.index is not None:
+            self.index.remove_ids(np.array([slot], dtype=np.int64))
+
+    def get(self, question):
+        """Return the cached answer for a similar question, or None."""
+        started = time.perf_counter()
+        vector = self.embedder.embed(question)
+        with self.lock:
+            now = self.clock()
+            expired = np.flatnonzero((self.expires_at != -np.inf) & (self.expires_at <= now))
+            for slot in expired:
+                self._clear_slot(slot)
+            self.expirations += len(expired)
+
+            slot, similarity = self._nearest(vector, now)
+            elapsed = time.perf_counter() - started
+            self.lookup_time += elapsed
+            if slot is None or similarity < self.threshold:
+                self.misses += 1
+                return None
+            self._touch(slot)
+            self.hits += 1
+            self.latency_saved += max(0.0, self.latencies[slot] - elapsed)
+            return self.answers[slot]
+
+    def set(self, question, answer, latency=0.0):
+        """
+        Cache an answer.
+
+        Args:
+            question: The question that was answered
+            answer: The full answer text
+            latency: Seconds it took to generate the answer (reported as saved on each hit)
+        """
+        vector = self.embedder.embed(question)
+        with self.lock:
+            now = self.clock()
+            slot, similarity = self._nearest(vector, now)
+            if slot is None or similarity < self.threshold:
+                empty = np.flatnonzero(self.expires_at <= now)
+                if len(empty):
+                    slot = int(empty[0])
+                else:
+                    slot = int(np.argmin(self.last_used))
+                    self.evictions += 1
+            if self.answers[slot] is not None:
+                self._clear_slot(slot)
+
+            self.vectors[slot] = vector
+            self.expires_at[slot] = now + self.ttl
+            self.answers[slot] = answer
+            self.latencies[slot] = latency
+            self._touch(slot)
+            if self.index is not None:
+                self.index.add_with_ids(vector.reshape(1, -1), np.array([slot], dtype=np.int64))
+
+    def clear(self):
+        """Remove all entries (statistics are kept)."""
+        with self.lock:
+            for slot in np.flatnonzero(self.expires_at != -np.inf):
+                self._clear_slot(slot)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.expires_at > self.clock()))
+
+    def get_stats(self):
+        """Return size, hit-rate and latency-saved statistics."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': int(np.count_nonzero(self.expires_at > self.clock())),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'threshold': self.threshold,
+                'embedder': getattr(self.embedder, 'name', type(self.embedder).__name__),
+                'index': 'faiss' if self.index is not None else 'numpy',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'latency_saved_seconds': round(self.latency_saved, 3),
+                'avg_lookup_ms': round(self.lookup_time / lookups * 1000, 3) if lookups else 0.0
+            }
@@ -0,0 +1,166 @@
+"""
+Versioned, streamable snapshots of a chat session, for moving sessions between workers and
+environments.
+
+A snapshot is JSON lines, optionally compressed as a single gzip or zstd stream:
+
+    {"format": "resumeai-session", "version": 1, "session_id": ..., "session_start": ..., "user_info": {...}, ...}
+    {"human": "...", "ai": "...", "created_at": "...", "intent": "..."}    one line per exchange, oldest first
+    {"end": true, "turns": 2}
+
+A user message that never got a reply has "ai": null (and a lone assistant message "human": null),
+so every stored user/assistant message survives the round trip. The trailer lets readers tell a
+complete snapshot from a truncated one. Compression is detected from the first bytes on read.
+"""
+import gzip
+import io
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT = 'resumeai-session'
+VERSION = 1
+CHUNK_SIZE = 64 * 1024  # Uncompressed bytes buffered per compressed chunk
+MEDIA_TYPES = {'gzip': 'application/gzip', 'zstd': 'application/zstd', 'none': 'application/x-ndjson'}
+EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst', 'none': '.jsonl'}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def pair_messages(messages):
+    """Group stored messages (oldest first) into exchanges; system messages are skipped."""
+    pending = None
+    for message in messages:
+        if message['message_type'] == 'user':
+            if pending is not None:
+                yield pending
+            pending = {'human': message['content'], 'ai': None,
+                       'created_at': message.get('created_at'), 'intent': message.get('intent')}
+        elif message['message_type'] == 'assistant':
+            if pending is None:
+                pending = {'human': None, 'created_at': message.get('created_at'), 'intent': None}
+            pending['ai'] = message['content']
+            yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+
+def turn_messages(turn):
+    """The stored messages of one exchange, for DatabaseService.bulk_save_messages."""
+    messages = []
+    if turn.get('human') is not None:
+        messages.append({'message_type': 'user', 'content': turn['human'],
+                         'intent': turn.get('intent'), 'created_at': turn.get('created_at')})
+    if turn.get('ai') is not None:
+        messages.append({'message_type': 'assistant', 'content': turn['ai'], 'created_at': turn.get('created_at')})
+    return messages
+
+
+def resolve_compression(compression):
+    """Validate a compression name; zstd falls back to gzip when zstandard isn't installed."""
+    if compression not in MEDIA_TYPES:
+        raise ValueError(f"Unknown snapshot compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        print("⚠️  zstandard not installed, compressing snapshot with gzip")
+        return 'gzip'
+    return compression
+
+
+def snapshot_chunks(header, turns, compression='gzip'):
+    """
+    Yield the snapshot as bytes chunks, reading turns lazily so long histories are never
+    held in memory at once.
+
+    Args:
+        header: Session fields for the first line (session_id, session_start, user_info, ...)
+        turns: Iterable of {'human', 'ai', 'created_at', 'intent'} dicts, oldest first
+        compression: 'gzip', 'zstd' or 'none' (resolve_compression() first to know which was used)
+    """
+    compression = resolve_compression(compression)
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    elif compression == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compressor = None
+
+    def encode(data, final=False):
+        if compressor is None:
+            return data
+        out = compressor.compress(data)
+        return out + compressor.flush() if final else out
+
+    buffer = [json.dumps(dict(header, format=FORMAT, version=VERSION))]
+    size = len(buffer[0])
+    count = 0
+    for turn in turns:
+        line = json.dumps({key: value for key, value in turn.items() if value is not None or key in ('human', 'ai')})
+        buffer.append(line)
+        size += len(line)
+        count += 1
+        if size >= CHUNK_SIZE:
+            chunk = encode(('\n'.join(buffer) + '\n').encode('utf-8'))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    buffer.append(json.dumps({'end': True, 'turns': count}))
+    yield encode(('\n'.join(buffer) + '\n').encode('utf-8'), final=True)
+
+
+def read_snapshot(stream):
+    """
+    Open a snapshot from a binary stream (compression detected from its first bytes).
+
+    Returns:
+        (header, turns): the header dict and a generator of turn dicts. The generator raises
+        ValueError at the end if the snapshot is truncated or malformed.
+
+    Raises:
+        ValueError: The stream isn't a snapshot, or has a newer version than this code reads
+    """
+    if not hasattr(stream, 'peek'):
+        stream = io.BufferedReader(stream)
+    magic = stream.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        reader = gzip.GzipFile(fileobj=stream)
+    elif magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read this snapshot")
+        reader = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream))
+    else:
+        reader = stream
+
+    lines = (line for line in reader if line.strip())
+    try:
+        header = json.loads(next(lines))
+    except (StopIteration, ValueError, OSError, zlib.error):
+        raise ValueError("Not a session snapshot")
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ValueError("Not a session snapshot")
+    if not isinstance(header.get('version'), int) or header['version'] > VERSION:
+        raise ValueError(f"Unsupported session snapshot version: {header.get('version')}")
+
+    def turns():
+        count = 0
+        try:
+            for line in lines:
+                turn = json.loads(line)
+                if turn.get('end'):
+                    if turn.get('turns') != count:
+                        raise ValueError(f"Session snapshot has {count} turns, trailer says {turn.get('turns')}")
+                    return
+                if 'human' not in turn or 'ai' not in turn:
+                    raise ValueError(f"Malformed session snapshot turn {count + 1}")
+                count += 1
+                yield turn
+        except (EOFError, OSError, zlib.error, json.JSONDecodeError) as e:
+            raise ValueError(f"Corrupt session snapshot after {count} turns: {e}")
+        raise ValueError(f"Session snapshot is truncated after {count} turns")
+
+    header.pop('format')
+    return header, turns()
@@ -0,0 +1,98 @@
+"""
+Benchmark insert throughput and table size of standard vs compact chat message storage.
+
+Usage:
+    python testing/benchmark_message_storage.py [--turns 2000] [--url postgresql://...]
+
+Without --url each mode writes to its own SQLite file and the file size is reported.
+With a PostgreSQL URL both tables are created in that database (partitioned for compact)
+and pg_total_relation_size is reported; the benchmark rows are deleted afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+from database.connection import create_tables
+from database.models import ChatSession, ChatMessage, CompactChatMessage
+
+QUESTIONS = [
+    "how long should my resume be?",
+    "can you rewrite my summary section?",
+    "what should I put in the skills section for a data analyst role?",
+    "hello",
+]
+ANSWER_PARAGRAPH = (
+    "## Professional Summary\n\n**Data analyst** with 5+ years of experience turning raw data into "
+    "decisions. Skilled in **SQL**, **Python** and **Tableau**; built dashboards used by 40+ stakeholders.\n\n"
+    "- Automated weekly reporting, saving 6 hours per week\n- Led A/B tests that lifted conversion by 8%\n\n"
+)
+
+
+def fake_turn(rng):
+    """One user message and one assistant answer of realistic size (100 B - 4 KB)."""
+    answer = ANSWER_PARAGRAPH * rng.randint(0, 12) + "Let me know if you'd like me to tailor this further."
+    return rng.choice(QUESTIONS), answer
+
+
+def run(engine, model, turns):
+    """Insert `turns` chat turns (two messages per transaction, like a chat request)."""
+    rng = random.Random(42)
+    with Session(engine) as session:
+        chat_session = ChatSession.create_session(session_id=str(uuid.uuid4()))
+        session.add(chat_session)
+        session.commit()
+        session_id = chat_session.session_id
+
+    started = time.perf_counter()
+    for _ in range(turns):
+        question, answer = fake_turn(rng)
+        with Session(engine) as session:
+            session.add(model.create(session_id, 'user', question))
+            session.add(model.create(session_id, 'assistant', answer))
+            session.commit()
+    elapsed = time.perf_counter() - started
+    return session_id, turns * 2 / elapsed
+
+
+def table_size(engine, model, path=None):
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            return connection.execute(text(f"SELECT pg_total_relation_size('{model.__tablename__}')")).scalar()
+    engine.dispose()
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--url', help="PostgreSQL URL (default: temporary SQLite files)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'messages':>10}{'rows/s':>10}{'size (KB)':>12}{'bytes/msg':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, model in (('standard', ChatMessage), ('compact', CompactChatMessage)):
+            path = os.path.join(tmp, f"{mode}.db")
+            engine = create_engine(args.url or f"sqlite:///{path}")
+            with engine.begin() as connection:
+                create_tables(connection)
+            session_id, rate = run(engine, model, args.turns)
+            size = table_size(engine, model, path)
+            print(f"{mode:<10}{args.turns * 2:>10}{rate:>10.0f}{size / 1024:>12.0f}{size / (args.turns * 2):>11.0f}")
+            if args.url:
+                with engine.begin() as connection:
+                    connection.execute(model.__table__.delete().where(model.session_id == session_id))
+                    connection.execute(ChatSession.__table__.delete().where(ChatSession.session_id == session_id))
+
+
+if __name__ == '__main__':
+    main()
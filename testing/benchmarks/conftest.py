@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+
+import pytest
+
+# Use the SQLite engine profile so the database-backed benchmarks need no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the repository root to sys.path to import modules
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+
+RESUME_TEXT = """Dana Smith
+dana.smith@example.com | 555-123-4567 | 12 Main Street, Springfield
+
+PROFESSIONAL SUMMARY
+Data analyst with 5 years of experience turning product and marketing data into decisions.
+
+WORK EXPERIENCE
+Senior Data Analyst, Example Corp (2021 - present)
+- Built Tableau dashboards used by 40+ stakeholders across sales and marketing
+- Automated weekly reporting with SQL and Python, saving 6 hours per week
+- Designed A/B tests that lifted checkout conversion by 8%
+
+Data Analyst, Sample Inc (2019 - 2021)
+- Cleaned and modeled customer data in Snowflake
+- Presented monthly KPI reviews to the leadership team
+
+EDUCATION
+Bachelor of Science in Statistics, State University, GPA 3.7
+
+TECHNICAL SKILLS
+SQL, Python (pandas, scikit-learn), Tableau, Excel, A/B testing, dbt
+"""
+
+JOB_PAGE = """<html><head><title>Data Analyst - Example Corp</title>
+<style>body { font-family: sans-serif; }</style><script>window.analytics = {};</script></head>
+<body><nav><a href="/">Home</a><a href="/jobs">Jobs</a></nav>
+<h1>Data Analyst</h1><p>Example Corp is hiring a Data Analyst to join the analytics team.</p>
+<h2>Responsibilities</h2><ul>""" + "<li>Build dashboards and analyze product usage with SQL</li>" * 30 + """</ul>
+<h2>Requirements</h2><ul>""" + "<li>3+ years of experience with SQL and Python</li>" * 30 + """</ul>
+<img src="logo.png"><input type="text" name="email"><footer>Equal opportunity employer</footer></body></html>"""
+
+
+@pytest.fixture(scope='session')
+def resume_text():
+    return RESUME_TEXT
+
+
+@pytest.fixture(scope='session')
+def pdf_bytes():
+    with open(os.path.join(ROOT_DIR, 'testing', 'test.pdf'), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def job_page(monkeypatch):
+    """Serve the job page to utils.Website without network access."""
+    import requests  # utils imports it inside Website, so patch the library itself
+
+    class FakeResponse:
+        content = JOB_PAGE.encode('utf-8')
+
+    monkeypatch.setattr(requests, 'get', lambda url, headers=None: FakeResponse())
+    return 'https://jobs.example.com/data-analyst'
+
+
+@pytest.fixture
+def user_info():
+    return {
+        'name': 'Dana Smith',
+        'current_role': 'data analyst',
+        'experience': '5 years',
+        'skills': 'SQL, Python, Tableau',
+        'career_interest': 'product analytics',
+    }
+
+
+@pytest.fixture
+def chat_history():
+    turns = []
+    for i in range(15):
+        turns.append(f"Human: can you improve bullet {i} of my experience section?")
+        turns.append(f"AI: Here is a stronger version of bullet {i}: **Automated weekly reporting**, saving 6 hours per week.")
+    return "\n".join(turns)
+
+
+@pytest.fixture
+def memory_manager():
+    from memory_manager import MemoryManager
+    return MemoryManager(k=30)
+
+
+@pytest.fixture
+def conversation():
+    """Turns for filling a 30-turn window past capacity."""
+    return [(f"can you improve bullet {i} of my experience section?",
+             f"Here is a stronger version of bullet {i}: **Automated weekly reporting**, saving 6 hours per week.")
+            for i in range(60)]
@@ -0,0 +1,97 @@
+"""
+Compare the memory held by the native chat history ring and LangChain's window memory.
+
+Usage:
+    python testing/benchmarks/history_memory.py                    # 200 sessions, 60 turns each, k=30
+    python testing/benchmarks/history_memory.py --sessions 1000 --turns 100 --k 10
+    python testing/benchmarks/history_memory.py --json
+
+Each implementation fills --sessions histories with --turns exchanges and reports the bytes
+still allocated (tracemalloc) once they are built, total and per session. LangChain's
+ConversationBufferWindowMemory keeps every message it was given and only windows on read, so
+its footprint grows with --turns; the native ring keeps the last k turns. LangChain is
+skipped when it isn't installed.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT)
+
+
+def native_history(k, turns):
+    from chat_history import ChatHistory
+    history = ChatHistory(k)
+    for human, ai in turns:
+        history.add(human, ai)
+    return history
+
+
+def langchain_history(k, turns):
+    from langchain.memory import ConversationBufferWindowMemory
+    memory = ConversationBufferWindowMemory(k=k)
+    for human, ai in turns:
+        memory.save_context({"input": human}, {"output": ai})
+    return memory
+
+
+def measure(build, sessions, k, turns):
+    """Bytes allocated by `sessions` histories built from `turns`, after the build garbage is freed."""
+    build(k, turns[:1])  # Import and warm up outside the measurement
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        histories = [build(k, turns) for _ in range(sessions)]
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del histories
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=60, help="Exchanges added to each session")
+    parser.add_argument('--k', type=int, default=30, help="Window size in turns")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    turns = [(f"can you improve bullet {i} of my experience section?",
+              f"Here is a stronger version of bullet {i}: **Automated weekly reporting**, saving 6 hours per week.")
+             for i in range(args.turns)]
+    implementations = {'native': native_history, 'langchain': langchain_history}
+
+    report = {'sessions': args.sessions, 'turns': args.turns, 'k': args.k, 'results': {}}
+    for name, build in implementations.items():
+        try:
+            held = measure(build, args.sessions, args.k, turns)
+        except ImportError:
+            report['results'][name] = None
+            continue
+        report['results'][name] = {'bytes': held, 'bytes_per_session': round(held / max(1, args.sessions))}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"🧠 {args.sessions} sessions x {args.turns} turns, window k={args.k}")
+    for name, result in report['results'].items():
+        if result is None:
+            print(f"  {name:<10} not installed, skipped")
+        else:
+            print(f"  {name:<10} {result['bytes'] / 1024:>10.1f} KiB  ({result['bytes_per_session']:,} bytes/session)")
+    native, langchain = report['results']['native'], report['results']['langchain']
+    if native and langchain:
+        print(f"\nNative history holds {langchain['bytes'] / max(1, native['bytes']):.1f}x less memory")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Run the hot-path microbenchmarks and compare them against the stored baseline.
+
+Usage:
+    python testing/benchmarks/run_benchmarks.py                    # compare, fail on regressions
+    python testing/benchmarks/run_benchmarks.py --max-regression 10
+    python testing/benchmarks/run_benchmarks.py --save             # record a new baseline
+
+Baselines live in testing/benchmarks/baselines, one folder per machine/interpreter, so
+compare on the machine that recorded the baseline (or record one there first). A run fails
+when any benchmark's median is more than --max-regression percent (default
+BENCHMARK_MAX_REGRESSION or 20) slower than the latest baseline. Extra arguments are passed
+to pytest, e.g. -k rate_limit.
+"""
+import argparse
+import glob
+import os
+import sys
+
+import pytest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, 'baselines')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help="Record the results as the new baseline")
+    parser.add_argument('--max-regression', type=float,
+                        default=float(os.getenv('BENCHMARK_MAX_REGRESSION', '20')),
+                        help="Allowed median slowdown in percent")
+    args, pytest_args = parser.parse_known_args()
+
+    options = [BENCHMARK_DIR, '-q', '--benchmark-only', f"--benchmark-storage=file://{BASELINE_DIR}",
+               '--benchmark-columns=min,median,mean,stddev,rounds', '--benchmark-sort=name']
+    if args.save:
+        options.append('--benchmark-save=baseline')
+    else:
+        if not glob.glob(os.path.join(BASELINE_DIR, '*', '*.json')):
+            print("No baseline recorded yet; run with --save first.")
+            return 2
+        options += ['--benchmark-compare', f"--benchmark-compare-fail=median:{args.max_regression:g}%"]
+    return pytest.main(options + pytest_args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
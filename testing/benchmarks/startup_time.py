@@ -0,0 +1,102 @@
+"""
+Measure worker startup: how long importing the app takes and which modules it spends the time on.
+
+Usage:
+    python testing/benchmarks/startup_time.py                  # import app, top 15 packages
+    python testing/benchmarks/startup_time.py --module gpt_service --top 25
+    python testing/benchmarks/startup_time.py --repeat 5 --budget 2.5
+
+Each run imports the module in a fresh interpreter with `python -X importtime` and the
+background warm-up disabled, so only what blocks boot is counted. Self times are summed per
+top-level package (sqlalchemy, openai, ...) and per project module. With --repeat the fastest
+run is reported. --budget fails (exit 1) when the import takes longer than that many seconds.
+Without DB_ENGINE_PROFILE set, the SQLite test profile is used so no database server is needed.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module):
+    """Import module in a fresh interpreter; returns (wall seconds, [(self_us, cumulative_us, depth, name)])."""
+    env = dict(os.environ, LAZY_WARM_UP='false')
+    env.setdefault('DB_ENGINE_PROFILE', 'test')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return elapsed, entries
+
+
+def summarize(entries, top):
+    """Import time per top-level package and the slowest project modules (milliseconds)."""
+    packages = Counter()
+    for self_us, _, _, name in entries:
+        packages[name.split('.')[0]] += self_us
+    project = {os.path.splitext(n)[0] for n in os.listdir(ROOT) if n.endswith('.py')} | {'database'}
+    own = {}
+    for _, cumulative_us, _, name in entries:
+        if name.split('.')[0] in project:
+            own[name] = max(own.get(name, 0), cumulative_us)
+    own = sorted(((us, name) for name, us in own.items()), reverse=True)
+    return {
+        'total_ms': round(sum(self_us for self_us, _, _, _ in entries) / 1000, 1),
+        'modules_imported': len(entries),
+        'packages': [{'package': name, 'ms': round(us / 1000, 1)} for name, us in packages.most_common(top)],
+        'project_modules': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for us, name in own[:top]]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help="Module to import (default app)")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, help="Fail when the import takes longer (seconds)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 2
+    wall, entries = min(runs, key=lambda run: run[0])
+    report = {'module': args.module, 'wall_seconds': round(wall, 3), **summarize(entries, args.top)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"⏱️  import {args.module}: {report['wall_seconds']:.3f}s wall "
+              f"(interpreter included), {report['total_ms']:.0f} ms in {report['modules_imported']} imports")
+        print("\nSelf time per package:")
+        for row in report['packages']:
+            print(f"  {row['ms']:>9.1f} ms  {row['package']}")
+        print("\nProject modules (cumulative, including what they import):")
+        for row in report['project_modules']:
+            print(f"  {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+
+    if args.budget is not None and wall > args.budget:
+        print(f"\n❌ Startup took {wall:.3f}s, over the {args.budget:.3f}s budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
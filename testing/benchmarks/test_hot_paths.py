@@ -0,0 +1,146 @@
+"""
+Microbenchmarks for the request hot paths.
+
+Run through testing/benchmarks/run_benchmarks.py, which saves baselines and fails when a
+benchmark's median regresses by more than the allowed percentage.
+"""
+import io
+import uuid
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from chat_history import ChatHistory
+from gpt_service import GPTService
+from pdf_processor import PDFProcessor
+from rate_limit import InMemoryRateLimiter, DatabaseRateLimiter
+from response_handlers import ResponseHandlers
+from user_intent import IntentClassifier
+from utils import Website
+
+FALLBACK_INPUTS = [
+    "hello",
+    "my name is Dana Smith",
+    "i have 5 years of experience in analytics",
+    "https://jobs.example.com/data-analyst",
+    "how long should my resume be?",
+    "can you rewrite my summary section for a product analyst role?",
+]
+
+
+@pytest.mark.benchmark(group='intent')
+def test_fallback_classification(benchmark):
+    classifier = IntentClassifier(client=None)
+    benchmark(lambda: [classifier._simple_fallback_classification(text) for text in FALLBACK_INPUTS])
+
+
+@pytest.mark.benchmark(group='pdf')
+def test_extract_text_from_pdf(benchmark, pdf_bytes):
+    processor = PDFProcessor()
+    text = benchmark(lambda: processor.extract_text_from_pdf(io.BytesIO(pdf_bytes)))
+    assert text
+
+
+@pytest.mark.benchmark(group='pdf')
+def test_detect_document_type(benchmark, resume_text):
+    processor = PDFProcessor()
+    assert benchmark(processor.detect_document_type, resume_text) == 'resume'
+
+
+@pytest.mark.benchmark(group='prompt')
+def test_create_messages(benchmark, user_info, chat_history):
+    service = GPTService(client=None, response_handlers=ResponseHandlers())
+    messages = benchmark(service._create_messages, "rewrite my summary section", is_website=False,
+                         user_info=user_info, chat_history=chat_history)
+    assert messages[-1]['role'] == 'user'
+
+
+@pytest.mark.benchmark(group='prompt')
+def test_build_memory_context(benchmark, user_info):
+    service = GPTService(client=None, response_handlers=ResponseHandlers())
+    assert 'Dana Smith' in benchmark(service._build_memory_context, user_info)
+
+
+@pytest.mark.benchmark(group='memory')
+def test_memory_add_message(benchmark, memory_manager):
+    benchmark(memory_manager.add_message, "how long should my resume be?", "One page is ideal for most candidates.")
+
+
+@pytest.mark.benchmark(group='memory')
+def test_memory_get_chat_history(benchmark, memory_manager):
+    for i in range(30):
+        memory_manager.add_message(f"question {i}", f"answer {i}")
+    assert benchmark(memory_manager.get_chat_history)
+
+
+def _langchain_window(k):
+    memory_module = pytest.importorskip('langchain.memory')
+    return memory_module.ConversationBufferWindowMemory(k=k)
+
+
+@pytest.mark.benchmark(group='history_add')
+def test_native_history_add(benchmark, conversation):
+    def fill():
+        history = ChatHistory(30)
+        for human, ai in conversation:
+            history.add(human, ai)
+        return history
+    assert len(benchmark(fill)) == 30
+
+
+@pytest.mark.benchmark(group='history_add')
+def test_langchain_history_add(benchmark, conversation):
+    def fill():
+        memory = _langchain_window(30)
+        for human, ai in conversation:
+            memory.save_context({"input": human}, {"output": ai})
+        return memory
+    benchmark(fill)
+
+
+@pytest.mark.benchmark(group='history_read')
+def test_native_history_read(benchmark, conversation):
+    history = ChatHistory(30)
+    for human, ai in conversation:
+        history.add(human, ai)
+    assert benchmark(lambda: history.buffer)
+
+
+@pytest.mark.benchmark(group='history_read')
+def test_langchain_history_read(benchmark, conversation):
+    memory = _langchain_window(30)
+    for human, ai in conversation:
+        memory.save_context({"input": human}, {"output": ai})
+    assert benchmark(lambda: memory.buffer)
+
+
+@pytest.mark.benchmark(group='rate_limit')
+def test_in_memory_rate_limiter(benchmark):
+    limiter = InMemoryRateLimiter(message_limit=10 ** 9)
+    session_ids = [str(uuid.uuid4()) for _ in range(100)]
+
+    def check_and_count():
+        for session_id in session_ids:
+            limiter.check_limit(session_id)
+            limiter.increment_count(session_id)
+
+    benchmark(check_and_count)
+
+
+@pytest.mark.benchmark(group='rate_limit')
+def test_database_rate_limiter(benchmark):
+    limiter = DatabaseRateLimiter(message_limit=10 ** 9)
+    session_id = str(uuid.uuid4())
+
+    def check_and_count():
+        limiter.check_limit(session_id)
+        limiter.increment_count(session_id)
+
+    benchmark(check_and_count)
+
+
+@pytest.mark.benchmark(group='website')
+def test_website_parsing(benchmark, job_page):
+    website = benchmark(Website, job_page)
+    assert 'Requirements' in website.text and 'window.analytics' not in website.text
@@ -0,0 +1,273 @@
+"""
+Local OpenAI-compatible server for offline load tests.
+
+Serves /v1/chat/completions (streaming and non-streaming, with function calls for the
+intent classifier), /v1/embeddings and /v1/models, plus /jobs/<id> pages so job-URL
+messages can be scraped without the internet. Latency, token rate and error injection
+are configurable.
+
+Usage:
+    python testing/fake_openai_server.py [--port 8600] [--latency-ms 400] [--tokens-per-second 60] [--error-rate 0.01]
+
+Then start the app with OPENAI_BASE_URL=http://127.0.0.1:8600/v1 OPENAI_API_KEY=fake.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "Great question! Here is how I would approach it.\n\n"
+    "**1. Lead with impact.** Start each bullet with a strong verb and quantify results, "
+    "for example *\"Reduced report turnaround by 40% by automating SQL pipelines\"*.\n\n"
+    "**2. Tailor to the role.** Mirror the key skills from the job description in your summary "
+    "and skills sections so both recruiters and applicant tracking systems find them.\n\n"
+    "**3. Keep it concise.** One page for under ten years of experience, two pages at most otherwise.\n\n"
+    "Would you like me to rewrite a specific section of your resume?"
+)
+
+JOB_PAGE = """<html><head><title>Data Analyst - Example Corp</title></head><body>
+<h1>Data Analyst</h1><p>Example Corp is hiring a Data Analyst to join the analytics team.</p>
+<h2>Responsibilities</h2><ul><li>Build dashboards in Tableau</li><li>Write SQL to analyze product usage</li>
+<li>Present findings to stakeholders</li></ul>
+<h2>Requirements</h2><ul><li>3+ years of experience with SQL and Python</li><li>Experience with A/B testing</li>
+<li>Strong communication skills</li></ul></body></html>"""
+
+URL_PATTERN = re.compile(r'https?://\S+')
+
+
+class FakeOpenAIConfig:
+    """Behaviour knobs, shared by all handler threads."""
+
+    def __init__(self, latency_ms=400, jitter_ms=150, tokens_per_second=60, max_tokens=120,
+                 error_rate=0.0, error_status=500, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.errors = 0
+
+    def record(self, endpoint, error=False):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.errors += 1 if error else 0
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def first_token_delay(self):
+        with self.lock:
+            return max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def get_stats(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'injected_errors': self.errors}
+
+
+def choose_function(functions, text):
+    """Pick the intent function a real model would likely call for this message."""
+    names = {f['name']: f for f in functions}
+    lowered = text.lower()
+    url = URL_PATTERN.search(text)
+    if url and 'process_job_url' in names:
+        return 'process_job_url', {'url': url.group(0)}
+    for name, words in (('handle_greeting', ('hi', 'hello', 'hey')), ('handle_goodbye', ('bye', 'thanks, bye'))):
+        if name in names and lowered.strip(' !.') in words:
+            return name, {list(names[name]['parameters']['properties'])[0]: text}
+    if 'process_job_description' in names and len(text) > 300 and 'requirements' in lowered:
+        return 'process_job_description', {'job_description': text}
+    personal = re.match(r"(my name is|i have \d+ years|i work as) (.+)", lowered)
+    if personal and 'store_personal_info' in names:
+        info_type = {'my name is': 'name', 'i work as': 'current_role'}.get(personal.group(1), 'experience')
+        return 'store_personal_info', {'info_type': info_type, 'info_value': personal.group(2).strip(' .!')}
+    if 'answer_career_question' in names:
+        return 'answer_career_question', {'question': text}
+    return None, None
+
+
+def fake_embedding(text, dimensions):
+    """Deterministic unit-length pseudo-embedding."""
+    rng = random.Random(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    config = None  # Set by make_server
+
+    def log_message(self, format, *args):
+        pass  # Keep load-test output readable
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self):
+        status = self.config.error_status
+        self._send_json({'error': {'message': 'Injected failure', 'type': 'server_error', 'code': None}},
+                        status=status, headers={'Retry-After': '1'} if status == 429 else None)
+
+    def do_GET(self):
+        if self.path.startswith('/jobs/'):
+            body = JOB_PAGE.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.rstrip('/') == '/v1/models':
+            self._send_json({'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model'}]})
+        elif self.path == '/stats':
+            self._send_json(self.config.get_stats())
+        else:
+            self._send_json({'error': {'message': 'Not found'}}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        endpoint = self.path.split('?')[0].rstrip('/')
+
+        if endpoint == '/v1/embeddings':
+            failed = self.config.should_fail()
+            self.config.record('embeddings', error=failed)
+            if failed:
+                return self._send_error()
+            inputs = payload['input'] if isinstance(payload['input'], list) else [payload['input']]
+            dimensions = payload.get('dimensions', 1536)
+            self._send_json({
+                'object': 'list',
+                'model': payload.get('model'),
+                'data': [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(text, dimensions)}
+                         for i, text in enumerate(inputs)],
+                'usage': {'prompt_tokens': sum(len(t) // 4 for t in inputs), 'total_tokens': sum(len(t) // 4 for t in inputs)}
+            })
+        elif endpoint == '/v1/chat/completions':
+            self._chat_completion(payload)
+        else:
+            self._send_json({'error': {'message': 'Not found'}}, status=404)
+
+    def _chat_completion(self, payload):
+        stream = payload.get('stream', False)
+        failed = self.config.should_fail()
+        self.config.record('chat_stream' if stream else 'chat', error=failed)
+        time.sleep(self.config.first_token_delay())
+        if failed:
+            return self._send_error()
+
+        messages = payload.get('messages', [])
+        prompt_tokens = sum(len(str(m.get('content') or '')) for m in messages) // 4
+        user_text = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = payload.get('model', 'gpt-4o-mini')
+
+        function_name, function_args = (None, None)
+        if payload.get('functions'):
+            function_name, function_args = choose_function(payload['functions'], user_text)
+
+        limit = min(self.config.max_tokens, payload.get('max_tokens') or self.config.max_tokens)
+        words = re.findall(r'\S+\s*', ANSWER)[:limit]
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(words),
+                 'total_tokens': prompt_tokens + len(words),
+                 'prompt_tokens_details': {'cached_tokens': 0}}
+
+        if not stream:
+            if function_name:
+                message = {'role': 'assistant', 'content': None,
+                           'function_call': {'name': function_name, 'arguments': json.dumps(function_args)}}
+                usage['completion_tokens'] = 10
+            else:
+                message = {'role': 'assistant', 'content': ''.join(words)}
+                # Non-streaming callers still wait for the whole completion
+                time.sleep(len(words) / self.config.tokens_per_second)
+            return self._send_json({
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': 'function_call' if function_name else 'stop'}],
+                'usage': usage
+            })
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def event(choices, chunk_usage=None):
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                     'model': model, 'choices': choices}
+            if chunk_usage is not None:
+                chunk['usage'] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            event([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+            for word in words:
+                event([{'index': 0, 'delta': {'content': word}, 'finish_reason': None}])
+                time.sleep(1 / self.config.tokens_per_second)
+            event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                event([], usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away mid-stream
+
+
+def make_server(host='127.0.0.1', port=8600, config=None):
+    """Create (but don't start) a fake OpenAI server."""
+    handler = type('ConfiguredFakeOpenAIHandler', (FakeOpenAIHandler,), {'config': config or FakeOpenAIConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host='127.0.0.1', port=0, config=None):
+    """Start a fake server on a background thread; returns (server, base_url)."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--latency-ms', type=float, default=400, help="Time to first token")
+    parser.add_argument('--jitter-ms', type=float, default=150)
+    parser.add_argument('--tokens-per-second', type=float, default=60)
+    parser.add_argument('--max-tokens', type=int, default=120)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls that fail")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status of injected failures (e.g. 429)")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(args.latency_ms, args.jitter_ms, args.tokens_per_second, args.max_tokens,
+                              args.error_rate, args.error_status)
+    server = make_server(args.host, args.port, config)
+    print(f"🧪 Fake OpenAI server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Offline end-to-end load test.
+
+Starts the fake OpenAI server (testing/fake_openai_server.py) and the Flask app on a SQLite
+file (or the configured local Postgres), then replays a mix of realistic conversations from
+concurrent virtual users against /api/chat, /api/chat-stream and /api/upload/pdf. Reports
+throughput, p50/p95/p99 latency per endpoint, time to first token for streams and database
+statements per request. No API key or internet access is needed.
+
+Usage:
+    python testing/load_test.py [--users 20] [--duration 60] [--latency-ms 400] [--error-rate 0.01]
+    python testing/load_test.py --database postgres       # app uses the configured Postgres
+    python testing/load_test.py --app-url http://127.0.0.1:5000 --openai-url http://127.0.0.1:8600
+                                                          # target servers started separately
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_openai_server import FakeOpenAIConfig, start_in_thread
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.pdf')
+ADMIN_KEY = os.getenv('ADMIN_KEY', 'your-secret-admin-key')
+
+GREETINGS = ["hi", "hello", "hey"]
+CAREER_QUESTIONS = [
+    "how long should my resume be?",
+    "should I include a summary section?",
+    "how do I explain a two year gap in my resume?",
+    "what skills should a data analyst list?",
+    "can you rewrite my experience bullets to sound more impactful?",
+    "is it ok to leave my GPA off my resume?",
+]
+PERSONAL_INFO = ["my name is Dana Smith", "i have 5 years of experience in analytics", "i work as a data analyst"]
+
+
+class Recorder:
+    """Thread-safe list of request samples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def add(self, **sample):
+        with self.lock:
+            self.samples.append(sample)
+
+
+class VirtualUser:
+    """One simulated browser tab: its own session ID and HTTP connection pool."""
+
+    def __init__(self, app_url, openai_url, recorder, rng):
+        self.app_url = app_url
+        self.openai_url = openai_url
+        self.recorder = recorder
+        self.rng = rng
+        self.http = requests.Session()
+        self.new_session()
+
+    def new_session(self):
+        # Sending an explicit session ID keeps virtual users from sharing one fingerprint rate limit
+        self.session_id = str(uuid.uuid4())
+
+    def _record(self, endpoint, scenario, started, response=None, ttft=None, error=None):
+        self.recorder.add(endpoint=endpoint, scenario=scenario, latency=time.perf_counter() - started,
+                          ttft=ttft, status=response.status_code if response is not None else None,
+                          error=error or (response is not None and response.status_code >= 400))
+
+    def chat(self, scenario, message):
+        started = time.perf_counter()
+        try:
+            response = self.http.post(f"{self.app_url}/api/chat",
+                                      json={'message': message, 'session_id': self.session_id}, timeout=120)
+            self._record('/api/chat', scenario, started, response)
+        except requests.RequestException as e:
+            self._record('/api/chat', scenario, started, error=str(e))
+
+    def chat_stream(self, scenario, message):
+        started = time.perf_counter()
+        ttft = None
+        try:
+            with self.http.post(f"{self.app_url}/api/chat-stream", stream=True, timeout=120,
+                                json={'message': message, 'session_id': self.session_id}) as response:
+                for chunk in response.iter_content(chunk_size=None):
+                    if chunk and ttft is None:
+                        ttft = time.perf_counter() - started
+            self._record('/api/chat-stream', scenario, started, response, ttft=ttft)
+        except requests.RequestException as e:
+            self._record('/api/chat-stream', scenario, started, ttft=ttft, error=str(e))
+
+    def upload_pdf(self, scenario, message):
+        started = time.perf_counter()
+        try:
+            with open(PDF_PATH, 'rb') as f:
+                response = self.http.post(f"{self.app_url}/api/upload/pdf", timeout=120,
+                                          data={'session_id': self.session_id, 'message': message},
+                                          files={'file': ('resume.pdf', f, 'application/pdf')})
+            self._record('/api/upload/pdf', scenario, started, response)
+        except requests.RequestException as e:
+            self._record('/api/upload/pdf', scenario, started, error=str(e))
+
+    def think(self, scale):
+        """Pause like a user reading the answer."""
+        if scale:
+            time.sleep(self.rng.uniform(0.5, 1.5) * scale)
+
+
+# Scenarios: each starts a fresh session and runs a short conversation
+def greeting(user, think):
+    user.chat('greeting', user.rng.choice(GREETINGS))
+
+
+def career_question(user, think):
+    user.chat_stream('career_question', user.rng.choice(GREETINGS))
+    user.think(think)
+    user.chat_stream('career_question', user.rng.choice(CAREER_QUESTIONS))
+
+
+def job_url(user, think):
+    user.chat('job_url', f"can you tailor my resume to this job? {user.openai_url}/jobs/{user.rng.randint(1, 500)}")
+
+
+def pdf_upload(user, think):
+    user.upload_pdf('pdf_upload', "here is my resume, what would you improve?")
+    user.think(think)
+    user.chat_stream('pdf_upload', "rewrite my summary section based on my resume")
+
+
+def long_session(user, think):
+    for message in PERSONAL_INFO:
+        user.chat('long_session', message)
+        user.think(think)
+    for _ in range(user.rng.randint(6, 12)):
+        user.chat_stream('long_session', user.rng.choice(CAREER_QUESTIONS))
+        user.think(think)
+
+
+SCENARIOS = {
+    'greeting': greeting,
+    'career_question': career_question,
+    'job_url': job_url,
+    'pdf_upload': pdf_upload,
+    'long_session': long_session,
+}
+DEFAULT_MIX = 'greeting=2,career_question=4,job_url=1,pdf_upload=1,long_session=2'
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def run_user(index, args, app_url, openai_url, recorder, weights, deadline):
+    rng = random.Random(args.seed + index)
+    user = VirtualUser(app_url, openai_url, recorder, rng)
+    while time.monotonic() < deadline:
+        scenario = rng.choices(list(weights), weights=list(weights.values()))[0]
+        user.new_session()
+        SCENARIOS[scenario](user, args.think_time)
+
+
+# App process
+def start_app(args, openai_url, workdir):
+    """Run the Flask app in a subprocess pointed at the fake OpenAI server."""
+    env = dict(os.environ, OPENAI_BASE_URL=f"{openai_url}/v1", OPENAI_API_KEY='load-test', ADMIN_KEY=ADMIN_KEY,
+               DOCUMENT_STORE_DIR=os.path.join(workdir, 'document_store'),
+               SESSION_ARCHIVE_DIR=os.path.join(workdir, 'session_archive'))
+    if args.database == 'sqlite':
+        env.update(DB_ENGINE_PROFILE='test', TEST_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load_test.db')}")
+    else:
+        env.setdefault('DB_ENGINE_PROFILE', 'web')
+
+    code = f"from app import app; app.run(host='127.0.0.1', port={args.app_port}, threaded=True)"
+    log = open(os.path.join(workdir, 'app.log'), 'w')
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    for _ in range(120):
+        if process.poll() is not None:
+            raise SystemExit(f"App exited during startup, see {log.name}")
+        try:
+            if requests.get(f"{app_url}/api/health", timeout=1).ok:
+                return process, app_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"App did not become healthy, see {log.name}")
+
+
+def db_stats(app_url):
+    try:
+        return requests.get(f"{app_url}/api/admin/db-pool", headers={'X-Admin-Key': ADMIN_KEY}, timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return {}
+
+
+# Reporting
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * fraction)) - 1)] if values else None
+
+
+def summarize(samples, elapsed, db_before, db_after, fake_stats):
+    def stats(group):
+        latencies = [s['latency'] for s in group]
+        ttfts = [s['ttft'] for s in group if s['ttft'] is not None]
+        ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            'requests': len(group),
+            'errors': sum(1 for s in group if s['error']),
+            'throughput_rps': round(len(group) / elapsed, 2),
+            'p50_ms': ms(percentile(latencies, 0.50)),
+            'p95_ms': ms(percentile(latencies, 0.95)),
+            'p99_ms': ms(percentile(latencies, 0.99)),
+            'ttft_p50_ms': ms(percentile(ttfts, 0.50)),
+            'ttft_p95_ms': ms(percentile(ttfts, 0.95)),
+            'ttft_p99_ms': ms(percentile(ttfts, 0.99)),
+        }
+
+    endpoints = sorted({s['endpoint'] for s in samples})
+    report = {
+        'duration_seconds': round(elapsed, 1),
+        'total': stats(samples),
+        'endpoints': {endpoint: stats([s for s in samples if s['endpoint'] == endpoint]) for endpoint in endpoints},
+        'status_codes': {},
+        'fake_openai': fake_stats,
+    }
+    for s in samples:
+        key = str(s['status'] or 'exception')
+        report['status_codes'][key] = report['status_codes'].get(key, 0) + 1
+    if db_before and db_after and samples:
+        delta = lambda key: db_after.get(key, 0) - db_before.get(key, 0)
+        report['database'] = {
+            'statements_per_request': round(delta('statements') / len(samples), 2),
+            'sessions_per_request': round(delta('sessions_opened') / len(samples), 2),
+            'checkouts_per_request': round(delta('checkouts') / len(samples), 2),
+            'commits_per_request': round(delta('commits') / len(samples), 2),
+            'peak_checked_out': db_after.get('peak_checked_out'),
+            'p95_pool_wait_ms': db_after.get('p95_wait_ms'),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 Load test results ({report['duration_seconds']}s)")
+    header = f"{'endpoint':<18}{'reqs':>7}{'errors':>8}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft p50':>10}{'ttft p95':>10}{'ttft p99':>10}"
+    print(header)
+    print('-' * len(header))
+    rows = list(report['endpoints'].items()) + [('total', report['total'])]
+    for name, s in rows:
+        fmt = lambda value: f"{value:.0f}" if value is not None else '-'
+        print(f"{name:<18}{s['requests']:>7}{s['errors']:>8}{s['throughput_rps']:>8.2f}{fmt(s['p50_ms']):>9}"
+              f"{fmt(s['p95_ms']):>9}{fmt(s['p99_ms']):>9}{fmt(s['ttft_p50_ms']):>10}{fmt(s['ttft_p95_ms']):>10}"
+              f"{fmt(s['ttft_p99_ms']):>10}")
+    print("(latencies in ms)")
+    print(f"Status codes: {report['status_codes']}")
+    if 'database' in report:
+        db = report['database']
+        print(f"Database: {db['statements_per_request']} statements, {db['sessions_per_request']} sessions, "
+              f"{db['checkouts_per_request']} checkouts, {db['commits_per_request']} commits per request; "
+              f"peak {db['peak_checked_out']} connections checked out")
+    if report['fake_openai']:
+        print(f"Fake OpenAI: {report['fake_openai']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds to generate traffic")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument('--think-time', type=float, default=0.5, help="Average pause between turns (seconds)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', choices=['sqlite', 'postgres'], default='sqlite')
+    parser.add_argument('--app-port', type=int, default=5055)
+    parser.add_argument('--app-url', help="Use an already running app instead of starting one")
+    parser.add_argument('--openai-url', help="Use an already running fake OpenAI server (without /v1)")
+    parser.add_argument('--latency-ms', type=float, default=400, help="Fake OpenAI time to first token")
+    parser.add_argument('--tokens-per-second', type=float, default=60)
+    parser.add_argument('--max-tokens', type=int, default=120)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+    weights = parse_mix(args.mix)
+
+    fake_server = None
+    openai_url = args.openai_url
+    if not openai_url:
+        config = FakeOpenAIConfig(args.latency_ms, tokens_per_second=args.tokens_per_second,
+                                  max_tokens=args.max_tokens, error_rate=args.error_rate,
+                                  error_status=args.error_status, seed=args.seed)
+        fake_server, openai_url = start_in_thread(config=config)
+        print(f"🧪 Fake OpenAI server on {openai_url}/v1")
+
+    workdir = tempfile.mkdtemp(prefix='resumeai-load-')
+    app_process = None
+    app_url = args.app_url
+    if not app_url:
+        app_process, app_url = start_app(args, openai_url, workdir)
+        print(f"🚀 App running on {app_url} ({args.database}, logs in {workdir}/app.log)")
+
+    try:
+        recorder = Recorder()
+        db_before = db_stats(app_url)
+        print(f"🏃 {args.users} users for {args.duration:.0f}s, mix {weights}")
+        started = time.monotonic()
+        deadline = started + args.duration
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            futures = [executor.submit(run_user, i, args, app_url, openai_url, recorder, weights, deadline)
+                       for i in range(args.users)]
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - started
+        report = summarize(recorder.samples, elapsed, db_before, db_stats(app_url),
+                           fake_server.RequestHandlerClass.config.get_stats() if fake_server else {})
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        if app_process:
+            app_process.terminate()
+            app_process.wait(timeout=10)
+        if fake_server:
+            fake_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import AsyncDatabaseService, dispose_async_engine
+from rate_limit import AsyncDatabaseRateLimiter
+
+
+def run(coroutine):
+    async def with_engine():
+        try:
+            return await coroutine
+        finally:
+            await dispose_async_engine()
+    return asyncio.run(with_engine())
+
+
+def test_messages_profiles_and_rate_limits():
+    async def scenario():
+        service = AsyncDatabaseService()
+        await service.init()
+        limiter = AsyncDatabaseRateLimiter(message_limit=2, reset_period_hours=3)
+
+        session_id = await service.create_chat_session()
+        await service.save_message(session_id, 'user', 'hello')
+        saved = await service.save_message(session_id, 'assistant', 'Hi! How can I help?')
+        messages = await service.get_session_messages(session_id)
+
+        profile = await service.update_user_profile(1, 'current_role', 'data analyst')
+        loaded = await service.get_user_profile(1)
+
+        await limiter.increment_count(session_id)
+        await limiter.increment_count(session_id)
+        limited = await limiter.check_limit(session_id)
+        await limiter.reset_session(session_id)
+        reset = await limiter.get_session_stats(session_id)
+        return saved, messages, profile, loaded, limited, reset
+
+    saved, messages, profile, loaded, limited, reset = run(scenario())
+
+    assert saved['created_at'] is not None
+    assert [m['content'] for m in messages] == ['hello', 'Hi! How can I help?']
+    assert profile['current_role'] == loaded['current_role'] == 'data analyst'
+    assert limited['allowed'] is False and limited['current_count'] == 2
+    assert reset['allowed'] is True and reset['current_count'] == 0
@@ -0,0 +1,63 @@
+import os
+import sys
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from chat_history import ChatHistory
+from memory_manager import MemoryManager
+from utils import estimate_tokens
+
+
+def _render(turns):
+    # What ConversationBufferWindowMemory(k).buffer renders for the same turns
+    return "\n".join(f"Human: {human}\nAI: {ai}" for human, ai in turns)
+
+
+def test_buffer_matches_window_memory_format_across_evictions():
+    history = ChatHistory(3)
+    turns = [(f"question {i}", f"answer {i}\nwith a second line") for i in range(7)]
+    for i, (human, ai) in enumerate(turns, 1):
+        history.add(human, ai)
+        window = turns[max(0, i - 3):i]
+        assert history.buffer == _render(window)
+        assert history.pairs() == [list(turn) for turn in window]
+    assert len(history) == 3
+    assert history.total_messages == 14
+
+
+def test_token_total_follows_the_window():
+    history = ChatHistory(2)
+    turns = [("short", "reply"), ("a much longer question " * 5, "ok"), ("third", "a longer answer " * 10)]
+    for human, ai in turns:
+        history.add(human, ai)
+    expected = sum(estimate_tokens(h) + estimate_tokens(a) for h, a in turns[1:])
+    assert history.tokens == expected == sum(history.turn_tokens())
+
+
+def test_zero_and_single_turn_windows():
+    empty = ChatHistory(0)
+    empty.add("hi", "hello")
+    assert empty.buffer == '' and len(empty) == 0 and empty.total_messages == 2
+
+    single = ChatHistory(1)
+    single.add("first", "one")
+    single.add("second", "two")
+    assert single.buffer == "Human: second\nAI: two"
+    single.clear()
+    assert single.buffer == '' and single.tokens == 0 and single.total_messages == 0
+
+
+def test_memory_manager_keeps_its_api():
+    manager = MemoryManager(k=2)
+    for i in range(3):
+        manager.add_message(f"q{i}", f"a{i}")
+    assert manager.get_chat_history() == "Human: q1\nAI: a1\nHuman: q2\nAI: a2"
+    assert manager.get_memory_variables() == {'history': manager.get_chat_history()}
+    exported = manager.export_session_data()
+    assert exported['chat_history'] == manager.get_chat_history()
+    assert exported['message_count'] == 6
+    manager.clear_chat_history_only()
+    assert manager.get_chat_history() == ''
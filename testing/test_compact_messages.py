@@ -0,0 +1,88 @@
+import os
+import sys
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import DatabaseService, ChatMessage, CompactChatMessage
+from database.partitions import ensure_monthly_partitions, partition_name
+from datetime import date
+from types import SimpleNamespace
+
+
+def compact_service():
+    service = DatabaseService()
+    service.message_model = CompactChatMessage
+    return service
+
+
+def test_long_contents_are_compressed_and_round_trip():
+    long_answer = "**Summary**: data analyst with SQL and Python experience. " * 100
+    message = CompactChatMessage.create('s1', 'assistant', long_answer)
+    assert message.content is None and len(message.content_compressed) < len(long_answer) // 5
+    assert message.text == long_answer
+
+    short = CompactChatMessage.create('s1', 'user', 'hello', extra_data={})
+    assert short.content == 'hello' and short.content_compressed is None and short.extra_data is None
+
+
+def test_compact_messages_match_standard_shape_and_order():
+    standard, compact = DatabaseService(), compact_service()
+    standard_id, compact_id = standard.create_chat_session(), standard.create_chat_session()
+    long_answer = "Tailored resume bullet. " * 100
+
+    for service, session_id in ((standard, standard_id), (compact, compact_id)):
+        service.save_message(session_id, 'user', 'rewrite my summary', intent='answer_career_question')
+        service.save_message(session_id, 'assistant', long_answer)
+
+    expected = standard.get_session_messages(standard_id)
+    actual = compact.get_session_messages(compact_id)
+    drop = ('id', 'created_at', 'session_id')
+    assert [{k: v for k, v in m.items() if k not in drop} for m in actual] == \
+           [{k: v for k, v in m.items() if k not in drop} for m in expected]
+    assert [m['message_type'] for m in actual] == ['user', 'assistant']
+
+    assert compact.clear_session_messages(compact_id)
+    assert compact.get_session_messages(compact_id) == []
+    assert len(standard.get_session_messages(standard_id)) == 2
+
+
+def test_compact_mode_reads_legacy_rows_until_they_are_migrated():
+    standard, compact = DatabaseService(), compact_service()
+    session_id = standard.create_chat_session()
+    standard.save_message(session_id, 'user', 'stored before compact mode')
+    standard.save_message(session_id, 'assistant', 'legacy answer')
+    compact.save_message(session_id, 'user', 'stored after')
+
+    assert [m['content'] for m in compact.get_session_messages(session_id)] == [
+        'stored before compact mode', 'legacy answer', 'stored after'
+    ]
+    assert [m['content'] for m in compact.get_session_messages(session_id, limit=2)] == [
+        'stored before compact mode', 'legacy answer'
+    ]
+
+    # Clearing the history removes the legacy rows as well
+    assert compact.clear_session_messages(session_id)
+    assert compact.get_session_messages(session_id) == [] and standard.get_session_messages(session_id) == []
+
+
+def test_monthly_partition_names_span_the_range():
+    executed = []
+
+    class Recorder:
+        def execute(self, statement, params=None):
+            executed.append(str(statement))
+            # to_regclass() finds no existing partition
+            return SimpleNamespace(scalar=lambda: None)
+
+    names = ensure_monthly_partitions(Recorder(), CompactChatMessage.__table__, months_ahead=0,
+                                      start=date(2025, 11, 20))
+    assert names[:3] == ['chat_messages_compact_y2025m11', 'chat_messages_compact_y2025m12',
+                         'chat_messages_compact_y2026m01']
+    december = [statement for statement in executed if 'chat_messages_compact_y2025m12' in statement]
+    # Rows that landed in the default partition move into the new month before it is attached
+    assert "DELETE FROM chat_messages_compact_default WHERE created_at >= '2025-12-01'" in december[1]
+    assert "ATTACH PARTITION chat_messages_compact_y2025m12 FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')" in december[2]
+    assert partition_name(ChatMessage.__table__, date(2026, 3, 1)) == 'chat_messages_y2026m03'
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import DatabaseService, unit_of_work
+from database.pool_metrics import pool_metrics
+
+
+def queries(action):
+    pool_metrics.reset()
+    result = action()
+    return result, pool_metrics.get_stats()['sessions_opened']
+
+
+def test_lookups_are_cached_and_invalidated_on_update():
+    service = DatabaseService()
+    user = service.create_user('Dana Smith', 'dana.cache@example.com', 'secret')['user']
+
+    _, opened = queries(lambda: [service.get_user_by_id(user['id']) for _ in range(3)])
+    assert opened == 1
+
+    service.update_user_profile(user['id'], 'current_role', 'data analyst')
+    profile, opened = queries(lambda: [service.get_user_profile(user['id']) for _ in range(2)][-1])
+    assert profile['current_role'] == 'data analyst' and opened == 1
+
+    service.update_user_profile(user['id'], 'current_role', 'data scientist')
+    assert service.get_user_profile(user['id'])['current_role'] == 'data scientist'
+
+    service.assign_session_to_user(user['id'], 'session-dana')
+    assert service.get_user_by_id(user['id'])['session_id'] == 'session-dana'
+    assert service.get_user_by_session_id('session-dana')['id'] == user['id']
+
+    stats = service.get_cache_stats()
+    assert stats['user']['hits'] >= 2 and stats['profile']['hits'] >= 1
+
+
+def test_missing_sessions_are_negatively_cached_until_created():
+    service = DatabaseService()
+
+    missing, opened = queries(lambda: [service.get_chat_session('new-session') for _ in range(3)][-1])
+    assert missing is None and opened == 1
+
+    service.create_chat_session(session_id='new-session')
+    assert service.get_chat_session('new-session')['session_id'] == 'new-session'
+
+    # Creating a session that already exists (another worker won the race) is not an error
+    assert service.create_chat_session(session_id='new-session') == 'new-session'
+
+
+def test_cached_values_are_copies():
+    service = DatabaseService()
+    session_id = service.create_chat_session()
+    service.get_chat_session(session_id)['title'] = 'changed'
+    assert service.get_chat_session(session_id)['title'] is None
+
+
+def test_updates_inside_a_unit_of_work_are_invalidated_after_the_commit():
+    service = DatabaseService()
+    user_id = service.create_user('Sam Lee', 'sam.cache@example.com', 'secret')['user']['id']
+    service.update_user_profile(user_id, 'current_role', 'data analyst')
+    committed = service.get_user_profile(user_id)
+
+    with unit_of_work():
+        service.update_user_profile(user_id, 'current_role', 'data scientist')
+        # The unit reads its own change without caching it for other requests
+        assert service.get_user_profile(user_id)['current_role'] == 'data scientist'
+        assert service.caches['profile'].get(user_id) is None
+        # Another request caches the committed row before this unit commits
+        service.caches['profile'].set(user_id, committed)
+    assert service.get_user_profile(user_id)['current_role'] == 'data scientist'
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            service.update_user_profile(user_id, 'current_role', 'intern')
+            raise RuntimeError("handler failed")
+    assert service.get_user_profile(user_id)['current_role'] == 'data scientist'
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from document_store import DocumentStore, chunk_text
+from embeddings import HashingEmbedder
+from gpt_service import GPTService
+
+RESUME = """Dana Smith
+Data Analyst
+
+EXPERIENCE
+Acme Corp - Senior Data Analyst (2019-2024)
+Built SQL dashboards in Tableau for the sales team and automated weekly reporting with Python.
+
+EDUCATION
+BSc Statistics, State University, 2018
+
+SKILLS
+SQL, Python, pandas, Tableau, A/B testing, stakeholder communication
+
+VOLUNTEERING
+Taught beginner Python workshops at the public library every Saturday.
+"""
+
+
+def make_store(tmp_path):
+    return DocumentStore(HashingEmbedder(), root_dir=str(tmp_path), chunk_size=120, overlap=20, top_k=2)
+
+
+def test_chunks_cover_the_whole_document():
+    chunks = chunk_text(RESUME, chunk_size=120, overlap=20)
+    assert len(chunks) > 3
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert "BSc Statistics" in ''.join(chunks)
+
+
+def test_search_returns_relevant_chunks_and_persists(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document('session-abc', RESUME, 'resume', 'dana.pdf')
+
+    # A fresh store reads the index back from disk
+    reloaded = make_store(tmp_path)
+    results = reloaded.search('session-abc', 'what degree in statistics do I have?')
+    assert results and 'BSc Statistics' in results[0]['text']
+    assert len(results) <= 2
+    assert reloaded.search('session-other', 'statistics degree') == []
+
+    reloaded.delete_owner('session-abc')
+    assert not reloaded.has_documents('session-abc')
+
+
+def test_workers_sharing_a_directory_keep_each_others_documents(tmp_path):
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    assert not first.has_documents('session-abc')  # Caches the empty state
+    second.add_document('session-abc', RESUME, 'resume', 'dana.pdf')
+    # The first store notices the new file instead of trusting its cache
+    assert first.has_documents('session-abc')
+
+    # Concurrent writers from different stores don't lose each other's documents
+    threads = [threading.Thread(target=store.add_document,
+                                args=('session-abc', f"Cover letter {n}: I love SQL.", 'cover_letter', f"{n}.txt"))
+               for n, store in enumerate([first, second] * 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    filenames = {chunk['filename'] for chunk in make_store(tmp_path)._load('session-abc').chunks}
+    assert filenames == {'dana.pdf'} | {f"{n}.txt" for n in range(10)}
+
+    first.delete_owner('session-abc')
+    assert not second.has_documents('session-abc')
+
+
+def test_full_index_is_saved_as_one_file(tmp_path):
+    store = DocumentStore(HashingEmbedder(), root_dir=str(tmp_path), chunk_size=120, overlap=20,
+                          max_chunks_per_owner=4)
+    store.add_document('session-abc', RESUME, 'resume', 'dana.pdf')
+    reader = make_store(tmp_path)
+    before = reader._load('session-abc')
+
+    # At capacity the shapes no longer change, so vectors and chunks must be swapped in together
+    store.add_document('session-abc', "Cover letter: I love SQL dashboards.", 'cover_letter', 'letter.txt')
+    assert sorted(os.listdir(tmp_path / 'session-abc')) == ['.lock', 'index.npz']
+    after = reader._load('session-abc')
+    assert after is not before and len(after.chunks) == 4
+    assert after.chunks[-1]['filename'] == 'letter.txt'
+    expected = HashingEmbedder().embed_many([c['text'] for c in after.chunks]).astype('float16')
+    assert (after.vectors == expected).all()
+
+
+def test_prompt_contains_only_retrieved_excerpts(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document('session-abc', RESUME, 'resume', 'dana.pdf')
+    service = GPTService(client=None, document_store=store)
+    memory = SimpleNamespace(session_id='abc', user_id=None)
+
+    context = service.retrieve_document_context(memory, 'which tableau dashboards did I build?')
+    messages = service._create_messages('which tableau dashboards did I build?', is_website=False,
+                                        document_context=context)
+
+    prompt = '\n'.join(m['content'] for m in messages)
+    assert 'Tableau' in prompt
+    assert 'public library' not in prompt
+    assert messages[-1] == {'role': 'user', 'content': 'which tableau dashboards did I build?'}
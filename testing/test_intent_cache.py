@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ttl_cache import TTLCache
+from user_intent import IntentClassifier
+
+
+def classification(name, args):
+    function_call = SimpleNamespace(name=name, arguments=json.dumps(args))
+    usage = SimpleNamespace(prompt_tokens=300, completion_tokens=10, prompt_tokens_details=None)
+    return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(function_call=function_call))])
+
+
+class CountingClient:
+    """Answers every classification with the same function call and counts the calls."""
+
+    def __init__(self, name='handle_greeting', args=None):
+        self.response = classification(name, args or {'greeting': 'hello'})
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def classifier(client, **cache_args):
+    return IntentClassifier(client, cache=TTLCache(**cache_args))
+
+
+def test_inputs_are_normalized_before_lookup():
+    client = CountingClient()
+    intents = classifier(client)
+    first = intents.classify_intent('Hello!')
+    assert intents.classify_intent('  hello  ') == first
+    assert intents.classify_intent('HELLO.') == first
+    assert client.calls == 1
+
+    # Callers get copies, so changing a result doesn't change the cache
+    first['args']['greeting'] = 'changed'
+    assert intents.classify_intent('hello')['args'] == {'greeting': 'hello'}
+
+
+def test_key_depends_on_which_user_details_are_known_not_their_values():
+    intents = classifier(CountingClient())
+    dana = intents._cache_key('hello', {'name': 'Dana', 'skills': ''})
+    assert dana == intents._cache_key('hello', {'name': 'Sam'})
+    assert dana != intents._cache_key('hello', {})
+    assert dana != intents._cache_key('hello', {'name': 'Dana', 'skills': 'SQL'})
+    assert 'Dana' not in dana
+
+
+def test_personal_data_and_long_inputs_are_not_cached():
+    intents = classifier(CountingClient())
+    for text in ['my name is Dana', "I'm a data analyst", 'reach me at dana@example.com',
+                 'call 555-123-4567', 'x' * 201]:
+        assert intents._cache_key(text) is None
+
+
+def test_store_personal_info_results_are_not_cached():
+    client = CountingClient('store_personal_info', {'info_type': 'skills', 'info_value': 'SQL'})
+    intents = classifier(client)
+    intents.classify_intent('skills: SQL')
+    intents.classify_intent('skills: SQL')
+    assert client.calls == 2 and len(intents.cache) == 0
+
+
+def test_cache_is_bounded():
+    client = CountingClient()
+    intents = classifier(client, max_size=2)
+    for text in ('hello', 'hi', 'hey'):
+        intents.classify_intent(text)
+    intents.classify_intent('hello')  # Evicted as least recently used
+    assert client.calls == 4
+    stats = intents.get_cache_stats()
+    assert stats['size'] == 2 and stats['evictions'] == 2 and stats['classification_calls_saved'] == 0
@@ -0,0 +1,153 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import get_db_session
+from database.connection import init_database
+from database.models import BackgroundJob
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    init_database()
+    with get_db_session() as session:
+        session.query(BackgroundJob).delete()
+    queue = JobQueue(max_attempts=3, retry_backoff_seconds=10)
+    # Jobs are claimed and executed by the test, not by the dispatcher thread
+    monkeypatch.setattr(queue, 'start', lambda: None)
+    return queue
+
+
+def make_due(job_id):
+    with get_db_session() as session:
+        session.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).update(
+            {'run_after': datetime.now(timezone.utc) - timedelta(seconds=1)}
+        )
+
+
+def run_after(job_id):
+    with get_db_session() as session:
+        value = session.query(BackgroundJob.run_after).filter(BackgroundJob.job_id == job_id).scalar()
+    return value.replace(tzinfo=value.tzinfo or timezone.utc)
+
+
+def test_claims_by_priority_and_only_once(queue):
+    queue.register('echo')(lambda payload: payload)
+    low = queue.enqueue('echo', {'n': 1})
+    high = queue.enqueue('echo', {'n': 2}, priority=5)
+
+    first = queue._claim_jobs(1)
+    assert [job['job_id'] for job in first] == [high]
+    assert first[0]['attempts'] == 1 and queue.get_job(high)['status'] == 'running'
+    assert [job['job_id'] for job in queue._claim_jobs(5)] == [low]
+    assert queue._claim_jobs(5) == []
+
+    queue._execute(first[0])
+    job = queue.get_job(high)
+    assert job['status'] == 'succeeded' and job['result'] == {'n': 2}
+
+
+def test_unknown_job_types_are_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue('missing')
+
+
+def test_failures_back_off_then_fail_after_max_attempts(queue):
+    def fail(payload):
+        raise RuntimeError('upstream timeout')
+    queue.register('flaky')(fail)
+    job_id = queue.enqueue('flaky')
+
+    delays = []
+    for attempt in (1, 2):
+        job = queue._claim_jobs(1)[0]
+        assert job['attempts'] == attempt
+        before = datetime.now(timezone.utc)
+        queue._execute(job)
+        record = queue.get_job(job_id)
+        assert record['status'] == 'queued' and 'upstream timeout' in record['error']
+        delays.append((run_after(job_id) - before).total_seconds())
+        assert queue._claim_jobs(1) == []  # Not due until the backoff has passed
+        make_due(job_id)
+    # Exponential backoff: 10s, then 20s
+    assert delays[0] == pytest.approx(10, abs=2) and delays[1] == pytest.approx(20, abs=2)
+
+    queue._execute(queue._claim_jobs(1)[0])
+    record = queue.get_job(job_id)
+    assert record['status'] == 'failed' and record['finished_at']
+    assert queue._claim_jobs(1) == [] and payload_of(job_id) is None
+
+
+def payload_of(job_id):
+    with get_db_session() as session:
+        return session.query(BackgroundJob.payload).filter(BackgroundJob.job_id == job_id).scalar()
+
+
+def make_silent(job_id):
+    """Age the job's heartbeat past the stale cutoff, as if its worker had died."""
+    with get_db_session() as session:
+        session.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).update(
+            {'heartbeat_at': datetime.now(timezone.utc) - timedelta(hours=1)}
+        )
+
+
+def test_stale_jobs_are_detected_by_heartbeat(queue):
+    queue.register('echo')(lambda payload: payload)
+    job_id = queue.enqueue('echo')
+    queue._claim_jobs(1)
+    with get_db_session() as session:
+        session.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).update(
+            {'started_at': datetime.now(timezone.utc) - timedelta(hours=1)}
+        )
+    # Long-running but its worker is alive and refreshing the heartbeat
+    queue._heartbeat()
+    queue._requeue_stale_jobs()
+    assert queue.get_job(job_id)['status'] == 'running'
+
+    make_silent(job_id)
+    queue._requeue_stale_jobs()
+    assert queue.get_job(job_id)['status'] == 'queued'
+    assert [job['job_id'] for job in queue._claim_jobs(1)] == [job_id]
+
+
+def test_jobs_that_keep_killing_their_worker_fail_after_max_attempts(queue):
+    queue.register('crash')(lambda payload: payload)
+    job_id = queue.enqueue('crash', {'file_data': 'x' * 100})
+    for attempt in range(3):
+        assert queue._claim_jobs(1)[0]['attempts'] == attempt + 1
+        make_silent(job_id)
+        queue._requeue_stale_jobs()
+    record = queue.get_job(job_id)
+    assert record['status'] == 'failed' and 'Worker stopped' in record['error']
+    assert queue._claim_jobs(1) == [] and payload_of(job_id) is None
+
+
+def test_payload_is_cleared_once_a_job_is_finished(queue):
+    queue.register('echo')(lambda payload: {'ok': True})
+    job_id = queue.enqueue('echo', {'file_data': 'x' * 100})
+    queue._execute(queue._claim_jobs(1)[0])
+    assert queue.get_job(job_id)['status'] == 'succeeded' and payload_of(job_id) is None
+
+
+def test_scheduled_jobs_are_enqueued_when_due_unless_one_is_pending(queue):
+    queue.register('maintain')(lambda payload: payload)
+    queue.schedule('maintain', 60, {'months': 3})
+    jobs = lambda: queue.get_stats()['jobs']['queued']
+
+    queue._enqueue_scheduled()
+    assert jobs() == 0  # Not due yet
+
+    queue.schedules['maintain']['next_run'] = 0
+    queue._enqueue_scheduled()
+    assert jobs() == 1
+    queue.schedules['maintain']['next_run'] = 0
+    queue._enqueue_scheduled()
+    assert jobs() == 1  # The first run is still queued
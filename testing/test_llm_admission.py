@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import llm_admission
+from llm_admission import AdmissionController, AdmissionRejected, INTERACTIVE, STANDARD, BATCH
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    controller = AdmissionController(max_concurrency=1, tokens_per_minute=0, max_queue_depth=10, max_wait_seconds=5)
+    held = controller.acquire()
+    order = []
+
+    def call(name, priority):
+        ticket = controller.acquire(priority)
+        order.append(name)
+        controller.release(ticket)
+
+    threads = []
+    for name, priority in [('batch', BATCH), ('standard-1', STANDARD), ('interactive', INTERACTIVE), ('standard-2', STANDARD)]:
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: len(controller.waiters) == len(threads))
+
+    controller.release(held)
+    for thread in threads:
+        thread.join()
+    assert order == ['interactive', 'standard-1', 'standard-2', 'batch']
+
+
+def test_full_queue_and_timeouts_are_rejected_with_retry_after():
+    controller = AdmissionController(max_concurrency=1, tokens_per_minute=0, max_queue_depth=1, max_wait_seconds=0.2)
+    held = controller.acquire()
+
+    # The only queue position times out
+    with pytest.raises(AdmissionRejected) as timed_out:
+        controller.acquire()
+    assert timed_out.value.retry_after >= 1
+
+    waiter = threading.Thread(target=lambda: pytest.raises(AdmissionRejected, controller.acquire))
+    waiter.start()
+    wait_for(lambda: len(controller.waiters) == 1)
+    with pytest.raises(AdmissionRejected, match='queue is full') as full:
+        controller.check_capacity()
+    assert full.value.retry_after >= 1
+    waiter.join()
+
+    controller.release(held)
+    assert controller.get_stats()['rejected'] == 3 and controller.get_stats()['in_flight'] == 0
+
+
+def test_actual_usage_replaces_the_estimate_and_expires_with_it(monkeypatch):
+    now = [1000.0]
+
+    def clock():
+        now[0] += 0.001  # Ticks on every read so wait deadlines pass
+        return now[0]
+    monkeypatch.setattr(llm_admission.time, 'monotonic', clock)
+    controller = AdmissionController(tokens_per_minute=1000, max_wait_seconds=0.01)
+
+    first = controller.acquire(estimated_tokens=1000)
+    # The window is full until the estimate is corrected
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire(estimated_tokens=500)
+    assert rejected.value.retry_after == 60
+
+    now[0] += 30
+    controller.release(first, actual_tokens=200)
+    assert controller.tokens_in_window == 200
+    second = controller.acquire(estimated_tokens=500)
+    assert controller.tokens_in_window == 700
+
+    # The first call leaves the window 60s after it was admitted, with its actual usage
+    now[0] += 31
+    assert controller.get_stats()['tokens_last_minute'] == 500
+    controller.release(second, actual_tokens=600)
+    assert controller.tokens_in_window == 600
+
+    # A correction after the estimate has expired doesn't touch the window
+    third = controller.acquire(estimated_tokens=100)
+    now[0] += 120
+    controller.release(third, actual_tokens=50)
+    assert controller.tokens_in_window == 0
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from llm_resilience import ResilientClient, ResiliencePolicy, DeadlineExceeded
+
+
+class FakeAPIError(Exception):
+    """Mimics openai.APIStatusError (status_code + response headers)."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeStream:
+    def __init__(self, chunks, first_chunk_delay=0.0):
+        self.chunks = chunks
+        self.first_chunk_delay = first_chunk_delay
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.first_chunk_delay)
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Fake OpenAI client returning (or raising) scripted outcomes in order."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs)
+            outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_client(outcomes, **policy_kwargs):
+    sleeps = []
+    policy_kwargs.setdefault('hedge', False)
+    client = ResilientClient(FakeClient(outcomes), ResiliencePolicy(**policy_kwargs), sleep=sleeps.append)
+    return client, sleeps
+
+
+def test_retries_rate_limit_then_succeeds():
+    client, sleeps = make_client([FakeAPIError(429), FakeAPIError(503), 'ok'], max_retries=2, base_delay=0.1)
+    assert client.chat.completions.create(model='m', messages=[]) == 'ok'
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= 0.2 for delay in sleeps)
+    assert client.get_stats()['retries'] == 2
+
+
+def test_honors_retry_after_header():
+    client, sleeps = make_client([FakeAPIError(429, {'retry-after': '3'}), 'ok'], base_delay=0.01)
+    assert client.chat.completions.create(model='m', messages=[]) == 'ok'
+    assert sleeps == [3.0]
+
+
+def test_does_not_retry_client_errors():
+    client, sleeps = make_client([FakeAPIError(400), 'never'])
+    with pytest.raises(FakeAPIError):
+        client.chat.completions.create(model='m', messages=[])
+    assert sleeps == []
+    assert len(client._client.calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    client, _ = make_client([FakeAPIError(500)] * 3, max_retries=2, base_delay=0)
+    with pytest.raises(FakeAPIError):
+        client.chat.completions.create(model='m', messages=[])
+    assert len(client._client.calls) == 3
+
+
+def test_backoff_past_deadline_raises():
+    client, sleeps = make_client([FakeAPIError(429, {'retry-after': '30'}), 'ok'], deadline_seconds=1)
+    with pytest.raises(DeadlineExceeded):
+        client.chat.completions.create(model='m', messages=[])
+    assert sleeps == []
+
+
+def test_passes_remaining_deadline_as_timeout():
+    client, _ = make_client(['ok'], deadline_seconds=5)
+    client.chat.completions.create(model='m', messages=[], deadline=2)
+    assert 0 < client._client.calls[0]['timeout'] <= 2
+    assert 'deadline' not in client._client.calls[0]
+
+
+def test_stream_retries_before_first_chunk():
+    class FailingStream(FakeStream):
+        def __iter__(self):
+            raise FakeAPIError(502)
+            yield
+
+    client, _ = make_client([FailingStream([]), FakeStream(['a', 'b'])], base_delay=0)
+    stream = client.chat.completions.create(model='m', messages=[], stream=True)
+    assert list(stream) == ['a', 'b']
+
+
+def test_hedge_wins_when_primary_is_slow():
+    slow = FakeStream(['slow'], first_chunk_delay=0.5)
+    fast = FakeStream(['fast'])
+    client, _ = make_client([slow, fast], hedge=True, hedge_after=0.05)
+    stream = client.chat.completions.create(model='m', messages=[], stream=True)
+    assert list(stream) == ['fast']
+    stats = client.get_stats()
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+
+    # The losing stream is closed once it finally answers
+    deadline = time.monotonic() + 2
+    while not slow.closed and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert slow.closed
+
+
+def test_no_hedge_when_primary_is_fast():
+    client, _ = make_client([FakeStream(['a']), FakeStream(['b'])], hedge=True, hedge_after=1)
+    assert list(client.chat.completions.create(model='m', messages=[], stream=True)) == ['a']
+    assert client.get_stats()['hedged'] == 0
+    assert len(client._client.calls) == 1
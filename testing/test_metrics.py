@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from metrics import MetricsRegistry, metrics as shared_metrics
+from model_router import ModelRouter
+
+
+def test_counters_histograms_and_collectors_render_in_prometheus_format():
+    registry = MetricsRegistry()
+    registry.counter('http_requests_total', 'HTTP requests.')
+    registry.histogram('http_request_duration_seconds', 'Latency.', buckets=(0.1, 1))
+    registry.inc('http_requests_total', method='POST', route='/api/chat', status=200)
+    registry.inc('http_requests_total', method='POST', route='/api/chat', status=200)
+    for seconds in (0.05, 0.5, 3):
+        registry.observe('http_request_duration_seconds', seconds, route='/api/chat')
+    registry.register_collector(lambda: [('session_memories', 'gauge', 'Cached sessions.', [({}, 7)])])
+
+    lines = registry.render().splitlines()
+    assert '# TYPE http_requests_total counter' in lines
+    assert 'http_requests_total{method="POST",route="/api/chat",status="200"} 2' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/chat",le="0.1"} 1' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/chat",le="1"} 2' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/chat",le="+Inf"} 3' in lines
+    assert 'http_request_duration_seconds_count{route="/api/chat"} 3' in lines
+    assert 'session_memories 7' in lines
+
+
+def test_histogram_buckets_are_cumulative_without_double_counting():
+    registry = MetricsRegistry()
+    registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 0.5, 1, 5))
+    registry.observe('latency_seconds', 0.7)
+
+    counts = [int(line.rsplit(' ', 1)[1]) for line in registry.render().splitlines()
+              if line.startswith('latency_seconds_bucket')]
+    assert counts == [0, 0, 1, 1, 1]
+    assert counts == sorted(counts)
+
+
+def test_label_values_are_escaped_and_failing_collectors_are_skipped():
+    registry = MetricsRegistry()
+    registry.counter('errors_total', 'Errors.')
+    registry.inc('errors_total', message='bad "quote"\nnext')
+    registry.register_collector(lambda: 1 / 0)
+    assert 'errors_total{message="bad \\"quote\\"\\nnext"} 1' in registry.render()
+
+
+def test_llm_calls_are_counted_per_intent():
+    before = shared_metrics.value('llm_calls_total', intent='answer_career_question', route='default')
+    router = ModelRouter()
+    router.record('default', 1.5, prompt_tokens=400, completion_tokens=100, time_to_first_token=0.3,
+                  intent='answer_career_question')
+    router.record('default', 0.2, error=True, intent='answer_career_question')
+
+    assert shared_metrics.value('llm_calls_total', intent='answer_career_question', route='default') == before + 2
+    assert shared_metrics.value('llm_errors_total', intent='answer_career_question', route='default') >= 1
+    assert shared_metrics.value('llm_tokens_total', intent='answer_career_question', kind='completion') >= 100
+    assert shared_metrics.value('llm_time_to_first_token_seconds', intent='answer_career_question') >= 1
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from model_router import ModelRouter
+
+
+def test_routes_match_on_intent_style_and_prompt_size():
+    router = ModelRouter()
+    assert router.select('answer_yes_no_question')['name'] == 'yes_no'
+    assert router.select('process_job_description', prompt_tokens=9000)['name'] == 'job_tailoring'
+    assert router.select('answer_with_user_instuctions', style='One Sentence')['name'] == 'short_answer'
+    assert router.select('answer_with_user_instuctions', style='detailed')['name'] == 'default'
+    assert router.select('answer_career_question', prompt_tokens=6000)['name'] == 'large_document'
+    assert router.select('answer_career_question', prompt_tokens=5999)['name'] == 'default'
+
+
+def test_max_prompt_tokens_and_fallback_without_a_match():
+    router = ModelRouter(routes=[{'name': 'small', 'max_prompt_tokens': 100, 'model': 'small-model'}])
+    assert router.select(prompt_tokens=100)['name'] == 'small'
+    # Nothing matches: the built-in default route is used
+    assert router.select(prompt_tokens=101)['name'] == 'default'
+
+
+def test_route_temperature_overrides_the_callers():
+    router = ModelRouter()
+    assert router.completion_params(router.select('answer_yes_no_question'), temperature=0.7) == {
+        'model': 'gpt-4o-mini', 'max_tokens': 10, 'temperature': 0.0
+    }
+    # Routes without a temperature keep the caller's, and omit it when the caller has none
+    default = router.select('answer_career_question')
+    assert router.completion_params(default, temperature=0.7)['temperature'] == 0.7
+    assert 'temperature' not in router.completion_params(default)
+
+
+def test_routes_file_is_reloaded_when_it_changes():
+    path = os.path.join(tempfile.mkdtemp(), 'routes.json')
+    with open(path, 'w') as f:
+        json.dump([{'name': 'first', 'model': 'model-a'}], f)
+    router = ModelRouter(routes_file=path)
+    assert router.select()['name'] == 'first'
+
+    with open(path, 'w') as f:
+        json.dump([{'name': 'second', 'model': 'model-b', 'max_tokens': 50}], f)
+    mtime = os.path.getmtime(path) + 5
+    os.utime(path, (mtime, mtime))
+    assert router.select()['name'] == 'second'
+
+    # A broken file keeps the last good table until it is fixed
+    with open(path, 'w') as f:
+        f.write('[{"name": ')
+    os.utime(path, (mtime + 5, mtime + 5))
+    assert router.select()['name'] == 'second'
@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database.pool_metrics import pool_metrics, InstrumentedQueuePool
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.2, pool_pre_ping=True)
+    pool_metrics.reset()
+    pool_metrics.attach(engine, capacity=1)
+    yield engine
+    engine.dispose()
+
+
+def test_checkouts_pings_and_saturation_are_recorded(engine):
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = pool_metrics.get_stats()
+    assert stats['checkouts'] == 3
+    assert stats['connects'] == 1
+    assert stats['statements'] == 3
+    assert stats['pings'] == 2  # A fresh connection is not pinged
+    assert stats['checked_out'] == 0
+    assert stats['peak_saturation'] == 1.0
+    assert stats['exhausted_checkouts'] == 3
+
+
+def test_waits_and_timeouts_when_pool_is_exhausted(engine):
+    held = engine.connect()
+    released = threading.Timer(0.05, held.close)
+    released.start()
+    with engine.connect():
+        pass
+    released.join()
+
+    held = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+
+    stats = pool_metrics.get_stats()
+    assert stats['timeouts'] == 1
+    assert stats['max_wait_ms'] >= 150
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from profiler import SamplingProfiler, profile_for, profile_path
+
+
+def busy_parse(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def run_busy_thread(name):
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_parse, args=(stop,), name=name, daemon=True)
+    thread.start()
+    return stop, thread
+
+
+def test_capture_samples_all_threads_and_groups_pool_threads():
+    stop, thread = run_busy_thread('job-worker_3')
+    try:
+        profiler = profile_for(0.3, interval=0.005)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.samples > 10
+    busy = [line for line in profiler.collapsed().splitlines() if 'busy_parse' in line]
+    assert busy and all(line.startswith('job-worker;') for line in busy)
+    assert int(busy[0].rsplit(' ', 1)[1]) > 0
+    assert profiler.summary()['top_frames']
+
+
+def test_request_profile_only_samples_its_thread_and_is_saved():
+    stop, thread = run_busy_thread('other-request')
+    try:
+        profiler = SamplingProfiler(interval=0.005, thread_ids=[threading.get_ident()]).start()
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            sorted(str(i) for i in range(5000))
+        profiler.stop()
+    finally:
+        stop.set()
+        thread.join()
+
+    collapsed = profiler.collapsed()
+    assert 'test_request_profile_only_samples_its_thread_and_is_saved' in collapsed
+    assert 'busy_parse' not in collapsed
+
+    path = profiler.save(profile_path('POST-/api/chat', tempfile.mkdtemp()))
+    assert '-POST-_api_chat-' in os.path.basename(path) and path.endswith('.collapsed')
+    with open(path) as f:
+        assert f.read() == collapsed
+
+
+def test_only_one_capture_at_a_time():
+    results = []
+    first = threading.Thread(target=lambda: results.append(profile_for(0.3)))
+    first.start()
+    time.sleep(0.05)
+    assert profile_for(0.1) is None
+    first.join()
+    assert results[0] is not None
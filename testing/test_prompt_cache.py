@@ -0,0 +1,58 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from gpt_service import GPTService
+from prompt_cache import PromptCacheStats, cached_tokens_from_usage
+from response_handlers import ResponseHandlers
+
+
+def usage(prompt_tokens, cached_tokens=None):
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=20, prompt_tokens_details=details)
+
+
+def test_messages_go_from_most_to_least_stable():
+    service = GPTService(client=None, response_handlers=ResponseHandlers())
+    history = "Human: how long should my resume be?\nAI: One page."
+    messages = service._create_messages("rewrite my summary", is_website=False, user_info={'name': 'Dana'},
+                                        chat_history=history, document_context="Resume excerpt: SQL, Python")
+    assert [m['role'] for m in messages] == ['system', 'system', 'system', 'system', 'user']
+    assert messages[0]['content'] == service.system_prompt
+    assert messages[1]['content'].endswith(history)
+    assert 'Dana' in messages[2]['content']
+    assert messages[3]['content'] == "Resume excerpt: SQL, Python"
+    assert messages[4]['content'] == "rewrite my summary"
+
+    # Storing user info changes only what follows the history
+    updated = service._create_messages("rewrite my summary", is_website=False, user_info={'name': 'Dana', 'skills': 'SQL'},
+                                       chat_history=history, document_context="Resume excerpt: SQL, Python")
+    assert updated[:2] == messages[:2] and updated[2] != messages[2]
+
+    # Sections without content are left out
+    assert [m['role'] for m in service._create_messages("hi", is_website=False)] == ['system', 'user']
+
+
+def test_cached_tokens_are_read_from_usage_details():
+    assert cached_tokens_from_usage(usage(1000, 768)) == 768
+    assert cached_tokens_from_usage(usage(1000)) == 0
+    assert cached_tokens_from_usage(SimpleNamespace()) == 0
+
+
+def test_hit_rates_are_tracked_per_endpoint():
+    stats = PromptCacheStats()
+    stats.record(usage(1000, 768), endpoint='chat')
+    stats.record(usage(1000, 0), endpoint='chat')
+    stats.record(usage(500), endpoint='upload_pdf')
+    stats.record(None, endpoint='chat')  # Calls without usage aren't counted
+    stats.record(usage(200, 100))  # Outside a request
+
+    report = stats.get_stats()
+    assert report['chat'] == {
+        'calls': 2, 'cache_hits': 1, 'prompt_tokens': 2000, 'cached_tokens': 768,
+        'call_hit_rate': 0.5, 'token_hit_rate': 0.384
+    }
+    assert report['upload_pdf']['call_hit_rate'] == 0.0 and report['upload_pdf']['token_hit_rate'] == 0.0
+    assert report['background']['cached_tokens'] == 100
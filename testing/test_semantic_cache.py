@@ -0,0 +1,109 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from embeddings import HashingEmbedder
+from gpt_service import GPTService
+from semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    cache = SemanticCache(HashingEmbedder(), threshold=0.75, clock=clock, **kwargs)
+    return cache, clock
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder()
+    first = embedder.embed("Should my resume be one page?")
+    second = HashingEmbedder().embed("Should my resume be one page?")
+    assert (first == second).all()
+    assert abs(float(first @ first) - 1.0) < 1e-5
+
+
+def test_paraphrase_hits_and_unrelated_question_misses():
+    cache, _ = make_cache()
+    cache.set("should my resume be one page", "One page is usually best.", latency=2.0)
+
+    assert cache.get("Should my resume be one page?") == "One page is usually best."
+    assert cache.get("is a one page resume ok") == "One page is usually best."
+    assert cache.get("should my cover letter be one page") is None
+    assert cache.get("how do I negotiate a salary offer") is None
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['latency_saved_seconds'] > 3.9
+
+
+def test_entries_expire_after_ttl():
+    cache, clock = make_cache(ttl_seconds=60)
+    cache.set("what is a cover letter", "A one-page letter...")
+    clock.now = 61
+    assert cache.get("what is a cover letter") is None
+    assert cache.get_stats()['expirations'] == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, _ = make_cache(max_size=2)
+    cache.set("how long should a resume be", "answer 1")
+    cache.set("what font should i use on a cover letter", "answer 2")
+    cache.get("how long should a resume be")
+    cache.set("how do i prepare for a behavioral interview", "answer 3")
+
+    assert cache.get("how long should a resume be") == "answer 1"
+    assert cache.get("what font should i use on a cover letter") is None
+    assert cache.get_stats()['evictions'] == 1
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        chunk = SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="Keep it to one page."))])
+        return iter([chunk])
+
+
+def test_gpt_service_only_caches_anonymous_career_questions():
+    client = StubClient()
+    cache, _ = make_cache()
+    service = GPTService(client, answer_cache=cache)
+
+    for _ in range(2):
+        assert ''.join(service.chat_about_resumes_stream("how long should my resume be", {}, "")) == "Keep it to one page."
+    assert client.calls == 1
+
+    ''.join(service.chat_about_resumes_stream("how long should my resume be", {'name': 'Dana'}, ""))
+    ''.join(service.chat_about_resumes_stream("how long should my resume be", {}, "", intent='answer_yes_no_question'))
+    assert client.calls == 3
+
+
+def test_questions_asked_with_chat_history_skip_the_cache():
+    client = StubClient()
+    cache, _ = make_cache()
+    service = GPTService(client, answer_cache=cache)
+    history = "Human: how long should my resume be?\nAI: One page."
+    cache.set("and for a cover letter", "Cached answer about resumes.")
+
+    # A follow-up depends on earlier turns, so it is neither served from nor stored in the cache
+    assert ''.join(service.chat_about_resumes_stream("and for a cover letter", {}, history)) == "Keep it to one page."
+    assert ''.join(service.chat_about_resumes_stream("how long should my cover letter be", {}, history)) == "Keep it to one page."
+    assert client.calls == 2 and len(cache) == 1
+
+    # Without history the same question is answered from the cache
+    assert ''.join(service.chat_about_resumes_stream("and for a cover letter", {}, "")) == "Cached answer about resumes."
+    assert client.calls == 2
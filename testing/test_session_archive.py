@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import DatabaseService, get_db_session, unit_of_work, ChatSession
+from database.archive import SessionArchive
+
+
+def service_with_archive(codec='gzip'):
+    service = DatabaseService()
+    service.archive = SessionArchive(tempfile.mkdtemp(), codec=codec)
+    return service
+
+
+def make_inactive(session_id, days):
+    with get_db_session() as session:
+        session.query(ChatSession).filter(ChatSession.session_id == session_id).update(
+            {'last_activity': datetime.now(timezone.utc) - timedelta(days=days)}
+        )
+
+
+def test_inactive_sessions_are_archived_and_restored_on_access():
+    service = service_with_archive()
+    old_id = service.create_chat_session(session_id='archive-old')
+    service.save_message(old_id, 'user', 'how long should my resume be?')
+    service.save_message(old_id, 'assistant', 'One page is ideal. ' * 200)
+    recent_id = service.create_chat_session(session_id='archive-recent')
+    make_inactive(old_id, days=120)
+
+    assert service.archive_inactive_sessions(days_old=90) == 1
+    assert service.get_chat_session(old_id) is None and service.get_session_messages(old_id) == []
+    assert service.get_chat_session(recent_id) is not None
+    assert service.archive.lookup(old_id)['messages'] == 2
+
+    restored = service.restore_archived_session(old_id)
+    assert [m['message_type'] for m in restored] == ['user', 'assistant']
+    assert service.get_session_messages(old_id)[1]['content'] == 'One page is ideal. ' * 200
+    assert service.get_chat_session(old_id) is not None
+
+    # Restored once: the archive no longer knows the session
+    assert old_id not in service.archive and service.restore_archived_session(old_id) == []
+
+
+def test_restore_inside_a_unit_of_work_keeps_the_archive_until_it_commits():
+    service = service_with_archive()
+    session_id = service.create_chat_session(session_id='archive-unit')
+    service.save_message(session_id, 'user', 'hello')
+    make_inactive(session_id, days=120)
+    service.archive_inactive_sessions(days_old=90)
+
+    # A rolled-back restore leaves the session in the archive
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            assert len(service.restore_archived_session(session_id)) == 1
+            assert session_id in service.archive
+            raise RuntimeError("handler failed")
+    assert service.get_chat_session(session_id) is None and session_id in service.archive
+
+    with unit_of_work():
+        assert len(service.restore_archived_session(session_id)) == 1
+        assert session_id in service.archive
+    assert session_id not in service.archive
+    assert [m['content'] for m in service.get_session_messages(session_id)] == ['hello']
+
+
+def test_index_is_shared_between_archive_instances():
+    root = tempfile.mkdtemp()
+    writer, reader = SessionArchive(root, codec='gzip'), SessionArchive(root, codec='gzip')
+    assert reader.lookup('s1') is None
+
+    writer.write([{'session': {'session_id': 's1', 'user_id': None}, 'messages': [{'content': 'hi'}]}])
+    assert reader.read('s1')['messages'] == [{'content': 'hi'}]
+
+    writer.forget('s1')
+    assert reader.lookup('s1') is None and reader.get_stats()['segments'] == 1
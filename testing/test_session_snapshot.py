@@ -0,0 +1,125 @@
+import io
+import os
+import sys
+
+import pytest
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import session_snapshot
+from database import DatabaseService, CompactChatMessage
+from memory_manager import MemoryManager
+from session_snapshot import snapshot_chunks, read_snapshot
+
+
+def snapshot_bytes(manager, compression='gzip'):
+    return b''.join(manager.export_snapshot(compression))
+
+
+def test_round_trip_restores_every_message_and_the_window(monkeypatch):
+    monkeypatch.setattr(session_snapshot, 'CHUNK_SIZE', 256)  # Force several streamed chunks
+    service = DatabaseService()
+    source = MemoryManager(k=3, session_id='snapshot-source', db_service=service)
+    source.user_info = {'name': 'Dana Smith', 'skills': 'SQL'}
+    for i in range(8):
+        source.add_message(f"question {i}", f"answer {i}\n" * 20)
+    service.save_message(source.session_id, 'user', 'a question that never got an answer')
+
+    chunks = list(source.export_snapshot('gzip'))
+    assert len(chunks) > 1
+
+    target = MemoryManager.from_snapshot(io.BytesIO(b''.join(chunks)), k=3, db_service=service,
+                                         session_id='snapshot-target')
+    assert target.get_chat_history() == source.get_chat_history()
+    assert target.user_info == source.user_info
+    assert target.session_start == source.session_start
+
+    stored = lambda session_id: [(m['message_type'], m['content']) for m in service.get_session_messages(session_id, 100)]
+    assert stored('snapshot-target') == stored('snapshot-source')
+    assert len(stored('snapshot-target')) == 17
+    assert service.get_chat_session('snapshot-target')['message_count'] == 17
+
+    # A fresh worker loads the same window from the database
+    reloaded = MemoryManager(k=3, session_id='snapshot-target', db_service=service)
+    assert reloaded.get_chat_history() == source.get_chat_history()
+
+
+@pytest.mark.parametrize('compression', ['none', 'gzip'])
+def test_import_without_database_and_compression_detection(compression):
+    source = MemoryManager(k=2)
+    for i in range(3):
+        source.add_message(f"q{i}", f"a{i}")
+    data = snapshot_bytes(source, compression)
+    assert data.startswith(b'\x1f\x8b') == (compression == 'gzip')
+
+    target = MemoryManager(k=2)
+    result = target.import_snapshot(io.BytesIO(data))
+    assert result['turns'] == 2 and result['messages'] == 4 and result['version'] == session_snapshot.VERSION
+    assert target.get_chat_history() == source.get_chat_history()
+
+
+def test_truncated_snapshot_leaves_the_session_unchanged():
+    service = DatabaseService()
+    source = MemoryManager(session_id='snapshot-full', db_service=service)
+    for i in range(5):
+        source.add_message(f"question {i}", f"answer {i}")
+    target = MemoryManager(session_id='snapshot-existing', db_service=service)
+    target.add_message("keep me", "still here")
+
+    truncated = snapshot_bytes(source, 'none').rsplit(b'\n', 3)[0] + b'\n'
+    with pytest.raises(ValueError, match='truncated'):
+        target.import_snapshot(io.BytesIO(truncated))
+    assert [m['content'] for m in service.get_session_messages('snapshot-existing')] == ['keep me', 'still here']
+    assert target.get_chat_history() == "Human: keep me\nAI: still here"
+
+
+def test_invalid_snapshot_for_a_new_session_leaves_nothing_behind():
+    service = DatabaseService()
+    source = MemoryManager(session_id='snapshot-partial', db_service=service)
+    for i in range(3):
+        source.add_message(f"question {i}", f"answer {i}")
+
+    truncated = snapshot_bytes(source, 'none').rsplit(b'\n', 2)[0] + b'\n'
+    with pytest.raises(ValueError, match='truncated'):
+        MemoryManager.from_snapshot(io.BytesIO(truncated), db_service=service, session_id='snapshot-never-created')
+    assert service.get_chat_session('snapshot-never-created') is None
+    assert service.get_session_messages('snapshot-never-created') == []
+
+
+def test_compact_mode_exports_legacy_messages_too():
+    service = DatabaseService()
+    source = MemoryManager(session_id='snapshot-legacy', db_service=service)
+    source.add_message("stored before compact mode", "in chat_messages")
+    service.message_model = CompactChatMessage
+    source.add_message("stored after", "in compact_chat_messages")
+
+    data = snapshot_bytes(source)
+    assert [turn['human'] for turn in read_snapshot(io.BytesIO(data))[1]] == ["stored before compact mode", "stored after"]
+
+    # Re-importing replaces the legacy rows as well instead of duplicating them
+    result = source.import_snapshot(io.BytesIO(data))
+    assert result['messages'] == 4
+    assert [m['content'] for m in service.iter_session_messages('snapshot-legacy')] == [
+        "stored before compact mode", "in chat_messages", "stored after", "in compact_chat_messages"
+    ]
+
+
+def test_newer_versions_and_other_files_are_rejected():
+    future = b''.join(snapshot_chunks({'session_id': 's'}, [], 'none')).replace(b'"version": 1', b'"version": 99')
+    with pytest.raises(ValueError, match='version'):
+        read_snapshot(io.BytesIO(future))
+    with pytest.raises(ValueError, match='Not a session snapshot'):
+        read_snapshot(io.BytesIO(b'{"session_id": "s"}\n'))
+
+
+def test_session_data_export_restores_its_window():
+    source = MemoryManager(k=2)
+    for i in range(3):
+        source.add_message(f"q{i}", f"a{i}")
+    target = MemoryManager(k=2)
+    target.import_session_data(source.export_session_data())
+    assert target.get_chat_history() == source.get_chat_history()
+    assert target.session_id == source.session_id
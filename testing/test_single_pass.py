@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gpt_service as gpt_service_module
+from gpt_service import GPTService
+from response_handlers import ResponseHandlers
+from user_intent import IntentClassifier
+
+
+def content_chunk(text):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+
+
+def tool_chunk(index, name=None, arguments=None):
+    call = SimpleNamespace(index=index, function=SimpleNamespace(name=name, arguments=arguments))
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[call]))])
+
+
+def usage_chunk(prompt_tokens):
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=5, prompt_tokens_details=None)
+    return SimpleNamespace(usage=usage, choices=[])
+
+
+def classification(name, args):
+    function_call = SimpleNamespace(name=name, arguments=json.dumps(args))
+    usage = SimpleNamespace(prompt_tokens=300, completion_tokens=10, prompt_tokens_details=None)
+    return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(function_call=function_call))])
+
+
+class StubClient:
+    """Returns scripted responses in order and records every completions call."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+    def prompt_tokens(self):
+        return sum(len(json.dumps(call['messages'])) for call in self.calls)
+
+
+class FakeMemory:
+    def __init__(self):
+        self.user_info = {}
+
+    def get_user_info(self):
+        return self.user_info
+
+    def get_chat_history(self):
+        return "Human: hi\nAI: Hello! How can I help?"
+
+    def store_user_info(self, info_type, info_value):
+        self.user_info[info_type] = info_value
+
+
+class FakeWebsite:
+    def __init__(self, url):
+        self.url = url
+
+    def user_prompt(self):
+        return f"Job posting at {self.url}"
+
+
+@pytest.fixture(autouse=True)
+def no_network(monkeypatch):
+    monkeypatch.setattr(gpt_service_module, 'Website', FakeWebsite)
+
+
+def run_two_pass(classified, answer_stream, user_input):
+    client = StubClient([classified] + ([iter(answer_stream)] if answer_stream else []))
+    memory = FakeMemory()
+    random.seed(7)
+    intent_info = IntentClassifier(client).classify_intent(user_input, memory.get_user_info())
+    service = GPTService(client, ResponseHandlers())
+    output = ''.join(service.generate_streaming_response(intent_info, memory, user_input))
+    return output, memory, client
+
+
+def run_single_pass(streams, user_input):
+    client = StubClient([iter(stream) for stream in streams])
+    memory = FakeMemory()
+    random.seed(7)
+    service = GPTService(client, ResponseHandlers())
+    output = ''.join(service.generate_single_pass_response(memory, user_input))
+    return output, memory, client
+
+
+def test_direct_answer_parity_with_one_call():
+    answer = [content_chunk("One page "), content_chunk("is best."), usage_chunk(900)]
+    two_pass, _, two_client = run_two_pass(
+        classification('answer_career_question', {'question': 'how long should my resume be?'}),
+        answer, 'how long should my resume be?'
+    )
+    single_pass, _, single_client = run_single_pass([answer], 'how long should my resume be?')
+
+    assert single_pass == two_pass == "One page is best."
+    assert len(two_client.calls) == 2
+    assert len(single_client.calls) == 1
+    assert single_client.prompt_tokens() < two_client.prompt_tokens()
+    assert single_client.calls[0]['tools']
+
+
+def test_store_personal_info_parity():
+    args = {'info_type': 'name', 'info_value': 'Dana'}
+    two_pass, two_memory, _ = run_two_pass(classification('store_personal_info', args), None, 'my name is Dana')
+    single_pass, single_memory, _ = run_single_pass([[
+        tool_chunk(0, name='store_personal_info', arguments='{"info_type": "name", '),
+        tool_chunk(0, arguments='"info_value": "Dana"}'),
+        usage_chunk(900)
+    ]], 'my name is Dana')
+
+    assert single_pass == two_pass == "Nice to meet you, Dana! How can I help with your career today?"
+    assert single_memory.user_info == two_memory.user_info == {'name': 'Dana'}
+
+
+def test_greeting_parity():
+    two_pass, _, _ = run_two_pass(classification('handle_greeting', {'greeting': 'hello'}), None, 'hello')
+    single_pass, _, client = run_single_pass([[tool_chunk(0, 'handle_greeting', '{"greeting": "hello"}')]], 'hello')
+    assert single_pass == two_pass
+    assert len(client.calls) == 1
+
+
+def test_job_url_tool_call_continues_with_tailoring():
+    url = 'https://example.com/jobs/1'
+    tailored = [content_chunk("## Tailored summary"), usage_chunk(1500)]
+    two_pass, _, _ = run_two_pass(classification('process_job_url', {'url': url}), tailored, url)
+    single_pass, _, client = run_single_pass([
+        [tool_chunk(0, 'process_job_url', json.dumps({'url': url}))],
+        tailored
+    ], url)
+
+    assert single_pass == two_pass == "## Tailored summary"
+    assert client.calls[1]['messages'][-1]['content'] == f"Job posting at {url}"
+
+
+def test_multiple_tool_calls_are_all_executed():
+    output, memory, _ = run_single_pass([[
+        tool_chunk(0, 'store_personal_info', '{"info_type": "name", "info_value": "Dana"}'),
+        tool_chunk(1, 'store_personal_info', '{"info_type": "current_role", "info_value": "a data analyst"}')
+    ]], "I'm Dana and I work as a data analyst")
+
+    assert memory.user_info == {'name': 'Dana', 'current_role': 'a data analyst'}
+    assert output.count("\n\n") == 1
+
+
+def test_tool_call_without_a_url_gets_a_text_reply():
+    output, _, client = run_single_pass([[tool_chunk(0, 'process_job_url', '{"url": ')]], 'tailor my resume to this job')
+    assert output == gpt_service_module.MISSING_URL_REPLY
+    assert len(client.calls) == 1
+
+    two_pass, _, _ = run_two_pass(classification('process_job_url', {}), None, 'tailor my resume to this job')
+    assert two_pass == gpt_service_module.MISSING_URL_REPLY
+
+
+def test_job_description_tool_call_uses_the_tailoring_route():
+    description = "Data Analyst at Example Corp. Requirements: SQL, Python, Tableau."
+    tailored = [content_chunk("## Tailored summary"), usage_chunk(1500)]
+    # Arguments cut off mid-description: the message itself is tailored against
+    output, _, client = run_single_pass([
+        [tool_chunk(0, 'process_job_description', '{"job_description": "Data Analyst at Exa')],
+        tailored
+    ], description)
+
+    assert output == "## Tailored summary"
+    assert client.calls[1]['messages'][-1]['content'] == description
+    assert client.calls[1]['max_tokens'] == 2500
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import threading
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+from sqlalchemy import create_engine, inspect, text
+from database import connection
+from lazy import LazyObject
+
+
+def test_lazy_object_builds_once_on_first_use():
+    built = []
+
+    def factory():
+        built.append(1)
+        return {'ready': True}
+
+    lazy = LazyObject(factory)
+    assert not lazy.loaded
+    threads = [threading.Thread(target=lambda: lazy.get('ready')) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert lazy.loaded and len(built) == 1
+
+
+def test_schema_setup_runs_once_per_process(monkeypatch):
+    calls = []
+    monkeypatch.setattr(connection, 'create_tables', lambda conn: calls.append(conn))
+    monkeypatch.setattr(connection, '_schema_ready', False)
+    connection.init_database()
+    connection.init_database()
+    assert len(calls) == 1
+    connection.init_database(force=True)
+    assert len(calls) == 2
+
+
+def test_missing_columns_are_added_to_existing_tables():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, google_id VARCHAR(255))"))
+        conn.execute(text("CREATE TABLE chat_sessions (id INTEGER PRIMARY KEY, message_count INTEGER)"))
+        connection.upgrade_columns(conn)
+        connection.upgrade_columns(conn)  # Nothing left to add the second time
+    columns = {table: {c['name'] for c in inspect(engine).get_columns(table)} for table in ('users', 'chat_sessions')}
+    assert {'google_id', 'profile_picture'} <= columns['users']
+    assert 'token_count' in columns['chat_sessions']
+
+
+def test_importing_the_app_defers_heavy_sdks():
+    env = dict(os.environ, LAZY_WARM_UP='false', DB_ENGINE_PROFILE='test')
+    probe = "import sys, app; print(sorted(m for m in ('openai', 'bs4', 'PyPDF2', 'smtplib', 'google.oauth2.id_token') if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
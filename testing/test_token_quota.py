@@ -0,0 +1,65 @@
+import os
+import sys
+import uuid
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rate_limit import DatabaseRateLimiter
+from usage_tracker import UsageTracker, usage_meter
+
+
+def test_reservations_are_capped_and_settled_with_actual_usage():
+    limiter = DatabaseRateLimiter(message_limit=50, reset_period_hours=3, token_limit=10000)
+    session_id = f"quota-{uuid.uuid4().hex[:8]}"
+
+    # A session with no row yet gets one on its first reservation
+    assert limiter.reserve_tokens(session_id, 6000)
+    assert not limiter.reserve_tokens(session_id, 6000)
+    limiter.settle_tokens(session_id, 6000, 1500)
+    status = limiter.check_limit(session_id)
+    assert (status['tokens_used'], status['tokens_remaining']) == (1500, 8500)
+
+    assert limiter.reserve_tokens(session_id, 6000)
+    limiter.reset_session(session_id)
+    assert limiter.check_limit(session_id)['tokens_used'] == 0
+
+
+def test_oversized_first_request_is_let_through():
+    limiter = DatabaseRateLimiter(token_limit=1000)
+    session_id = f"quota-{uuid.uuid4().hex[:8]}"
+    assert limiter.reserve_tokens(session_id, 5000)
+    assert not limiter.reserve_tokens(session_id, 1)
+
+
+def test_concurrent_first_requests_both_reserve():
+    limiter, other = DatabaseRateLimiter(token_limit=10000), DatabaseRateLimiter(token_limit=10000)
+    session_id = f"quota-{uuid.uuid4().hex[:8]}"
+    get_session = limiter._get_session
+
+    def racing_get_session(session, sid):
+        # The other request creates the row after this one found none to update
+        limiter._get_session = get_session
+        assert other.reserve_tokens(sid, 2000)
+        return None
+
+    limiter._get_session = racing_get_session
+    assert limiter.reserve_tokens(session_id, 3000)
+    assert limiter.check_limit(session_id)['tokens_used'] == 5000
+
+
+def test_disabled_budget_never_rejects():
+    limiter = DatabaseRateLimiter(token_limit=0)
+    assert limiter.reserve_tokens(f"quota-{uuid.uuid4().hex[:8]}", 10 ** 9)
+    assert limiter.check_limit('missing-session')['tokens_remaining'] is None
+
+
+def test_usage_meter_counts_tokens_even_when_tracking_is_disabled():
+    tracker = UsageTracker(writer=lambda entries: len(entries), enabled=False)
+    with usage_meter() as meter:
+        tracker.record('gpt-4o-mini', 'answer_career_question', 120, 30)
+        tracker.record('gpt-4o-mini', 'classify_intent', 80, 10)
+    tracker.record('gpt-4o-mini', 'classify_intent', 999, 1)
+    assert meter['tokens'] == 240
@@ -0,0 +1,108 @@
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import DatabaseService, User, get_db_session
+from model_router import ModelRouter
+from usage_tracker import UsageTracker, usage_session
+
+
+def test_cost_uses_cached_prompt_price_and_snapshot_names():
+    tracker = UsageTracker(writer=lambda entries: len(entries))
+    # 1M uncached prompt tokens at 0.15, 1M cached at 0.075, 1M completion at 0.60
+    assert round(tracker.cost('gpt-4o-mini', 2_000_000, 1_000_000, 1_000_000), 6) == 0.825
+    assert tracker.cost('gpt-4o-mini-2024-07-18', 1_000_000) == tracker.cost('gpt-4o-mini', 1_000_000)
+    assert tracker.cost('mystery-model', 1000) == 0.0
+    assert tracker.get_stats()['unpriced_models'] == ['mystery-model']
+
+
+def test_calls_are_aggregated_per_session_and_kept_when_a_flush_fails():
+    batches = []
+
+    def writer(entries):
+        if not batches:
+            batches.append(None)
+            raise RuntimeError('database unavailable')
+        batches.append(entries)
+        return len(entries)
+
+    tracker = UsageTracker(writer=writer)
+    with usage_session('session-a'):
+        tracker.record('gpt-4o-mini', 'answer_career_question', 100, 20)
+        tracker.record('gpt-4o-mini', 'answer_career_question', 50, 10, cached_tokens=40)
+    tracker.record('gpt-4o-mini', 'classify_intent', 30, 5)
+
+    assert tracker.flush() == 0 and tracker.get_stats()['pending'] == 2
+    assert tracker.flush() == 2
+    entries = {(e['session_id'], e['intent']): e for e in batches[1]}
+    session_entry = entries[('session-a', 'answer_career_question')]
+    assert (session_entry['calls'], session_entry['prompt_tokens'], session_entry['cached_tokens']) == (2, 150, 40)
+    assert entries[('background', 'classify_intent')]['completion_tokens'] == 5
+
+
+def test_router_usage_is_written_in_batches_and_reported():
+    service = DatabaseService()
+    tracker = UsageTracker(writer=service.record_token_usage)
+    with get_db_session() as session:
+        user = User(name='Spender', email=f"{uuid.uuid4().hex}@example.com", password_hash='x')
+        session.add(user)
+        session.flush()
+        user_id = user.id
+    paid_session = service.create_chat_session(user_id=user_id)
+
+    import model_router
+    original, model_router.usage_tracker = model_router.usage_tracker, tracker
+    try:
+        router = ModelRouter(routes=[{'name': 'expensive', 'model': 'gpt-4o'}])
+        with usage_session(paid_session):
+            router.record('expensive', 1.0, prompt_tokens=1000, completion_tokens=500, intent='process_job_url')
+            router.record('expensive', 1.0, error=True, intent='process_job_url')  # Nothing billed
+        tracker.flush()
+        with usage_session(paid_session):
+            router.record('expensive', 1.0, prompt_tokens=1000, completion_tokens=500, intent='process_job_url')
+        tracker.flush()
+    finally:
+        model_router.usage_tracker = original
+
+    report = service.get_usage_report(days=1)
+    top_user = report['top_users'][0]
+    assert top_user['user_id'] == user_id and top_user['calls'] == 2
+    assert top_user['cost_usd'] == round(2 * (1000 * 2.50 + 500 * 10.00) / 1e6, 6)
+    intents = {row['intent']: row for row in report['by_intent']}
+    assert intents['process_job_url']['completion_tokens'] >= 1000
+
+
+def test_usage_is_billed_to_the_model_that_served_the_call():
+    recorded = []
+    tracker = UsageTracker(writer=lambda entries: recorded.extend(entries) or len(entries))
+    import model_router
+    original, model_router.usage_tracker = model_router.usage_tracker, tracker
+    try:
+        router = ModelRouter(routes=[{'name': 'default', 'model': 'gpt-4o'}])
+        router.record('default', 1.0, prompt_tokens=100, completion_tokens=20, model='gpt-4o-mini-2024-07-18')
+        router.record('default', 1.0, prompt_tokens=100, completion_tokens=20)  # No model in the response
+        tracker.flush()
+    finally:
+        model_router.usage_tracker = original
+    assert sorted(entry['model'] for entry in recorded) == ['gpt-4o', 'gpt-4o-mini-2024-07-18']
+
+
+def test_usage_is_attributed_to_the_user_linked_to_the_session():
+    service = DatabaseService()
+    user_id = service.create_user('Logged In', f"{uuid.uuid4().hex}@example.com", 'secret')['user']['id']
+    session_id = service.create_chat_session()  # Anonymous session, as the app creates them
+    service.assign_session_to_user(user_id, session_id)  # What login does
+
+    service.record_token_usage([{
+        'day': datetime.now(timezone.utc).date(), 'session_id': session_id, 'intent': 'answer_career_question',
+        'model': 'gpt-4o-mini', 'calls': 1, 'prompt_tokens': 100, 'cached_tokens': 0,
+        'completion_tokens': 20, 'cost_usd': 0.5
+    }])
+    top_users = {row['user_id']: row for row in service.get_usage_report(days=1, limit=100)['top_users']}
+    assert top_users[user_id]['calls'] == 1
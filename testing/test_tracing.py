@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from model_router import ModelRouter
+from tracing import Tracer, tracer as shared_tracer
+
+
+def test_spans_nest_and_build_server_timing():
+    tracer = Tracer(enabled=True, exporter='none')
+    trace = tracer.start_trace('POST /api/chat')
+    with tracer.span('rate_limit'):
+        pass
+    with tracer.span('classify_intent') as outer:
+        with tracer.span('llm.intent_classification'):
+            time.sleep(0.01)
+        outer.set(intent='answer_career_question')
+    tracer.record('llm_first_token', time.time() - 0.2, 0.2)
+
+    names = [span.name for span in trace.spans]
+    assert names == ['rate_limit', 'llm.intent_classification', 'classify_intent', 'llm_first_token']
+    assert trace.spans[1].parent is trace.spans[2]
+    assert trace.spans[2].attributes['intent'] == 'answer_career_question'
+
+    header = tracer.server_timing()
+    assert header.startswith('rate_limit;dur=') and 'llm_first_token;dur=200.0' in header
+    assert header.split(', ')[-1].startswith('total;dur=')
+
+    tracer.finish_trace()
+    assert tracer.current_trace() is None
+    stats = tracer.get_stats()
+    assert stats['classify_intent']['count'] == 1 and stats['POST /api/chat']['count'] == 1
+    assert stats['llm_first_token']['buckets']['le_250'] == 1
+
+
+def test_errors_are_recorded_and_disabled_tracer_is_a_no_op():
+    tracer = Tracer(enabled=True, exporter='none')
+    trace = tracer.start_trace('job')
+    with pytest.raises(ValueError):
+        with tracer.span('scrape'):
+            raise ValueError("bad page")
+    assert trace.spans[0].attributes['error'] == 'ValueError'
+    tracer.finish_trace()
+
+    disabled = Tracer(enabled=False, exporter='none')
+    assert disabled.start_trace('job') is None
+    with disabled.span('scrape'):
+        pass
+    assert disabled.get_stats() == {} and disabled.server_timing() is None
+
+
+def test_router_records_llm_spans_with_ttft_and_token_rate():
+    shared_tracer.reset()
+    trace = shared_tracer.start_trace('POST /api/chat-stream')
+    ModelRouter().record('default', 2.0, prompt_tokens=500, completion_tokens=150, time_to_first_token=0.5)
+    shared_tracer.finish_trace()
+
+    llm = next(span for span in trace.spans if span.name == 'llm.default')
+    assert llm.attributes['ttft_ms'] == 500.0 and llm.attributes['tokens_per_second'] == 100.0
+    assert 'llm_first_token' in shared_tracer.get_stats()
+
+
+def test_otel_exporter_keeps_nesting():
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    otel_trace.set_tracer_provider(provider)
+
+    tracer = Tracer(enabled=True, exporter='otel')
+    tracer.start_trace('POST /api/chat')
+    with tracer.span('classify_intent'):
+        with tracer.span('llm.intent_classification', model='gpt-4o-mini'):
+            pass
+    tracer.finish_trace()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans['llm.intent_classification'].parent.span_id == spans['classify_intent'].context.span_id
+    assert spans['classify_intent'].parent.span_id == spans['POST /api/chat'].context.span_id
+    assert spans['llm.intent_classification'].attributes['model'] == 'gpt-4o-mini'
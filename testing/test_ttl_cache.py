@@ -0,0 +1,58 @@
+import os
+import sys
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = TTLCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=5)  # Per-entry TTL overrides the default
+    clock.now = 4.9
+    assert cache.get('a') == 1 and cache.get('b') == 2
+
+    clock.now = 5
+    assert cache.get('b') is None and cache.get('b', 'missing') == 'missing'
+    clock.now = 60
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    stats = cache.get_stats()
+    assert stats['expirations'] == 2 and stats['hits'] == 2 and stats['misses'] == 3
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'b' is now the least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    cache.set('a', 10)  # Overwriting refreshes without evicting
+    assert len(cache) == 2 and cache.get_stats()['evictions'] == 1
+
+
+def test_none_values_are_stored_and_default_distinguishes_them():
+    missing = object()
+    cache = TTLCache()
+    cache.set('gone', None)
+    assert cache.get('gone', missing) is None
+    assert cache.get('other', missing) is missing
+
+    cache.delete('gone')
+    assert cache.get('gone', missing) is missing
+    cache.set('x', 1)
+    cache.clear()
+    # Statistics survive clear()
+    assert len(cache) == 0 and cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 2
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+# Use the SQLite engine profile so importing the database package needs no server
+os.environ.setdefault('DB_ENGINE_PROFILE', 'test')
+
+# Add the parent directory to sys.path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database import db_service, unit_of_work
+from database.pool_metrics import pool_metrics
+from rate_limit import DatabaseRateLimiter
+
+rate_limiter = DatabaseRateLimiter(message_limit=50, reset_period_hours=3)
+
+
+def handle_chat_message(session_id):
+    """The database work of one /api/chat message: limit check, two saved messages, stats, count."""
+    rate_limiter.check_limit(session_id)
+    db_service.save_message(session_id, 'user', 'how long should my resume be?')
+    db_service.save_message(session_id, 'assistant', 'One page.')
+    rate_limiter.get_session_stats(session_id)
+    rate_limiter.increment_count(session_id)
+
+
+def measure(action):
+    pool_metrics.reset()
+    action()
+    stats = pool_metrics.get_stats()
+    return stats['checkouts'], stats['commits']
+
+
+def test_chat_message_uses_one_checkout_per_phase():
+    session_id = db_service.create_chat_session()
+
+    assert measure(lambda: handle_chat_message(session_id)) == (5, 5)
+
+    def with_unit_of_work():
+        limit_status = rate_limiter.check_limit(session_id)
+        with unit_of_work():
+            db_service.save_message(session_id, 'user', 'how long should my resume be?')
+            db_service.save_message(session_id, 'assistant', 'One page.')
+            rate_limiter.get_session_stats(session_id)
+            rate_limiter.increment_count(session_id)
+        return limit_status
+
+    assert measure(with_unit_of_work) == (2, 2)
+    assert len(db_service.get_session_messages(session_id)) == 4
+    assert rate_limiter.check_limit(session_id)['current_count'] == 2
+
+
+def test_unit_of_work_rolls_back_all_writes_on_error():
+    session_id = db_service.create_chat_session()
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            db_service.save_message(session_id, 'user', 'hello')
+            rate_limiter.increment_count(session_id)
+            raise RuntimeError("handler failed")
+
+    assert db_service.get_session_messages(session_id) == []
+    assert rate_limiter.check_limit(session_id)['current_count'] == 0
+
+
+def test_a_handled_database_error_still_fails_the_unit():
+    session_id = db_service.create_chat_session()
+
+    with pytest.raises(IntegrityError):
+        with unit_of_work():
+            db_service.save_message(session_id, 'user', 'hello')
+            # The duplicate insert fails and create_chat_session handles the IntegrityError,
+            # but the transaction it was part of has been rolled back
+            assert db_service.create_chat_session(session_id=session_id) == session_id
+            with pytest.raises(IntegrityError):
+                rate_limiter.increment_count(session_id)
+
+    assert db_service.get_session_messages(session_id) == []
+    assert rate_limiter.check_limit(session_id)['current_count'] == 0
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    import job_queue
+    monkeypatch.setattr(job_queue.JobQueue, 'start', lambda self: self)  # No workers for these tests
+    import app
+    monkeypatch.setattr(app, 'SINGLE_PASS_INTENT', False)
+    monkeypatch.setattr(app.intent_classifier, 'classify_intent',
+                        lambda text, user_info=None: {'intent': 'answer_career_question', 'args': {}})
+    return app
+
+
+def test_no_connection_is_held_during_the_llm_call(app_module, monkeypatch):
+    session_id = db_service.create_chat_session()
+    held = []
+
+    def answer(intent_info, memory_manager, user_input):
+        held.append(pool_metrics.get_stats()['checked_out'])
+        return 'One page.'
+    monkeypatch.setattr(app_module, 'handle_intent', answer)
+    response = app_module.app.test_client().post(
+        '/api/chat', json={'message': 'how long should my resume be?', 'session_id': session_id}
+    )
+
+    assert response.status_code == 200
+    assert held == [0]
+    # The exchange and the counter update were committed after the call
+    assert [m['content'] for m in db_service.get_session_messages(session_id)] == ['how long should my resume be?', 'One page.']
+    assert rate_limiter.check_limit(session_id)['current_count'] == 1
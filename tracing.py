@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Only needed for TRACING_EXPORTER=otel
+    otel_trace = None
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+_current_trace = ContextVar('current_trace', default=None)
+_current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ('name', 'start', 'end', 'attributes', 'parent')
+
+    def __init__(self, name, start, parent=None, attributes=None):
+        self.name = name
+        self.start = start  # time.time() seconds, for exporters
+        self.end = None
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+
+    @property
+    def duration(self):
+        return (self.end - self.start) if self.end is not None else 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """Spans recorded while serving one request (or running one job)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def durations(self):
+        """Total milliseconds per span name, in first-seen order."""
+        totals = {}
+        with self.lock:
+            for span in self.spans:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration * 1000
+        return totals
+
+
+class NoopExporter:
+    def export(self, trace):
+        pass
+
+
+class LogExporter:
+    """Print each finished trace as one JSON line."""
+
+    def export(self, trace):
+        print(json.dumps({
+            'trace': trace.name,
+            'duration_ms': round((time.time() - trace.start) * 1000, 2),
+            'spans': [{'name': s.name, 'start_ms': round((s.start - trace.start) * 1000, 2),
+                       'duration_ms': round(s.duration * 1000, 2), **s.attributes} for s in trace.spans]
+        }))
+
+
+class OpenTelemetryExporter:
+    """
+    Replay finished traces as OpenTelemetry spans, keeping start/end times and nesting.
+    Uses the globally configured TracerProvider (e.g. an OTLP exporter set up by opentelemetry-instrument).
+    """
+
+    def __init__(self):
+        if otel_trace is None:
+            raise ImportError("opentelemetry-api is required for TRACING_EXPORTER=otel")
+        self.tracer = otel_trace.get_tracer('resumeai')
+
+    def export(self, trace):
+        to_ns = lambda seconds: int(seconds * 1e9)
+        recorded = set(trace.spans)
+        children = {}
+        for span in trace.spans:
+            # Spans whose parent isn't part of this trace hang off the root
+            children.setdefault(span.parent if span.parent in recorded else None, []).append(span)
+
+        def emit(parent, context):
+            for span in sorted(children.get(parent, []), key=lambda s: s.start):
+                otel_span = self.tracer.start_span(span.name, context=context, start_time=to_ns(span.start),
+                                                   attributes=span.attributes)
+                emit(span, otel_trace.set_span_in_context(otel_span))
+                otel_span.end(end_time=to_ns(span.end or span.start))
+
+        root = self.tracer.start_span(trace.name, start_time=to_ns(trace.start))
+        emit(None, otel_trace.set_span_in_context(root))
+        root.end()
+
+
+EXPORTERS = {'none': NoopExporter, 'log': LogExporter, 'otel': OpenTelemetryExporter}
+
+
+class Tracer:
+    """
+    Lightweight span tracer.
+
+    Spans are attached to the current trace (one per request) for the Server-Timing header and
+    exporters, and always aggregated into per-name latency histograms.
+    """
+
+    def __init__(self, enabled=None, exporter=None, max_samples=None):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled: Record spans at all (default TRACING_ENABLED, true)
+            exporter: 'none', 'log' or 'otel' (default TRACING_EXPORTER, none)
+            max_samples: Recent durations kept per span name for percentiles (default TRACING_SAMPLES)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+        self.exporter = EXPORTERS[(exporter or os.getenv('TRACING_EXPORTER', 'none')).lower()]()
+        self.max_samples = max_samples or int(os.getenv('TRACING_SAMPLES', '1000'))
+        self.lock = threading.Lock()
+        self.histograms = {}  # {name: {'count', 'total', 'max', 'buckets', 'samples'}}
+
+    # Traces
+    def start_trace(self, name):
+        """Start a trace and make it current."""
+        if not self.enabled:
+            return None
+        trace = Trace(name)
+        _current_trace.set(trace)
+        _current_span.set(None)
+        return trace
+
+    def finish_trace(self, trace=None):
+        """Export the trace and clear it from the current context."""
+        trace = trace or _current_trace.get()
+        _current_trace.set(None)
+        _current_span.set(None)
+        if trace is not None:
+            # Whole-request latency goes into the histograms under the trace name
+            self._observe(trace.name, (time.time() - trace.start) * 1000)
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                print(f"⚠️  Trace export failed: {e}")
+
+    @staticmethod
+    def current_trace():
+        return _current_trace.get()
+
+    # Spans
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block; yields the Span so callers can add attributes."""
+        if not self.enabled:
+            yield Span(name, 0.0)
+            return
+        span = Span(name, time.time(), _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name, started, duration, **attributes):
+        """
+        Record an already-timed span (e.g. an LLM stream consumed across generator yields).
+
+        Args:
+            started: Start time from time.time()
+            duration: Seconds
+        """
+        if self.enabled:
+            span = Span(name, started, _current_span.get(), attributes)
+            span.end = started + duration
+            self._finish(span, ended=True)
+
+    def _finish(self, span, ended=False):
+        if not ended:
+            span.end = time.time()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(span)
+        self._observe(span.name, span.duration * 1000)
+
+    def _observe(self, name, duration_ms):
+        with self.lock:
+            histogram = self.histograms.setdefault(name, {
+                'count': 0, 'total': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS_MS),
+                'samples': deque(maxlen=self.max_samples)
+            })
+            histogram['count'] += 1
+            histogram['total'] += duration_ms
+            histogram['max'] = max(histogram['max'], duration_ms)
+            histogram['samples'].append(duration_ms)
+            for i, bound in enumerate(BUCKETS_MS):
+                if duration_ms <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+
+    # Reporting
+    def server_timing(self, trace=None):
+        """Format the trace's spans as a Server-Timing header value."""
+        trace = trace or _current_trace.get()
+        if trace is None or not self.enabled:
+            return None
+        metrics = [f"{name};dur={duration:.1f}" for name, duration in trace.durations().items()]
+        metrics.append(f"total;dur={(time.time() - trace.start) * 1000:.1f}")
+        return ', '.join(metrics)
+
+    def get_stats(self):
+        """Return per-span latency histograms (milliseconds)."""
+        def percentile(samples, fraction):
+            samples = sorted(samples)
+            return round(samples[max(0, int(len(samples) * fraction) - 1)], 2) if samples else None
+
+        with self.lock:
+            report = {}
+            for name, histogram in sorted(self.histograms.items()):
+                report[name] = {
+                    'count': histogram['count'],
+                    'avg_ms': round(histogram['total'] / histogram['count'], 2),
+                    'p50_ms': percentile(histogram['samples'], 0.50),
+                    'p95_ms': percentile(histogram['samples'], 0.95),
+                    'p99_ms': percentile(histogram['samples'], 0.99),
+                    'max_ms': round(histogram['max'], 2),
+                    'buckets': {('+Inf' if bound == float('inf') else f"le_{bound}"): count
+                                for bound, count in zip(BUCKETS_MS, histogram['buckets'])}
+                }
+            return report
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+
+# Shared by the app, GPTService, IntentClassifier, MemoryManager and the scraper
+tracer = Tracer()
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live."""
+
+    def __init__(self, max_size=1024, ttl_seconds=300, clock=time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries; the least recently used entry is evicted first
+            ttl_seconds: Default lifetime of an entry in seconds
+            clock: Time source (injectable for tests)
+        """
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()  # {key: (expires_at, value)}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value (refreshing its LRU position) or default."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if self.clock() >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry if full."""
+        with self.lock:
+            self.entries[key] = (self.clock() + (ttl if ttl is not None else self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a key if present."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries (statistics are kept)."""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_stats(self):
+        """Return size and hit-rate statistics."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
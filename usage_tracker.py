@@ -0,0 +1,205 @@
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+try:
+    from flask import g, has_request_context
+except ImportError:  # Flask is only needed to pick up the request's session
+    has_request_context = None
+
+# USD per million tokens: (prompt, cached prompt, completion). Override with TOKEN_PRICES_FILE.
+DEFAULT_PRICES = {
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+    'gpt-4o': (2.50, 1.25, 10.00),
+    'gpt-4.1-mini': (0.40, 0.10, 1.60),
+    'gpt-4.1': (2.00, 0.50, 8.00),
+    'text-embedding-3-small': (0.02, 0.02, 0.0),
+    'text-embedding-3-large': (0.13, 0.13, 0.0)
+}
+
+_usage_session = ContextVar('usage_session', default=None)
+_usage_meter = ContextVar('usage_meter', default=None)
+
+
+@contextmanager
+def usage_session(session_id):
+    """Attribute LLM usage in the enclosed block to session_id (for jobs outside a request)."""
+    token = _usage_session.set(session_id)
+    try:
+        yield
+    finally:
+        _usage_session.reset(token)
+
+
+def current_session_id():
+    """Session the current LLM call is billed to, or 'background'."""
+    session_id = _usage_session.get()
+    if session_id is None and has_request_context and has_request_context():
+        session_id = g.get('session_id')
+    return session_id or 'background'
+
+
+@contextmanager
+def usage_meter():
+    """Count the tokens of LLM calls made in the enclosed block; yields {'tokens': int}."""
+    meter = {'tokens': 0}
+    token = _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.reset(token)
+
+
+def current_meter():
+    """Meter of the enclosing usage_meter block, or of the current request (g.usage_meter)."""
+    meter = _usage_meter.get()
+    if meter is None and has_request_context and has_request_context():
+        meter = g.get('usage_meter')
+    return meter
+
+
+def load_prices(prices_file=None):
+    """Default price table, updated from a JSON file of {model: [prompt, cached, completion]}."""
+    prices = dict(DEFAULT_PRICES)
+    prices_file = prices_file or os.getenv('TOKEN_PRICES_FILE')
+    if prices_file:
+        try:
+            with open(prices_file) as f:
+                prices.update({model: tuple(price) for model, price in json.load(f).items()})
+        except Exception as e:
+            print(f"⚠️  Failed to load token prices from {prices_file}: {e}")
+    return prices
+
+
+class UsageTracker:
+    """
+    Aggregate token usage and cost per session, intent and model in memory, and
+    flush the totals to the token_usage table in batches from a background thread.
+    """
+
+    def __init__(self, writer=None, flush_interval=None, max_pending=None, prices=None, enabled=None):
+        """
+        Initialize the tracker.
+
+        Args:
+            writer: Callable taking a list of entries (default db_service.record_token_usage)
+            flush_interval: Seconds between flushes (default USAGE_FLUSH_SECONDS, 30)
+            max_pending: Pending keys that trigger an early flush (default USAGE_FLUSH_MAX_PENDING, 500)
+            prices: {model: (prompt, cached, completion)} USD per million tokens
+            enabled: Record usage at all (default USAGE_TRACKING_ENABLED, true)
+        """
+        self.writer = writer
+        self.flush_interval = flush_interval or float(os.getenv('USAGE_FLUSH_SECONDS', '30'))
+        self.max_pending = max_pending or int(os.getenv('USAGE_FLUSH_MAX_PENDING', '500'))
+        self.prices = prices or load_prices()
+        self.enabled = enabled if enabled is not None else os.getenv('USAGE_TRACKING_ENABLED', 'true').lower() == 'true'
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}  # {(day, session_id, intent, model): entry}
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.stats = {'recorded': 0, 'flushes': 0, 'rows_written': 0, 'flush_errors': 0, 'unpriced_models': set()}
+
+    def cost(self, model, prompt_tokens=0, completion_tokens=0, cached_tokens=0):
+        """USD cost of one call; unknown models cost 0 and are reported in get_stats."""
+        price = self.prices.get(model)
+        if price is None:
+            # Dated snapshots (gpt-4o-mini-2024-07-18) are priced like their base model
+            price = next((p for name, p in self.prices.items() if model.startswith(name + '-')), None)
+        if price is None:
+            with self.lock:
+                self.stats['unpriced_models'].add(model)
+            return 0.0
+        prompt_price, cached_price, completion_price = price
+        uncached = max(0, prompt_tokens - cached_tokens)
+        return (uncached * prompt_price + cached_tokens * cached_price + completion_tokens * completion_price) / 1e6
+
+    def record(self, model, intent=None, prompt_tokens=0, completion_tokens=0, cached_tokens=0, session_id=None):
+        """Add one call's usage to the pending totals (and to the current meter, for token quotas)."""
+        prompt_tokens, completion_tokens, cached_tokens = prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0
+        meter = current_meter()
+        if meter is not None:
+            meter['tokens'] += prompt_tokens + completion_tokens
+        if not self.enabled:
+            return
+        cost = self.cost(model or 'unknown', prompt_tokens, completion_tokens, cached_tokens)
+        key = (datetime.now(timezone.utc).date(), session_id or current_session_id(), intent or 'none', model or 'unknown')
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = {
+                    'day': key[0], 'session_id': key[1], 'intent': key[2], 'model': key[3],
+                    'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0
+                }
+            entry['calls'] += 1
+            entry['prompt_tokens'] += prompt_tokens
+            entry['cached_tokens'] += cached_tokens
+            entry['completion_tokens'] += completion_tokens
+            entry['cost_usd'] += cost
+            self.stats['recorded'] += 1
+            pending = len(self.pending)
+        self._ensure_thread()
+        if pending >= self.max_pending:
+            self.wakeup.set()
+
+    def flush(self):
+        """Write the pending totals; on failure they are merged back for the next flush."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return 0
+            entries = list(batch.values())
+            try:
+                written = self._writer()(entries)
+            except Exception as e:
+                print(f"⚠️  Failed to write token usage ({len(entries)} rows): {e}")
+                with self.lock:
+                    self.stats['flush_errors'] += 1
+                    for key, entry in batch.items():
+                        merged = self.pending.setdefault(key, dict(entry, calls=0, prompt_tokens=0, cached_tokens=0,
+                                                                   completion_tokens=0, cost_usd=0.0))
+                        for name in ('calls', 'prompt_tokens', 'cached_tokens', 'completion_tokens', 'cost_usd'):
+                            merged[name] += entry[name]
+                return 0
+            with self.lock:
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += written or 0
+            return written
+
+    def _writer(self):
+        if self.writer is None:
+            from database import db_service  # Deferred: the tracker is imported before the database is configured
+            self.writer = db_service.record_token_usage
+        return self.writer
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='usage-flusher', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def get_stats(self):
+        """Return counters for the tracker itself (usage totals live in the database)."""
+        with self.lock:
+            stats = dict(self.stats, pending=len(self.pending))
+            stats['unpriced_models'] = sorted(self.stats['unpriced_models'])
+        stats['flush_interval_seconds'] = self.flush_interval
+        return stats
+
+
+# Fed by ModelRouter.record and the OpenAI embedder
+usage_tracker = UsageTracker()
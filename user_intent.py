@@ -1,5 +1,13 @@
 import re
-from utils import is_valid_url
+import os
+import copy
+import time
+import hashlib
+from utils import is_valid_url, estimate_message_tokens
+from model_router import ModelRouter
+from prompt_cache import prompt_cache_stats, cached_tokens_from_usage
+from ttl_cache import TTLCache
+from tracing import tracer
 import json 
 
 # Flexible and adaptive system prompt
@@ -207,30 +215,8 @@ INTENT_FUNCTIONS = [
 
 ]
 
-class IntentClassifier:
-    """Classify user intents using GPT with fallback to simple rules."""
-    
-    def __init__(self, client):
-        """Initialize the intent classifier."""
-        self.client = client
-    
-    def classify_intent(self, user_input, user_info=None):
-        """Classify the user's intent."""
-        try:
-            return self._classify_with_gpt(user_input, user_info)
-        except Exception as e:
-            print(f"GPT classification failed: {e}. Using fallback.")
-            return self._simple_fallback_classification(user_input)
-    
-    def _classify_with_gpt(self, user_input, user_info=None):
-        """Classify intent using GPT with simplified logic."""
-        memory_context = ""
-        if user_info:
-            memory_info = [f"{k}: {v}" for k, v in user_info.items() if v]
-            if memory_info:
-                memory_context = f"\n\nUser's stored information: {', '.join(memory_info)}"
-        
-        system_message = f"""
+# Kept free of per-user data so it stays byte-identical across calls (prompt caching)
+CLASSIFIER_PROMPT = """
         You are an intent classifier for a career chatbot. Choose the most appropriate function:
 
         1. **store_personal_info** - If user shares personal details (name, experience, role, interests)
@@ -262,18 +248,141 @@ class IntentClassifier:
 
         Priority: Personal info > Greetings/Goodbyes > Career questions > Off-topic
         
-        IMPORTANT: Career questions should ALWAYS use answer_career_question, not handle_off_topic.{memory_context}
+        IMPORTANT: Career questions should ALWAYS use answer_career_question, not handle_off_topic.
+        """
+
+# Single-pass mode: the main model answers directly and only calls a tool when the message
+# needs an action. Answer-style intents are left out because the model answers those itself.
+SINGLE_PASS_TOOL_NAMES = [
+    'store_personal_info',
+    'process_job_url',
+    'process_job_description',
+    'handle_greeting',
+    'handle_goodbye',
+    'handle_confirmation',
+    'handle_rejection',
+    'handle_off_topic'
+]
+
+SINGLE_PASS_PROMPT = """
+## Tools:
+Call a tool instead of answering when the message is one of these:
+- The user shares personal details (name, experience, role, skills, education, contact info, career interests): call store_personal_info
+- The message is a job posting URL: call process_job_url
+- The message is a pasted job description: call process_job_description
+- A simple greeting, farewell, confirmation or rejection with no other request: call the matching handle_* tool
+- A clearly non-career topic: call handle_off_topic
+
+Otherwise answer the user directly. If they ask for a yes or no answer, reply in one word. If they ask for a specific style or format, follow it.
+"""
+
+# Intent cache: results carrying personal data are never cached
+UNCACHEABLE_INTENTS = {'store_personal_info'}
+PERSONAL_DATA_PATTERNS = [
+    re.compile(r'[\w\.-]+@[\w\.-]+'),  # Email addresses
+    re.compile(r'\d{3}[\-\s\.]?\d{3}[\-\s\.]?\d{4}'),  # Phone numbers
+    re.compile(r"\b(?:my name is|i am|i'm|call me)\b"),  # Introductions
+]
+
+class IntentClassifier:
+    """Classify user intents using GPT with fallback to simple rules."""
+    
+    def __init__(self, client, router=None, cache=None):
+        """Initialize the intent classifier."""
+        self.client = client
+        self.router = router or ModelRouter()
+        if cache is None and os.getenv('INTENT_CACHE_ENABLED', 'true').lower() == 'true':
+            cache = TTLCache(
+                max_size=int(os.getenv('INTENT_CACHE_SIZE', '2048')),
+                ttl_seconds=int(os.getenv('INTENT_CACHE_TTL', '3600'))
+            )
+        self.cache = cache
+        self.cache_max_chars = int(os.getenv('INTENT_CACHE_MAX_CHARS', '200'))
+    
+    def classify_intent(self, user_input, user_info=None):
+        """Classify the user's intent."""
+        with tracer.span('classify_intent') as span:
+            result = self._classify_intent(user_input, user_info)
+            span.set(intent=result.get('intent'), type=result.get('type'))
+            return result
+    
+    def _classify_intent(self, user_input, user_info=None):
+        cache_key = self._cache_key(user_input, user_info) if self.cache is not None else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
+        try:
+            result = self._classify_with_gpt(user_input, user_info)
+        except Exception as e:
+            print(f"GPT classification failed: {e}. Using fallback.")
+            return self._simple_fallback_classification(user_input)
+        
+        # Only GPT answers are worth caching; fallback results are cheap to recompute
+        if cache_key and result.get('type') == 'function_call' and result['intent'] not in UNCACHEABLE_INTENTS:
+            self.cache.set(cache_key, copy.deepcopy(result))
+        return result
+    
+    def _cache_key(self, user_input, user_info=None):
         """
+        Build the cache key from the normalized input plus a hash of which user_info keys are set.
+        Returns None for inputs that shouldn't be cached (long or containing personal data).
+        """
+        normalized = re.sub(r'\s+', ' ', user_input.strip().lower()).rstrip('.! ')
+        if not normalized or len(normalized) > self.cache_max_chars:
+            return None
+        if any(pattern.search(normalized) for pattern in PERSONAL_DATA_PATTERNS):
+            return None
+        
+        # Only which keys are present matters to the classifier, never their (personal) values
+        info_keys = ','.join(sorted(k for k, v in (user_info or {}).items() if v))
+        info_hash = hashlib.sha1(info_keys.encode('utf-8')).hexdigest()[:12]
+        return f"{info_hash}:{normalized}"
+    
+    def get_cache_stats(self):
+        """Return intent cache statistics; hits are GPT classification calls avoided."""
+        if self.cache is None:
+            return {'enabled': False}
+        stats = self.cache.get_stats()
+        stats['enabled'] = True
+        stats['classification_calls_saved'] = stats['hits']
+        return stats
+    
+    def _classify_with_gpt(self, user_input, user_info=None):
+        """Classify intent using GPT with simplified logic."""
+        # Static instructions and function schemas come first so they form a cacheable prefix;
+        # per-user details follow in their own message.
+        messages = [{"role": "system", "content": CLASSIFIER_PROMPT}]
+        if user_info:
+            memory_info = [f"{k}: {v}" for k, v in user_info.items() if v]
+            if memory_info:
+                messages.append({"role": "system", "content": f"User's stored information: {', '.join(memory_info)}"})
+        messages.append({"role": "user", "content": user_input})
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_input}
-            ],
-            functions=INTENT_FUNCTIONS,
-            function_call="auto",
-            temperature=0.1
+        route = self.router.select('classify_intent', estimate_message_tokens(messages))
+        started = time.monotonic()
+        try:
+            response = self.client.chat.completions.create(
+                messages=messages,
+                functions=INTENT_FUNCTIONS,
+                function_call="auto",
+                **self.router.completion_params(route, temperature=0.1)
+            )
+        except Exception:
+            self.router.record(route['name'], time.monotonic() - started, error=True, intent='classify_intent')
+            raise
+        
+        usage = getattr(response, 'usage', None)
+        prompt_cache_stats.record(usage)
+        self.router.record(
+            route['name'],
+            time.monotonic() - started,
+            prompt_tokens=usage.prompt_tokens if usage else estimate_message_tokens(messages),
+            completion_tokens=usage.completion_tokens if usage else 0,
+            intent='classify_intent',
+            cached_tokens=cached_tokens_from_usage(usage),
+            model=getattr(response, 'model', None)
         )
         
         if response.choices[0].message.function_call:
@@ -430,3 +539,11 @@ def get_system_prompt():
 def get_intent_functions():
     """Get the intent functions."""
     return INTENT_FUNCTIONS
+
+def get_single_pass_tools():
+    """Get the intent functions offered as tools in single-pass mode."""
+    return [
+        {"type": "function", "function": function}
+        for function in INTENT_FUNCTIONS
+        if function['name'] in SINGLE_PASS_TOOL_NAMES
+    ]
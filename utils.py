@@ -1,8 +1,7 @@
 import sys
 import time
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup
+from tracing import tracer
 
 def print_streaming(text):
     """Print text character by character with a slight delay to simulate typing."""
@@ -23,6 +22,9 @@ class Website:
     """Class to handle website scraping and text extraction."""
     
     def __init__(self, url):
+        # Imported on first scrape rather than at worker boot
+        import requests
+        from bs4 import BeautifulSoup
         self.url = url
         headers = {
             "User-Agent": (
@@ -30,15 +32,27 @@ class Website:
                 "(KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
             )
         }
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.content, "html.parser")
-        self.title = soup.title.string if soup.title else "No title found"
-        for tag in soup.body(["script", "style", "img", "input"]):
-            tag.decompose()
-        self.text = soup.body.get_text(separator='\n', strip=True)
+        with tracer.span('scrape') as span:
+            response = requests.get(url, headers=headers)
+            soup = BeautifulSoup(response.content, "html.parser")
+            self.title = soup.title.string if soup.title else "No title found"
+            for tag in soup.body(["script", "style", "img", "input"]):
+                tag.decompose()
+            self.text = soup.body.get_text(separator='\n', strip=True)
+            span.set(bytes=len(response.content))
 
     def user_prompt(self):
         return (
             f"You're looking at the job description website titled '{self.title}'.\n\n"
             f"Here's the job description:\n\n{self.text}"
-        )
\ No newline at end of file
+        )
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) for budgeting before a call."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+def estimate_message_tokens(messages):
+    """Estimate prompt tokens for a list of chat messages."""
+    return sum(estimate_tokens(message.get('content') or '') + 4 for message in messages)